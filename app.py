@@ -2,14 +2,57 @@ import dash
 import dash_bootstrap_components as dbc
 from dash import html, dcc
 
+from instrumentation import install_query_monitoring, instrument_app
+from profiling import install_profiling
+from downloads import install_downloads
+from background import background_manager
+from station_stats import RUN_IN_APP, start_updater
+import snapshots
+from warmer import start_warmer
+
+# Register the MongoDB command listener before the pages create their clients
+install_query_monitoring()
+
 # Initialize Dash app
-app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], use_pages=True, title="Station Monitoring Dashboard")
+# compress=True gzip/brotli-encodes callback responses (figures) via flask-compress
+# long-range views run as background callbacks on the disk-backed job manager
+app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], use_pages=True, title="Station Monitoring Dashboard", compress=True,
+                background_callback_manager=background_manager)
 
 app._favicon = "favicon.png" 
 
+# Callback timing histograms and /metrics endpoint
+instrument_app(app)
+
+# Opt-in per-callback profiling (config.ini [profiling] or signed ?profile= link)
+install_profiling(app)
+
+# Streamed CSV downloads for periods over the row budget
+install_downloads(app)
+
+
+def start_background_threads():
+    """
+    Start this process's background threads. Never at import: with preload_app
+    the gunicorn master imports the app and keeps forking workers, so it must
+    not hold MongoDB clients or threads. gunicorn starts them in
+    post_worker_init, `python app.py` below. The periodic jobs only run in
+    one worker at a time (leader.py).
+    """
+    # Keep the station_stats collection current (or run `python station_stats.py --loop` instead)
+    if RUN_IN_APP:
+        start_updater()
+    # Hourly snapshots behind the map's parameter layer (or `python snapshots.py --loop`)
+    if snapshots.RUN_IN_APP:
+        snapshots.start_updater()
+    # precompute the default views
+    start_warmer()
+
+
 # Define main layout with navigation and page container
 app.layout = dbc.Container([
     dbc.NavbarSimple(
+        [dbc.NavItem(dbc.NavLink("Compare Stations", href="/compare"))],
         brand=html.A(
             html.Img(
                 src="/assets/maccess-logo.png",
@@ -30,4 +73,5 @@ app.layout = dbc.Container([
 
 # Run the application
 if __name__ == "__main__":
+    start_background_threads()
     app.run(debug=True)
@@ -0,0 +1,152 @@
+// station_map.js
+// Client-side rendering for the clustered station layer built by
+// StationMap.create_map: marker icons, and popups that are only built when a
+// marker is opened. Device labels, icons and links come from the layer's
+// `hideout`, so they are defined once in station_map.py. When the parameter
+// layer is on, `hideout.layer` holds one snapshot frame and the stations it
+// covers are drawn as coloured circles instead of icons.
+
+window.stationMap = Object.assign({}, window.stationMap, {
+
+    pointToLayer: function (feature, latlng, context) {
+        const hideout = context.hideout || {};
+        const layer = hideout.layer;
+        if (layer && layer.types.includes(feature.properties.type)) {
+            return window.stationMap.layerMarker(feature, latlng, layer);
+        }
+        const icons = hideout.icons || {};
+        const icon = L.icon({
+            iconUrl: "/assets/" + (icons[feature.properties.type] || hideout.default_icon),
+            iconSize: [60, 60],
+            iconAnchor: [30, 30],
+            popupAnchor: [0, -30]
+        });
+        return L.marker(latlng, {icon: icon, bubblingMouseEvents: false});
+    },
+
+    layerMarker: function (feature, latlng, layer) {
+        const value = layer.values[feature.properties.coll];
+        const hasValue = value !== undefined && value !== null;
+        const marker = L.circleMarker(latlng, {
+            radius: 12,
+            color: "#333",
+            weight: 1,
+            fillColor: hasValue ? layer.colors[feature.properties.coll] : "#bbb",
+            fillOpacity: hasValue ? 0.9 : 0.5,
+            bubblingMouseEvents: false
+        });
+        marker.bindTooltip(feature.properties.name + " - " + layer.label + ": "
+                           + (hasValue ? value : "no data"));
+        return marker;
+    },
+
+    onEachFeature: function (feature, layer, context) {
+        if (feature.properties.cluster) {
+            return;
+        }
+        // the popup DOM is built on first open, not for every marker up front
+        layer.bindPopup(function () {
+            return window.stationMap.popup(feature, context.hideout || {});
+        });
+    },
+
+    popup: function (feature, hideout) {
+        const p = feature.properties;
+        const [lon, lat] = feature.geometry.coordinates;
+        const labels = hideout.labels || {};
+        const link = (hideout.links || {})[p.type] || hideout.default_link;
+
+        const root = document.createElement("div");
+        const line = function (text) {
+            const el = document.createElement("p");
+            el.textContent = text;
+            root.appendChild(el);
+        };
+        line("Name: " + p.name);
+        line("Type: " + (labels[p.type] || p.type));
+        line("Location: (" + lat.toFixed(3) + ", " + lon.toFixed(3) + ")");
+        if (p.latest) {
+            line("Latest Data: " + p.latest);
+        }
+
+        const actions = document.createElement("div");
+        actions.style.display = "flex";
+        actions.style.alignItems = "center";
+
+        const a = document.createElement("a");
+        a.textContent = link.text;
+        a.href = link.href
+            .replace("{id}", encodeURIComponent(p.id))
+            .replace("{type}", encodeURIComponent(p.type))
+            .replace("{num}", encodeURIComponent(p.num));
+        a.target = link.target;
+        a.className = "btn btn-link";
+        a.style.padding = 0;
+        a.style.color = "blue";
+        actions.appendChild(a);
+
+        const meta = document.createElement("button");
+        meta.textContent = "Station Metadata";
+        meta.className = "btn btn-link";
+        meta.style.marginLeft = "10px";
+        meta.style.padding = 0;
+        meta.style.color = "blue";
+        meta.onclick = function () {
+            window.dash_clientside.set_props("metadata-request", {
+                data: {station: p.id, device: p.type, ts: Date.now()}
+            });
+        };
+        actions.appendChild(meta);
+
+        root.appendChild(actions);
+        return root;
+    }
+});
+
+// Map page filters run in the browser: the full station list is shipped once
+// into the `station-features` store and filtered here on every change.
+window.dash_clientside = window.dash_clientside || {};
+window.dash_clientside.stationMap = {
+    filterStations: function (nClicks, privacy, type, status, collection, search) {
+        const noUpdate = window.dash_clientside.no_update;
+        if (!collection) {
+            return [noUpdate, noUpdate, noUpdate];
+        }
+        const term = (search || "").toLowerCase();
+        const features = collection.features.filter(function (f) {
+            const p = f.properties;
+            if (term && !(String(p.name || "").toLowerCase().includes(term)
+                          || term === String(p.num))) {
+                return false;
+            }
+            if (privacy !== "all" && p.public !== privacy) {
+                return false;
+            }
+            if (type !== "all" && p.type !== type) {
+                return false;
+            }
+            return status === "all" || p.status === status;
+        });
+
+        const data = {type: "FeatureCollection", features: features};
+        if (!features.length) {
+            return [data, noUpdate, {display: "block"}];
+        }
+        let viewport;
+        if (features.length === 1) {
+            const [lon, lat] = features[0].geometry.coordinates;
+            viewport = {center: [lat, lon], zoom: 12};
+        } else {
+            const lons = features.map(function (f) { return f.geometry.coordinates[0]; });
+            const lats = features.map(function (f) { return f.geometry.coordinates[1]; });
+            viewport = {bounds: [[Math.min(...lats), Math.min(...lons)],
+                                 [Math.max(...lats), Math.max(...lons)]]};
+        }
+        return [data, viewport, {display: "none"}];
+    },
+
+    // Play button of the parameter layer: step the time slider, wrapping after the end
+    advanceSlider: function (nIntervals, value, step, min, max) {
+        return value >= max ? min : Math.min(value + step, max);
+    }
+};
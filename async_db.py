@@ -0,0 +1,96 @@
+# async_db.py
+"""
+Concurrent MongoDB reads for synchronous Dash callbacks.
+
+Callbacks run on ordinary worker threads, so independent queries (an earliest/
+latest pair, one find_one per sensor, ...) used to run one after another. This
+module keeps one asyncio event loop per process on a daemon thread, with
+PyMongo's AsyncMongoClient bound to it. `gather()` submits coroutines from any
+thread and blocks until all of them finish, so a callback waits for the
+slowest query instead of the sum of all of them.
+
+As with database.get_client(), the loop and clients are created on first use
+and recreated in a forked child.
+"""
+
+import asyncio
+import os
+import threading
+
+from pymongo import AsyncMongoClient
+
+from instrumentation import bind_labels, current_labels
+from settings import MONGO_URI, DB_NAME
+
+_state = {"pid": None, "loop": None, "clients": {}}
+_lock = threading.Lock()
+
+
+def _loop():
+    """This process's event loop, started on a daemon thread on first use."""
+    pid = os.getpid()
+    if _state["pid"] != pid:
+        with _lock:
+            if _state["pid"] != pid:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="mongo-async", daemon=True).start()
+                _state.update(pid=pid, loop=loop, clients={})
+    return _state["loop"]
+
+
+def get_async_client(uri=None):
+    """AsyncMongoClient for `uri`; only call from coroutines running on the loop."""
+    uri = uri or MONGO_URI
+    client = _state["clients"].get(uri)
+    if client is None:
+        client = _state["clients"][uri] = AsyncMongoClient(uri)
+    return client
+
+
+def get_async_db(db_name=None, uri=None):
+    return get_async_client(uri)[db_name or DB_NAME]
+
+
+def run(coro):
+    """Run a coroutine on the shared loop and block until it returns."""
+    # keep query metrics attributed to the calling callback
+    labels = current_labels()
+
+    async def _attributed():
+        bind_labels(labels)
+        return await coro
+
+    return asyncio.run_coroutine_threadsafe(_attributed(), _loop()).result()
+
+
+def gather(*coros):
+    """Run coroutines concurrently; results come back in argument order."""
+    async def _all():
+        return await asyncio.gather(*coros)
+    return run(_all())
+
+
+async def find_one(collection, filter=None, projection=None, sort=None, db_name=None, uri=None):
+    return await get_async_db(db_name, uri)[collection].find_one(filter or {}, projection, sort=sort)
+
+
+def find_one_many(queries, db_name=None, uri=None):
+    """
+    Run several find_one queries concurrently. `queries` is a list of
+    (collection, filter, projection, sort) tuples; documents are returned in
+    the same order (None where nothing matched).
+    """
+    return gather(*(find_one(c, f, p, s, db_name, uri) for c, f, p, s in queries))
+
+
+async def aggregate(collection, pipeline, db_name=None, uri=None):
+    cursor = await get_async_db(db_name, uri)[collection].aggregate(pipeline, allowDiskUse=True)
+    return await cursor.to_list()
+
+
+def aggregate_many(jobs, db_name=None, uri=None):
+    """
+    Run several aggregation pipelines concurrently. `jobs` is a list of
+    (collection, pipeline) tuples; result lists come back in the same order.
+    """
+    return gather(*(aggregate(c, p, db_name, uri) for c, p in jobs))
@@ -0,0 +1,120 @@
+# availability.py
+"""
+Cached data-availability summary: earliest and latest timestamp per data
+collection, used by the metadata modal.
+
+The summary is read from the station_stats collection (station_stats.py).
+Collections whose stats document has no earliest/latest yet (no document, or
+one holding only coverage or snapshot fields) are looked up in one concurrent
+fan-out (async_db). The result is served from memory; once it is older than
+`refresh_seconds` ([availability] in config.ini), the next reader triggers a
+refresh on a background thread and keeps getting the previous values until
+it finishes.
+"""
+
+import threading
+import time
+
+import pandas as pd
+
+from async_db import find_one_many
+from database import get_db
+from settings import (
+    config, DB_NAME, MONGO_URI,
+    BUOY_01_COLLECTION, F1_METEO_COLLECTION, FIDAS_COLLECTION,
+)
+from station_stats import all_stats, stats_targets
+
+REFRESH_SECONDS = config.getint('availability', 'refresh_seconds', fallback=300)
+
+
+def time_field(device_type):
+    return "Timestamp" if device_type == "Meteorological" else "datetime"
+
+
+def collection_for(device_type, station_num):
+    """Data collection holding a station's time series, or None."""
+    if device_type == "IoTBox":
+        return f"station{station_num}" if station_num is not None else None
+    return {
+        "Buoy": BUOY_01_COLLECTION,
+        "Meteorological": F1_METEO_COLLECTION,
+        "Fidas_Palas": FIDAS_COLLECTION,
+    }.get(device_type)
+
+
+def _fmt(doc, field):
+    if not doc or doc.get(field) is None:
+        return "N/A"
+    return pd.to_datetime(doc[field]).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _has_span(doc):
+    # coverage and snapshot upserts create stats documents without one
+    return bool(doc) and doc.get("earliest") is not None and doc.get("latest") is not None
+
+
+def read_spans(targets):
+    """{collection: (earliest, latest)} for [(collection, time field)], read concurrently."""
+    queries = []
+    for name, field in targets:
+        queries.append((name, {field: {"$exists": True}}, {"_id": 0, field: 1}, [(field, 1)]))
+        queries.append((name, {field: {"$exists": True}}, {"_id": 0, field: 1}, [(field, -1)]))
+    docs = find_one_many(queries, DB_NAME, MONGO_URI) if queries else []
+    return {
+        name: (_fmt(docs[2 * i], field), _fmt(docs[2 * i + 1], field))
+        for i, (name, field) in enumerate(targets)
+    }
+
+
+class AvailabilitySummary:
+    def __init__(self, refresh_seconds=REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._spans = {}
+        self._loaded_at = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        try:
+            targets = stats_targets(get_db())
+            stats = all_stats()
+            known = {name for name, _ in targets if _has_span(stats.get(name))}
+            spans = {
+                name: (_fmt(stats[name], "earliest"), _fmt(stats[name], "latest"))
+                for name in known
+            }
+            spans.update(read_spans([(n, f) for n, f in targets if n not in known]))
+            with self._lock:
+                self._spans = spans
+                self._loaded_at = time.monotonic()
+        except Exception as e:
+            print(f"Error refreshing availability summary: {e}")
+        finally:
+            self._refreshing = False
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self.refresh, name="availability-refresh", daemon=True).start()
+
+    def span(self, collection, field):
+        """(earliest, latest) as display strings, "N/A" when there is no data."""
+        if self._loaded_at is None:
+            self._refreshing = True
+            self.refresh()
+        elif time.monotonic() - self._loaded_at > self.refresh_seconds:
+            self._refresh_in_background()
+
+        span = self._spans.get(collection)
+        if span is None:
+            # a station added since the last refresh
+            span = read_spans([(collection, field)])[collection]
+            with self._lock:
+                self._spans[collection] = span
+        return span
+
+
+summary = AvailabilitySummary()
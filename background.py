@@ -0,0 +1,35 @@
+# background.py
+"""
+Disk-backed job manager for Dash background callbacks.
+
+Long-range views ("1Y"/"All") are handed from the regular callback to a
+background callback, which runs in a separate process managed by diskcache.
+That keeps web worker threads free for fast interactions, lets the browser
+show progress, cancels the job when the inputs change, and reuses a finished
+result when the same inputs are requested again within `result_ttl` seconds.
+"""
+
+import os
+import time
+
+import diskcache
+from dash import DiskcacheManager
+
+from settings import config
+
+# Ranges whose fetch + flatten + figure build is slow enough to run in the background
+LONG_RANGES = {"1Y", "All"}
+
+CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    config.get('background', 'cache_dir', fallback='.background_cache')
+)
+# Results are relative to "now", so identical inputs are only reused for a short while
+RESULT_TTL = config.getint('background', 'result_ttl', fallback=300)
+
+cache = diskcache.Cache(CACHE_DIR)
+background_manager = DiskcacheManager(
+    cache,
+    cache_by=[lambda: int(time.time() // RESULT_TTL)],
+    expire=RESULT_TTL,
+)
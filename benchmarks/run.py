@@ -0,0 +1,343 @@
+# run.py
+"""
+Performance suite for the dashboard data paths.
+
+Generates synthetic data (see benchmarks/synthetic.py), loads it into a local
+mongod or into an in-process mongomock stand-in, then times every fetch,
+aggregation and figure builder. Results can be saved as a JSON baseline and
+compared against a previous baseline to catch regressions.
+
+Usage (from the repository root):
+    python -m benchmarks.run --size small --save benchmarks/baselines/small.json
+    python -m benchmarks.run --size small --compare benchmarks/baselines/small.json
+    python -m benchmarks.run --backend mongod --uri mongodb://localhost:27017/
+"""
+
+import argparse
+import copy
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from pymongo import MongoClient
+
+from benchmarks import synthetic
+
+from settings import (
+    MONGO_URI, STATIONS_INFO, BUOY_01_COLLECTION, F1_METEO_COLLECTION, FIDAS_COLLECTION,
+)
+from graphs.iot_graphs import IoTGraphs
+from graphs.meteo_graphs import meteostationGraphs
+from graphs.buoy_graphs import BuoyGraphs
+from graphs.fidas_graphs import FidasGraphs
+from station_map import StationMap
+
+BENCH_DB = "dashboard_bench"
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imports the app in a fresh interpreter, the way each web worker starts
+STARTUP_PROBE = """
+import json, resource, time
+start = time.perf_counter()
+import app
+elapsed = time.perf_counter() - start
+import database
+print(json.dumps({
+    "seconds": elapsed,
+    "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "mongo_clients": len(database._clients),
+}))
+"""
+
+
+def connect(backend, uri):
+    """Return a client for the chosen backend; mongomock is an optional dependency."""
+    if backend == "mongomock":
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("The mongomock backend needs `pip install mongomock` (or use --backend mongod).")
+        return mongomock.MongoClient()
+    return MongoClient(uri)
+
+
+def attach(obj, client, db, collection=None):
+    """Point a data-layer object at the benchmark database instead of config.ini."""
+    obj.client = client
+    obj.db = db
+    if collection is not None:
+        obj.collection = db[collection]
+    return obj
+
+
+def measure(fn, repeat):
+    """Run fn `repeat` times; return (durations in seconds, last result)."""
+    durations, result = [], None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        durations.append(time.perf_counter() - start)
+    return durations, result
+
+
+def _size_of(result):
+    """Best-effort row/item count of a benchmark result for the report."""
+    if hasattr(result, "shape"):
+        return int(result.shape[0])
+    if isinstance(result, tuple):
+        return _size_of(result[0])
+    if isinstance(result, (list, dict)):
+        return len(result)
+    return None
+
+
+def build_cases(client, db, iot_num):
+    """
+    Return an ordered list of (name, callable) covering every data path.
+    Inputs for downstream steps (aggregation, figures) are prepared once up front
+    so that each case times a single function.
+    """
+    iot   = attach(IoTGraphs(), client, db)
+    meteo = attach(meteostationGraphs(), client, db, F1_METEO_COLLECTION)
+    buoy  = attach(BuoyGraphs(), client, db, BUOY_01_COLLECTION)
+    fidas = attach(FidasGraphs(), client, db, FIDAS_COLLECTION)
+    smap  = attach(StationMap(mongo_uri=MONGO_URI, db_name=BENCH_DB), client, db)
+
+    iot_params = list(iot.get_available_parameters(iot_num).keys())
+    iot_labels = iot.get_available_parameters(iot_num)
+    iot_df = iot.fetch_station_data(iot_num, "All", iot_params, False)
+    iot_split_df = iot.fetch_station_data(iot_num, "All", iot_params, True)
+    meteo_params = list(meteo.label_map.keys())
+    meteo_df = meteo.fetch_data("All")
+    buoy_df = buoy.fetch_time_series("1Y", buoy.scalar_params)
+
+    captured = {}
+
+    def _capture(date_range, times, docs):
+        captured.update(date_range=date_range, times=times, docs=docs)
+        return times, docs
+
+    buoy._aggregate_profiles_by_period = _capture
+    buoy.fetch_profiles("1Y")
+    del buoy._aggregate_profiles_by_period
+    pf_times, pf_docs = buoy.fetch_profiles("1D")
+
+    fidas_times = fidas.list_datetimes("1D")
+    fidas_df = _fidas_frame(fidas, ["PM2.5", "PMtot"])
+    stations = smap.fetch_station_data()
+
+    cases = [
+        ("iot.get_available_parameters", lambda: iot.get_available_parameters(iot_num)),
+        ("iot.fetch_station_data[1W]", lambda: iot.fetch_station_data(iot_num, "1W", iot_params, False)),
+        ("iot.fetch_station_data[All]", lambda: iot.fetch_station_data(iot_num, "All", iot_params, False)),
+        ("iot.fetch_station_data[All,split]", lambda: iot.fetch_station_data(iot_num, "All", iot_params, True)),
+        ("iot.aggregate_data[H]", lambda: iot.aggregate_data(iot_df, "H")),
+        ("iot.create_iotbox_figures", lambda: iot.create_iotbox_figures(iot_df, iot_params, iot_labels, False)),
+        ("iot.create_iotbox_figures[split]",
+         lambda: iot.create_iotbox_figures(iot_split_df, iot_params, iot_labels, True)),
+        ("meteo.fetch_data[1W]", lambda: meteo.fetch_data("1W")),
+        ("meteo.fetch_data[All]", lambda: meteo.fetch_data("All")),
+        ("meteo.aggregate_data[H]", lambda: meteo.aggregate_data(meteo_df.copy(), "H")),
+        ("meteo.create_figures", lambda: meteo.create_figures(meteo_df, meteo_params)),
+        ("buoy.fetch_time_series[1Y]", lambda: buoy.fetch_time_series("1Y", buoy.scalar_params)),
+        ("buoy.create_time_series_figures",
+         lambda: buoy.create_time_series_figures(buoy_df, buoy.scalar_params)),
+        ("buoy.fetch_profiles[1D]", lambda: buoy.fetch_profiles("1D")),
+        ("buoy.fetch_profiles[1M]", lambda: buoy.fetch_profiles("1M")),
+        ("buoy._aggregate_profiles_by_period[1Y]",
+         lambda: buoy._aggregate_profiles_by_period("1Y", captured["times"], captured["docs"])),
+        ("buoy.create_profile_figure",
+         lambda: [buoy.create_profile_figure(pf_times, pf_docs, p) for p in buoy.profile_params]),
+        ("fidas.list_datetimes[1D]", lambda: fidas.list_datetimes("1D")),
+        ("fidas.list_datetimes[All]", lambda: fidas.list_datetimes("All")),
+        ("fidas.fetch_time_series[1W]", lambda: fidas.fetch_time_series("1W", ["PM2.5", "PMtot"], "None")),
+        ("fidas.fetch_spectrum_doc", lambda: fidas.fetch_spectrum_doc(fidas_times[-1])),
+        ("fidas.create_time_series_figures",
+         lambda: fidas.create_time_series_figures(fidas_df, ["PM2.5", "PMtot"])),
+        ("fidas.create_spectrum_figure",
+         lambda: fidas.create_spectrum_figure(*_spectrum(fidas, fidas_times[-1]))),
+        ("map.fetch_station_data", lambda: smap.fetch_station_data()),
+        ("map.create_map", lambda: smap.create_map(copy.deepcopy(stations))),
+    ]
+    return cases
+
+
+def measure_startup(repeat):
+    """
+    Cold-start cost of one worker: time to import the app (all pages) and the
+    peak RSS afterwards, each in a fresh interpreter. Also records how many
+    MongoClients exist after import, which must be 0 for pre-fork servers.
+    """
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", STARTUP_PROBE],
+            cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+        )
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    durations = [r["seconds"] for r in runs]
+    return {
+        "median_s": statistics.median(durations),
+        "min_s": min(durations),
+        "max_s": max(durations),
+        "max_rss_mb": round(max(r["max_rss_kb"] for r in runs) / 1024, 1),
+        "mongo_clients_at_import": max(r["mongo_clients"] for r in runs),
+    }
+
+
+def _fidas_frame(fidas, params):
+    """Raw per-minute Fidas frame for the figure builder (independent of $dateTrunc support)."""
+    import pandas as pd
+    docs = fidas.collection.find({}, {"_id": 0, "datetime": 1, **{p: 1 for p in params}})
+    return pd.DataFrame(list(docs))
+
+
+def _spectrum(fidas, dt):
+    doc = fidas.fetch_spectrum_doc(dt)
+    return doc["sizes"], doc["spectra"]
+
+
+def run(args):
+    size = dict(synthetic.SIZES[args.size])
+    for key in size:
+        value = getattr(args, key, None)
+        if value is not None:
+            size[key] = value
+
+    client = connect(args.backend, args.uri)
+    db = client[args.db]
+    names = {
+        "stations_info": STATIONS_INFO,
+        "meteo": F1_METEO_COLLECTION,
+        "buoy": BUOY_01_COLLECTION,
+        "fidas": FIDAS_COLLECTION,
+    }
+
+    print(f"Loading synthetic data ({args.size}: {size}) into {args.backend}...")
+    start = time.perf_counter()
+    iot_num = synthetic.load(db, names, size, seed=args.seed)
+    print(f"Loaded in {time.perf_counter() - start:.1f}s")
+
+    results = {}
+    if not args.only or any(pat in "startup.import_app" for pat in args.only):
+        try:
+            results["startup.import_app"] = measure_startup(args.repeat)
+            r = results["startup.import_app"]
+            print(f"  {'startup.import_app':<42} {r['median_s'] * 1000:10.2f} ms "
+                  f"({r['max_rss_mb']} MB RSS, {r['mongo_clients_at_import']} Mongo clients)")
+        except (subprocess.CalledProcessError, ValueError) as e:
+            results["startup.import_app"] = {"skipped": f"{type(e).__name__}: {e}"}
+            print(f"  {'startup.import_app':<42} skipped ({type(e).__name__})")
+
+    for name, fn in build_cases(client, db, iot_num):
+        if args.only and not any(pat in name for pat in args.only):
+            continue
+        try:
+            durations, result = measure(fn, args.repeat)
+        except Exception as e:  # e.g. operators the in-process stand-in lacks
+            results[name] = {"skipped": f"{type(e).__name__}: {e}"}
+            print(f"  {name:<42} skipped ({type(e).__name__})")
+            continue
+        results[name] = {
+            "median_s": statistics.median(durations),
+            "min_s": min(durations),
+            "max_s": max(durations),
+            "items": _size_of(result),
+        }
+        print(f"  {name:<42} {results[name]['median_s'] * 1000:10.2f} ms")
+
+    if args.backend == "mongod" and not args.keep:
+        client.drop_database(args.db)
+    client.close()
+
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": args.backend,
+            "size": args.size,
+            "params": size,
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, tolerance, min_delta):
+    """
+    Print a side-by-side comparison and return the names of regressed cases.
+    A case regresses when it is slower by more than `tolerance` (relative)
+    and by more than `min_delta` seconds (absolute, filters timer noise).
+    """
+    regressions = []
+    base = baseline.get("results", {})
+    if baseline.get("meta", {}).get("params") != current["meta"]["params"]:
+        print("warning: baseline was recorded with different data sizes")
+    print(f"{'case':<42} {'baseline':>12} {'current':>12} {'ratio':>8}")
+    for name, cur in current["results"].items():
+        old = base.get(name)
+        if not old or "median_s" not in old or "median_s" not in cur:
+            continue
+        ratio = cur["median_s"] / old["median_s"] if old["median_s"] else float("inf")
+        flag = ""
+        if ratio > 1 + tolerance and cur["median_s"] - old["median_s"] > min_delta:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 - tolerance:
+            flag = "  faster"
+        print(f"{name:<42} {old['median_s'] * 1000:10.2f}ms {cur['median_s'] * 1000:10.2f}ms "
+              f"{ratio:7.2f}x{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard data paths.")
+    parser.add_argument("--size", choices=sorted(synthetic.SIZES), default="small")
+    for key in synthetic.SIZES["small"]:
+        parser.add_argument(f"--{key.replace('_', '-')}", dest=key, type=int,
+                            help=f"override the preset {key}")
+    parser.add_argument("--backend", choices=["mongomock", "mongod"], default="mongomock")
+    parser.add_argument("--uri", default="mongodb://localhost:27017/",
+                        help="mongod URI (only with --backend mongod)")
+    parser.add_argument("--db", default=BENCH_DB, help="scratch database name")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch database afterwards")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="*", help="only run cases containing these substrings")
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="compare against this JSON baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="relative slowdown that counts as a regression")
+    parser.add_argument("--min-delta", type=float, default=0.002,
+                        help="absolute slowdown in seconds below which changes are ignored")
+    args = parser.parse_args(argv)
+
+    current = run(args)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        print(f"Saved results to {args.save}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.tolerance, args.min_delta)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+# synthetic.py
+"""
+Synthetic data generator for the benchmark suite.
+
+Each generator returns plain documents shaped like the production collections
+(field names, nesting and value types), spaced at the device's cadence and
+ending "now" so that the 6H/1D/1W/... ranges select realistic subsets.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+# Preset sizes; any value can be overridden from the command line
+SIZES = {
+    "small": dict(
+        stations=20, iot_rows=2_000, sensors=2, meteo_rows=2_000,
+        buoy_profiles=300, depth_levels=40, fidas_rows=2_000, fidas_bins=64,
+    ),
+    "medium": dict(
+        stations=100, iot_rows=20_000, sensors=3, meteo_rows=20_000,
+        buoy_profiles=2_000, depth_levels=80, fidas_rows=20_000, fidas_bins=64,
+    ),
+    "large": dict(
+        stations=400, iot_rows=200_000, sensors=4, meteo_rows=200_000,
+        buoy_profiles=10_000, depth_levels=120, fidas_rows=100_000, fidas_bins=64,
+    ),
+}
+
+# Sampling cadence per device type
+IOT_CADENCE   = timedelta(minutes=1)
+METEO_CADENCE = timedelta(minutes=1)
+BUOY_CADENCE  = timedelta(minutes=30)
+FIDAS_CADENCE = timedelta(minutes=1)
+
+DEVICE_TYPES = [
+    "IoTBox", "Meteorological", "Buoy", "Fidas_Palas",
+    "SBNTransect", "JWCruise", "underwater_probe", "coral_reef",
+]
+
+
+def _timestamps(n, cadence, end=None):
+    """n naive-UTC datetimes ending at `end` (default: now), oldest first."""
+    end = (end or datetime.now(timezone.utc)).replace(tzinfo=None, microsecond=0)
+    return [end - cadence * (n - 1 - i) for i in range(n)]
+
+
+def stations_info(n_stations, sensors, iot_station_num=1, seed=0):
+    """
+    Station registry documents. Station `iot_station_num` is the IoT box that
+    gets time-series data; a few stations share coordinates to exercise the
+    co-located marker jitter in StationMap.create_map.
+    """
+    rng = np.random.default_rng(seed)
+    docs = []
+    for i in range(n_stations):
+        num = iot_station_num + i
+        dev = "IoTBox" if i == 0 else DEVICE_TYPES[i % len(DEVICE_TYPES)]
+        lat, lon = 24.3 + rng.random() * 0.5, 54.2 + rng.random() * 0.5
+        if i % 10 == 1 and docs:
+            lat, lon = docs[-1]["lat"], docs[-1]["long"]
+        docs.append({
+            "station_num": num,
+            "id": f"bench-{num}",
+            "name": f"Bench Station {num}",
+            "lat": float(lat),
+            "long": float(lon),
+            "type": dev,
+            "status": "Online" if i % 7 else "Maintenance",
+            "public": bool(i % 2),
+            "sensors": {"OPCN3": sensors, "BME280": sensors} if dev == "IoTBox" else {},
+        })
+    return docs
+
+
+def iot_records(n_rows, sensors, seed=0):
+    """IoT box records with `sensors` OPC and BME sensors plus a GPS fix."""
+    rng = np.random.default_rng(seed)
+    times = _timestamps(n_rows, IOT_CADENCE)
+    pm = rng.gamma(2.0, 12.0, size=(n_rows, sensors))
+    temp = 30 + 6 * rng.standard_normal((n_rows, sensors))
+    docs = []
+    for r, dt in enumerate(times):
+        doc = {"datetime": dt}
+        for s in range(sensors):
+            doc[f"OPCN3+{s}"] = {
+                "index": r,
+                "PM1mass": float(pm[r, s] * 0.4),
+                "PM2,5mass": float(pm[r, s] * 0.7),
+                "PM10mass": float(pm[r, s]),
+                "PM1count": float(pm[r, s] * 30),
+                "sensor_T": 40.0,
+            }
+            doc[f"BME280+{s}"] = {
+                "Temperature": float(temp[r, s]),
+                "Humidity": float(55 + temp[r, s] % 20),
+                "Pressure": float(1008 + temp[r, s] % 5),
+            }
+        doc["gps"] = {"position": [54.37 + r * 1e-6, 24.52 + r * 1e-6]}
+        docs.append(doc)
+    return docs
+
+
+def meteo_records(n_rows, seed=0):
+    """Meteo station records; values arrive as strings as they do in production."""
+    rng = np.random.default_rng(seed)
+    times = _timestamps(n_rows, METEO_CADENCE)
+    base = {
+        "I3_VPOWER": 12.5, "I4_VOUT": 5.0, "S1_RAD": 400.0, "S2_DP[C]": 18.0,
+        "S2_PA": 1008.0, "S2_PREC[MM]": 0.0, "S2_RH[%]": 55.0,
+        "S2_TA[C]": 31.0, "S2_WD": 180.0, "S2_WS[M/S]": 4.0,
+    }
+    noise = rng.standard_normal((n_rows, len(base)))
+    return [
+        {"Timestamp": dt, **{k: f"{v + noise[r, j]:.2f}" for j, (k, v) in enumerate(base.items())}}
+        for r, dt in enumerate(times)
+    ]
+
+
+def buoy_records(n_profiles, depth_levels, seed=0):
+    """
+    Buoy documents: scalar met fields plus CTD profile arrays. The last few
+    levels are zero-depth padding, as trimmed by BuoyGraphs.fetch_profiles.
+    """
+    rng = np.random.default_rng(seed)
+    times = _timestamps(n_profiles, BUOY_CADENCE)
+    pad = max(1, depth_levels // 10)
+    depth = np.round(np.linspace(0.5, 15.0, depth_levels - pad), 2).tolist() + [0.0] * pad
+    n = len(depth)
+    docs = []
+    for dt in times:
+        t = 28 - 0.2 * np.arange(n) + 0.1 * rng.standard_normal(n)
+        docs.append({
+            "datetime": dt,
+            "wind_speed": float(rng.gamma(2.0, 2.0)),
+            "wind_direction": float(rng.uniform(0, 360)),
+            "air_temp": float(30 + rng.standard_normal()),
+            "barometric_pressure": float(1008 + rng.standard_normal()),
+            "albedo": float(rng.uniform(0.05, 0.2)),
+            "depth": depth,
+            "CTD_tmp": t.tolist(),
+            "conductivity": (58 + 0.1 * rng.standard_normal(n)).tolist(),
+            "O2": (200 + 5 * rng.standard_normal(n)).tolist(),
+            "chlorophyll": np.abs(0.5 + 0.2 * rng.standard_normal(n)).tolist(),
+        })
+    return docs
+
+
+def fidas_records(n_rows, bins, seed=0):
+    """Fidas Palas records: scalar fields plus a size spectrum per timestamp."""
+    rng = np.random.default_rng(seed)
+    times = _timestamps(n_rows, FIDAS_CADENCE)
+    sizes = np.round(np.logspace(np.log10(0.18), np.log10(18.0), bins), 4).tolist()
+    shape = np.exp(-np.linspace(0, 8, bins))
+    params = [
+        "PM1", "PM2.5", "PM4", "PM10", "PMtot", "Cn", "rH", "dewT", "T", "p",
+        "Wspeed", "Wdir", "Wq", "prec", "flowrate", "velocity", "coincidence",
+        "po", "IADS_T", "cd", "LED_T",
+    ]
+    values = rng.gamma(2.0, 10.0, size=(n_rows, len(params)))
+    docs = []
+    for r, dt in enumerate(times):
+        doc = {"datetime": dt, **{p: float(values[r, j]) for j, p in enumerate(params)}}
+        doc.update({"ptype": 0, "errors": 0, "mode": 1})
+        doc["sizes"] = sizes
+        doc["spectra"] = (shape * values[r, 0] * 100).tolist()
+        docs.append(doc)
+    return docs
+
+
+def load(db, names, size, seed=0):
+    """
+    Drop and reload every benchmark collection in `db`.
+    `names` maps "stations_info"/"buoy"/"meteo"/"fidas" to collection names.
+    Returns the station number that holds the IoT time series.
+    """
+    iot_num = 1
+    plan = [
+        (names["stations_info"], "station_num",
+         stations_info(size["stations"], size["sensors"], iot_num, seed)),
+        (f"station{iot_num}", "datetime", iot_records(size["iot_rows"], size["sensors"], seed)),
+        (names["meteo"], "Timestamp", meteo_records(size["meteo_rows"], seed)),
+        (names["buoy"], "datetime", buoy_records(size["buoy_profiles"], size["depth_levels"], seed)),
+        (names["fidas"], "datetime", fidas_records(size["fidas_rows"], size["fidas_bins"], seed)),
+    ]
+    for name, index_field, docs in plan:
+        db.drop_collection(name)
+        for start in range(0, len(docs), 10_000):
+            db[name].insert_many(docs[start:start + 10_000])
+        db[name].create_index(index_field)
+    return iot_num
@@ -0,0 +1,122 @@
+# database.py
+"""
+Lazily created, per-process MongoDB clients.
+
+MongoClient starts background monitor threads and a connection pool as soon as
+it is constructed, and neither survives a fork. Data-layer objects therefore do
+not open a client in __init__; they ask get_client() on first use, which hands
+out one shared client per (process, URI). A child process forked from a parent
+that already had clients transparently gets fresh ones.
+"""
+
+import os
+import threading
+
+from pymongo import MongoClient
+
+import async_db
+from settings import MONGO_URI, DB_NAME
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def get_client(uri=None):
+    """Return this process's shared MongoClient for `uri` (default: config.ini)."""
+    uri = uri or MONGO_URI
+    key = (os.getpid(), uri)
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                # never touch clients inherited from a parent process
+                for stale in [k for k in _clients if k[0] != key[0]]:
+                    del _clients[stale]
+                client = _clients[key] = MongoClient(uri)
+    return client
+
+
+def get_db(db_name=None, uri=None):
+    return get_client(uri)[db_name or DB_NAME]
+
+
+def reset_clients():
+    """
+    Forget every client held by this process, closing the ones it created.
+    Call from post-fork hooks; the next get_client() opens a fresh pool.
+    """
+    pid = os.getpid()
+    with _lock:
+        for key in list(_clients):
+            client = _clients.pop(key)
+            if key[0] == pid:
+                client.close()
+
+
+class MongoResource:
+    """
+    Mixin for data-layer classes: `client`, `db` and `collection` resolve on
+    first access to the per-process client. Each can still be assigned
+    explicitly (e.g. the benchmark points them at a scratch database).
+    """
+
+    def _init_mongo(self, mongo_uri=None, db_name=None, collection_name=None):
+        self._mongo_uri = mongo_uri
+        self._db_name = db_name
+        self._collection_name = collection_name
+        self._client = self._db = self._collection = None
+
+    @property
+    def client(self):
+        if self._client is not None:
+            return self._client
+        return get_client(self._mongo_uri)
+
+    @client.setter
+    def client(self, value):
+        self._client = value
+
+    @property
+    def db(self):
+        if self._db is not None:
+            return self._db
+        return self.client[self._db_name or DB_NAME]
+
+    @db.setter
+    def db(self, value):
+        self._db = value
+
+    @property
+    def collection(self):
+        if self._collection is not None:
+            return self._collection
+        return self.db[self._collection_name]
+
+    @collection.setter
+    def collection(self, value):
+        self._collection = value
+
+    def find_one_many(self, queries):
+        """
+        Concurrent find_one queries, see async_db.find_one_many. Objects pointed
+        at an explicitly assigned client/db run them one after another instead.
+        """
+        if self._client is not None or self._db is not None:
+            return [
+                self.db[c].find_one(f or {}, p, sort=s) for c, f, p, s in queries
+            ]
+        return async_db.find_one_many(queries, self._db_name, self._mongo_uri)
+
+    def aggregate_many(self, jobs):
+        """Concurrent aggregations, see async_db.aggregate_many (sequential as above)."""
+        if self._client is not None or self._db is not None:
+            return [list(self.db[c].aggregate(p, allowDiskUse=True)) for c, p in jobs]
+        return async_db.aggregate_many(jobs, self._db_name, self._mongo_uri)
+
+    def close_connection(self):
+        # the shared client belongs to the process (see reset_clients); only
+        # close a client that was assigned to this object explicitly
+        if self._client is not None:
+            self._client.close()
+            self._client = None
@@ -0,0 +1,47 @@
+# downloads.py
+"""
+Streamed CSV downloads of IoT box history.
+
+"Download CSV" on the data page builds the file inside the callback. When a
+raw download's period is over the row budget (row_budget.py), the page sends
+the browser to
+
+    /download/station<N>.csv?range=<date range>&param=<parameter>&param=...
+
+instead. The rows are written CHUNK_ROWS at a time as MongoDB returns them
+(IoTGraphs.csv_chunks), so the worker never holds the whole period.
+"""
+
+from urllib.parse import urlencode
+
+import flask
+
+from graphs.iot_graphs import IoTGraphs, TIME_DELTAS
+
+
+def stream_url(station_num, date_range, parameters):
+    return f"/download/station{station_num}.csv?" + urlencode(
+        [("range", date_range)] + [("param", p) for p in parameters]
+    )
+
+
+def install_downloads(app):
+    """Serve the streamed CSV downloads on app.server."""
+    server = app.server
+    iot_graphs = IoTGraphs()
+
+    @server.route("/download/station<int:station_num>.csv")
+    def _station_csv(station_num):
+        date_range = flask.request.args.get("range", "1W")
+        parameters = flask.request.args.getlist("param")
+        if date_range not in TIME_DELTAS and date_range != "All":
+            flask.abort(400)
+        if not parameters:
+            parameters = list(iot_graphs.get_full_sensor_parameters(station_num))
+        return flask.Response(
+            flask.stream_with_context(iot_graphs.csv_chunks(station_num, date_range, parameters)),
+            mimetype="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="station{station_num}.csv"'},
+        )
+
+    return app
@@ -0,0 +1,195 @@
+# ensure_indexes.py
+"""
+Create the indexes the dashboard queries depend on and verify them with explain().
+
+Collections are discovered from the stations_info collection (one station{N}
+per IoT box) and from config.ini (buoy, meteo, Fidas). For each collection the
+real query shapes used by the pages are explained and any collection scan
+(COLLSCAN) or in-memory sort (SORT) is reported.
+
+Usage:
+    python ensure_indexes.py              # create missing indexes, then verify
+    python ensure_indexes.py --check      # verify only, do not create anything
+"""
+
+import argparse
+import sys
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ASCENDING, MongoClient
+
+from settings import (
+    MONGO_URI, DB_NAME, STATIONS_INFO,
+    BUOY_01_COLLECTION, F1_METEO_COLLECTION, FIDAS_COLLECTION,
+)
+
+# Plan stages that mean the query is not served by an index
+BAD_STAGES = {
+    "COLLSCAN": "collection scan",
+    "SORT": "in-memory sort",
+}
+
+
+def discover_collections(db):
+    """
+    Return {collection_name: [index field, ...]} for every collection the app reads.
+    """
+    wanted = {STATIONS_INFO: ["station_num", "id"]}
+    for s in db[STATIONS_INFO].find({"station_num": {"$ne": None}}, {"_id": 0, "station_num": 1}):
+        wanted[f"station{s['station_num']}"] = ["datetime"]
+    wanted[BUOY_01_COLLECTION]  = ["datetime"]
+    wanted[FIDAS_COLLECTION]    = ["datetime"]
+    wanted[F1_METEO_COLLECTION] = ["Timestamp"]
+    return wanted
+
+
+def has_index_on(collection, field):
+    """True if an existing index has `field` as its leading key."""
+    for info in collection.index_information().values():
+        keys = info.get("key", [])
+        if keys and keys[0][0] == field:
+            return True
+    return False
+
+
+def ensure_indexes(db, wanted, create=True):
+    """
+    Create any missing single-field index. Returns a list of (collection, field, action).
+    """
+    actions = []
+    existing = set(db.list_collection_names())
+    for name, fields in wanted.items():
+        if name not in existing:
+            actions.append((name, None, "missing collection"))
+            continue
+        coll = db[name]
+        for field in fields:
+            if has_index_on(coll, field):
+                actions.append((name, field, "ok"))
+            elif create:
+                coll.create_index([(field, ASCENDING)])
+                actions.append((name, field, "created"))
+            else:
+                actions.append((name, field, "missing"))
+    return actions
+
+
+def query_shapes(name, fields):
+    """
+    Return [(label, kind, spec)] describing the queries the app runs on a collection.
+    kind is "find" (filter, sort) or "aggregate" (pipeline).
+    """
+    since = datetime.now(timezone.utc) - timedelta(days=1)
+    if name == STATIONS_INFO:
+        return [
+            ("find_one by station_num", "find", ({"station_num": 1}, None)),
+            ("find_one by id", "find", ({"id": ""}, None)),
+        ]
+    tf = fields[0]
+    shapes = [
+        (f"range on {tf}", "find", ({tf: {"$gte": since}}, None)),
+        (f"earliest {tf}", "find", ({tf: {"$exists": True}}, [(tf, 1)])),
+        (f"latest {tf}", "find", ({tf: {"$exists": True}}, [(tf, -1)])),
+    ]
+    if name == BUOY_01_COLLECTION:
+        shapes.append(("time series pipeline", "aggregate", [
+            {"$match": {"datetime": {"$gte": since}}},
+            {"$sort": {"datetime": 1}},
+        ]))
+    if name == FIDAS_COLLECTION:
+        shapes.append(("list datetimes", "find", ({"datetime": {"$gte": since}}, [("datetime", 1)])))
+        shapes.append(("spectrum by datetime", "find", ({"datetime": since}, None)))
+        shapes.append(("binned time series", "aggregate", [
+            {"$match": {"datetime": {"$gte": since}}},
+            {"$group": {"_id": {"$dateTrunc": {"date": "$datetime", "unit": "hour", "binSize": 1}}}},
+        ]))
+    return shapes
+
+
+def plan_stages(plan):
+    """Yield every `stage` value found anywhere in an explain() document."""
+    if isinstance(plan, dict):
+        for key, value in plan.items():
+            if key == "stage" and isinstance(value, str):
+                yield value
+            else:
+                yield from plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from plan_stages(item)
+
+
+def explain_query(db, name, kind, spec):
+    """Run explain() for one query shape and return the offending plan stages."""
+    coll = db[name]
+    if kind == "aggregate":
+        plan = db.command("aggregate", name, pipeline=spec, explain=True)
+    else:
+        filt, sort = spec
+        cursor = coll.find(filt).limit(1)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.explain()
+    # only the chosen plan matters, rejected candidates may legitimately scan
+    for section in ("rejectedPlans", "allPlansExecution"):
+        _strip_key(plan, section)
+    return sorted({s for s in plan_stages(plan) if s in BAD_STAGES})
+
+
+def _strip_key(doc, key):
+    if isinstance(doc, dict):
+        doc.pop(key, None)
+        for value in doc.values():
+            _strip_key(value, key)
+    elif isinstance(doc, list):
+        for item in doc:
+            _strip_key(item, key)
+
+
+def verify(db, wanted):
+    """
+    Explain every query shape. Returns a list of (collection, label, [bad stages]).
+    """
+    problems = []
+    existing = set(db.list_collection_names())
+    for name, fields in wanted.items():
+        if name not in existing:
+            continue
+        for label, kind, spec in query_shapes(name, fields):
+            bad = explain_query(db, name, kind, spec)
+            status = ", ".join(BAD_STAGES[s] for s in bad) if bad else "indexed"
+            print(f"  {name:<28} {label:<28} {status}")
+            if bad:
+                problems.append((name, label, bad))
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Provision and verify dashboard indexes.")
+    parser.add_argument("--check", action="store_true",
+                        help="only verify, do not create missing indexes")
+    args = parser.parse_args(argv)
+
+    client = MongoClient(MONGO_URI)
+    try:
+        db = client[DB_NAME]
+        wanted = discover_collections(db)
+
+        print("Indexes:")
+        for name, field, action in ensure_indexes(db, wanted, create=not args.check):
+            print(f"  {name:<28} {field or '-':<28} {action}")
+
+        print("Query plans:")
+        problems = verify(db, wanted)
+    finally:
+        client.close()
+
+    if problems:
+        print(f"{len(problems)} query shape(s) not fully served by an index.")
+        return 1
+    print("All query shapes are served by an index.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,26 +3,23 @@
 import os
 import math
 from datetime import datetime, timedelta
+from functools import partial
 
 import pandas as pd
 import numpy as np
 import gsw
 import plotly.graph_objects as go
 
-from pymongo import MongoClient
 from dateutil.relativedelta import relativedelta
-import configparser
 
-# Load configuration
-config = configparser.ConfigParser()
-config_path = os.path.join(os.path.dirname(__file__),
-                           '../config', 'config.ini')
-config.read(config_path)
-
-# Retrieve MongoDB settings
-MONGO_URI          = config.get('mongodb', 'uri')
-DB_NAME            = config.get('mongodb', 'database')
-BUOY_01_COLLECTION = config.get('mongodb', 'buoy_01_collection')
+from database import MongoResource
+from history_cache import history_cache, cache_key
+from schemas import compact
+from sharding import cursor_frame
+from single_flight import single_flight
+from warmer import warmed
+from settings import MONGO_URI, DB_NAME, BUOY_01_COLLECTION
+from graphs.encoding import typed_values, typed_matrix, epoch_ms, DATE_AXIS
 
 # Offset for Gulf Standard Time
 GST_OFFSET = timedelta(hours=4)
@@ -32,14 +29,13 @@ BUOY_LAT = 24.992
 BUOY_LON = 54.350
 
 
-class BuoyGraphs:
+class BuoyGraphs(MongoResource):
     def __init__(self,
                  mongo_uri: str = MONGO_URI,
                  db_name: str = DB_NAME,
                  collection_name: str = BUOY_01_COLLECTION):
-        self.client     = MongoClient(mongo_uri)
-        self.db         = self.client[db_name]
-        self.collection = self.db[collection_name]
+        # client/db/collection are opened lazily, once per process
+        self._init_mongo(mongo_uri, db_name, collection_name)
 
         # Ranges for filtering
         self.deltas = {
@@ -89,6 +85,8 @@ class BuoyGraphs:
     def _utc_now(self) -> datetime:
         return datetime.utcnow()
 
+    @warmed
+    @single_flight
     def fetch_time_series(self,
                           date_range: str,
                           selected_params: list[str],
@@ -98,19 +96,30 @@ class BuoyGraphs:
         Does NOT drop zero-values here (zero-filtering happens per-parameter in plotting).
         """
         now = self._utc_now()
-        pipeline = []
-        if date_range in self.deltas:
-            cutoff = now - self.deltas[date_range]
-            pipeline.append({"$match": {"datetime": {"$gte": cutoff}}})
-        pipeline.append({"$sort": {"datetime": 1}})
-        docs = list(self.collection.aggregate(pipeline, allowDiskUse=True))
-        if not docs:
+        cutoff = now - self.deltas[date_range] if date_range in self.deltas else None
+        params = sorted(set(selected_params))
+
+        def fetch(lo, hi):
+            bounds = {k: v for k, v in (("$gte", lo), ("$lt", hi)) if v is not None}
+            pipeline = [{"$match": {"datetime": bounds}}] if bounds else []
+            pipeline += [
+                {"$sort": {"datetime": 1}},
+                {"$project": {"_id": 0, "datetime": 1, **{p: 1 for p in params}}},
+            ]
+            cursor = self.collection.aggregate(pipeline, allowDiskUse=True)
+            return cursor_frame(cursor, finish=partial(compact, device_type="Buoy"))
+
+        # settled days come from the on-disk cache (see history_cache.py)
+        df = history_cache.read_through(cache_key(self.collection.name, params), "datetime", cutoff, fetch)
+        if df.empty:
             return pd.DataFrame()
 
-        df = pd.DataFrame(docs)[["datetime"] + selected_params]
+        df = compact(df.reindex(columns=["datetime"] + selected_params), "Buoy")
         df["datetime"] += GST_OFFSET
         return df
 
+    @warmed
+    @single_flight
     def fetch_profiles(self,
                        date_range: str
                        ) -> tuple[list[datetime], list[dict]]:
@@ -238,7 +247,7 @@ class BuoyGraphs:
                     step = math.ceil(len(dfi)/50000)
                     dfi = dfi.iloc[::step]
                 fig = go.Figure(go.Scattergl(
-                    x=dfi["datetime"], y=dfi[p],
+                    x=epoch_ms(dfi["datetime"]), y=typed_values(dfi[p]),
                     mode="markers",
                     marker=dict(size=6, color=self.param_colors.get(p)),
                     name=self.param_labels[p]
@@ -246,6 +255,7 @@ class BuoyGraphs:
                 fig.update_layout(
                     title=self.param_labels[p],
                     xaxis_title="Time (GST, UTC+04:00)",
+                    xaxis=DATE_AXIS,
                     yaxis_title=self.param_labels[p],
                     template="plotly_white",
                     margin={"l":40,"r":20,"t":40,"b":40},
@@ -272,7 +282,7 @@ class BuoyGraphs:
         zmin, zmax = (min(flat), max(flat)) if flat else (0, 1)
 
         fig = go.Figure(go.Heatmap(
-            x=times, y=depths, z=z,
+            x=epoch_ms(times), y=typed_values(depths), z=typed_matrix(z),
             colorscale="Viridis", zmin=zmin, zmax=zmax,
             xgap=1, ygap=1, showscale=True,
             hovertemplate=(
@@ -284,6 +294,7 @@ class BuoyGraphs:
         fig.update_layout(
             title=self.param_labels[param],
             xaxis_title="Time (GST, UTC+04:00)",
+            xaxis=DATE_AXIS,
             yaxis=dict(autorange="reversed"),
             template="plotly_white",
             margin={"l":40,"r":20,"t":40,"b":40},
@@ -0,0 +1,188 @@
+# compare_graphs.py
+
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import plotly.graph_objects as go
+
+from database import MongoResource
+from graphs.encoding import typed_values, epoch_ms, DATE_AXIS
+from graphs.iot_graphs import IoTGraphs
+from row_budget import finest_bucket
+from settings import MONGO_URI, DB_NAME, STATIONS_INFO, F1_METEO_COLLECTION, FIDAS_COLLECTION
+from station_stats import STATS_COLLECTION, all_stats
+
+GST = timezone(timedelta(hours=4))
+
+# At most this many points per station; the bucket size grows with the period
+MAX_POINTS = 1500
+
+RANGES = {
+    "1D": timedelta(days=1),
+    "1W": timedelta(weeks=1),
+    "1M": timedelta(days=30),
+    "6M": timedelta(days=180),
+    "1Y": timedelta(days=365),
+}
+
+# Quantities that can be compared: IoT box parameter names (lower case) and
+# the matching meteo station and Fidas fields (None where not measured)
+QUANTITIES = {
+    "PM2.5": {"label": "PM2.5 Mass (µg/m³)", "iot": ["pm2,5mass", "pm2.5mass"], "meteo": None, "fidas": "PM2.5"},
+    "PM10": {"label": "PM10 Mass (µg/m³)", "iot": ["pm10mass"], "meteo": None, "fidas": "PM10"},
+    "PM1": {"label": "PM1 Mass (µg/m³)", "iot": ["pm1mass"], "meteo": None, "fidas": "PM1"},
+    "Temperature": {"label": "Temperature (°C)", "iot": ["temperature"], "meteo": "S2_TA[C]", "fidas": "T"},
+    "Humidity": {"label": "Relative Humidity (%)", "iot": ["humidity"], "meteo": "S2_RH[%]", "fidas": "rH"},
+    "Pressure": {"label": "Atmospheric Pressure (hPa)", "iot": ["pressure"], "meteo": "S2_PA", "fidas": "p"},
+}
+
+
+def bucket_for(span_seconds):
+    """Finest (binSize, unit) that keeps a span under MAX_POINTS buckets."""
+    return finest_bucket(span_seconds, MAX_POINTS)
+
+
+def number_field(field):
+    """Top-level field as a double; works for names with dots (Fidas) and numeric strings (meteo)."""
+    return {"$convert": {"input": {"$getField": field}, "to": "double", "onError": None, "onNull": None}}
+
+
+class CompareGraphs(MongoResource):
+    """
+    One parameter across many stations on a common time axis.
+
+    Every station is bucketed by MongoDB ($dateTrunc, GST-aligned) with the
+    same bucket size, so the series line up without resampling in pandas,
+    and all stations are aggregated concurrently (see async_db).
+    """
+
+    def __init__(self):
+        self._init_mongo(MONGO_URI, DB_NAME)
+        self.iot_graphs = IoTGraphs()
+
+    def station_options(self):
+        """Dropdown options: every IoT box, then the meteo station and Fidas."""
+        boxes = self.db[STATIONS_INFO].find(
+            {"type": "IoTBox", "station_num": {"$ne": None}},
+            {"_id": 0, "station_num": 1, "name": 1}
+        ).sort("station_num", 1)
+        options = [
+            {"label": b.get("name") or f"IoT Box {b['station_num']}", "value": f"iot:{b['station_num']}"}
+            for b in boxes
+        ]
+        if F1_METEO_COLLECTION:
+            options.append({"label": "Meteorological Station", "value": "meteo"})
+        if FIDAS_COLLECTION:
+            options.append({"label": "Fidas Palas 200S", "value": "fidas"})
+        return options
+
+    def iot_fields(self, station_nums, aliases):
+        """
+        {station_num: ["<sensor>.<param>", ...]} for the parameter in every
+        sensor of each box. Field names come from the station_stats last values
+        (one query); boxes without stats fall back to IoTGraphs' sensor lookup.
+        """
+        names = {f"station{n}": n for n in station_nums}
+        fields = {}
+        for doc in self.db[STATS_COLLECTION].find({"_id": {"$in": list(names)}}, {"last_values": 1}):
+            fields[names[doc["_id"]]] = [
+                key for key in doc.get("last_values", {})
+                if key.count(".") == 1 and key.split(".")[1].lower() in aliases
+            ]
+        for n in station_nums:
+            if not fields.get(n):
+                full_params = self.iot_graphs.get_full_sensor_parameters(n)
+                fields[n] = [
+                    key for base, sensors in full_params.items() if base.lower() in aliases
+                    for key, _ in sensors
+                ]
+        return fields
+
+    @staticmethod
+    def _pipeline(time_field, value, start, bucket):
+        size, unit = bucket
+        match = {time_field: {"$gte": start}} if start else {time_field: {"$type": "date"}}
+        return [
+            {"$match": match},
+            {"$group": {
+                "_id": {"$dateTrunc": {
+                    "date": f"${time_field}", "unit": unit, "binSize": size, "timezone": "+04:00"
+                }},
+                "v": {"$avg": value},
+            }},
+            {"$match": {"v": {"$ne": None}}},
+            {"$sort": {"_id": 1}},
+        ]
+
+    def _start(self, date_range, collections):
+        """Start of the period; for "All" the earliest sample among the collections."""
+        now = datetime.now(timezone.utc)
+        if date_range in RANGES:
+            return now - RANGES[date_range], now
+        stats = all_stats(self.db)
+        earliest = [stats[c]["earliest"] for c in collections if stats.get(c, {}).get("earliest")]
+        if not earliest:
+            return None, now
+        return min(earliest).replace(tzinfo=timezone.utc), now
+
+    def fetch_comparison(self, stations, quantity, date_range):
+        """
+        DataFrame with a GST DateTime column and one column per station
+        (labelled as in `stations`, a {value: label} dict), or an empty frame.
+        """
+        spec = QUANTITIES[quantity]
+        iot_nums = [int(v.split(":", 1)[1]) for v in stations if v.startswith("iot:")]
+        iot_fields = self.iot_fields(iot_nums, spec["iot"]) if iot_nums else {}
+
+        # (station value, collection, time field, value expression)
+        targets = []
+        for v in stations:
+            if v.startswith("iot:"):
+                keys = iot_fields.get(int(v.split(":", 1)[1]))
+                if keys:
+                    targets.append((v, f"station{v.split(':', 1)[1]}", "datetime",
+                                    {"$avg": [f"${k}" for k in keys]}))
+            elif v == "meteo" and spec["meteo"] and F1_METEO_COLLECTION:
+                targets.append((v, F1_METEO_COLLECTION, "Timestamp", number_field(spec["meteo"])))
+            elif v == "fidas" and spec["fidas"] and FIDAS_COLLECTION:
+                targets.append((v, FIDAS_COLLECTION, "datetime", number_field(spec["fidas"])))
+        if not targets:
+            return pd.DataFrame()
+
+        start, end = self._start(date_range, [c for _, c, _, _ in targets])
+        span = (end - start).total_seconds() if start else RANGES["1Y"].total_seconds()
+        bucket = bucket_for(span)
+        results = self.aggregate_many([
+            (collection, self._pipeline(field, value, start, bucket))
+            for _, collection, field, value in targets
+        ])
+
+        series = [
+            pd.Series([d["v"] for d in docs], index=pd.DatetimeIndex([d["_id"] for d in docs]),
+                      name=stations[v], dtype="float64")
+            for (v, _, _, _), docs in zip(targets, results) if docs
+        ]
+        if not series:
+            return pd.DataFrame()
+        # same bucket boundaries for every station, so this is an exact alignment
+        df = pd.concat(series, axis=1).sort_index()
+        df.index = df.index.tz_localize(timezone.utc).tz_convert(GST)
+        return df.rename_axis("DateTime").reset_index()
+
+    def create_comparison_figure(self, df, quantity):
+        label = QUANTITIES[quantity]["label"]
+        fig = go.Figure()
+        x = epoch_ms(df["DateTime"])
+        for col in df.columns:
+            if col == "DateTime":
+                continue
+            fig.add_trace(go.Scatter(x=x, y=typed_values(df[col]), mode="lines", name=col, connectgaps=False))
+        fig.update_layout(
+            title=f"{label} by Station",
+            xaxis=DATE_AXIS, xaxis_title="DateTime (GST)",
+            yaxis_title=label,
+            template="plotly_white",
+            legend=dict(orientation="h", yanchor="bottom", y=-0.25, xanchor="center", x=0.5),
+            margin={"l": 40, "r": 20, "t": 40, "b": 40},
+        )
+        return fig
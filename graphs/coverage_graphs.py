@@ -0,0 +1,253 @@
+# coverage_graphs.py
+
+import math
+from datetime import datetime, timezone
+
+import numpy as np
+import plotly.graph_objects as go
+
+from database import MongoResource
+from graphs.encoding import typed_values, epoch_ms, DATE_AXIS
+from settings import MONGO_URI, DB_NAME
+from single_flight import single_flight
+from station_stats import STATS_COLLECTION
+
+# A pause longer than GAP_FACTOR x the local sampling interval (and at least
+# MIN_GAP_SECONDS) is a data gap
+GAP_FACTOR = 3
+MIN_GAP_SECONDS = 120
+# Neighbouring intervals whose sampling interval differs by less than this
+# ratio are reported as one interval
+RATE_TOLERANCE = 1.5
+# Number of neighbouring gaps averaged to estimate the local sampling interval;
+# segments shorter than this are transitions between two rates
+CADENCE_WINDOW = 10
+
+
+class CoverageGraphs(MongoResource):
+    """
+    Data coverage of a collection over its full history: the intervals in
+    which samples arrived, their sampling interval, and the gaps between them.
+
+    Intervals are computed in MongoDB ($setWindowFields with $shift on the
+    time field) and cached in the collection's station_stats document; later
+    calls only re-aggregate from the start of the last cached interval.
+    """
+
+    def __init__(self):
+        self._init_mongo(MONGO_URI, DB_NAME)
+
+    def interval_pipeline(self, time_field, since=None):
+        match = {time_field: {"$type": "date"}}
+        if since is not None:
+            match[time_field]["$gte"] = since
+        window = lambda lo, hi: {"documents": [lo, hi]}
+        return [
+            {"$match": match},
+            {"$project": {"_id": 0, "t": f"${time_field}"}},
+            {"$setWindowFields": {
+                "sortBy": {"t": 1},
+                "output": {"prev": {"$shift": {"output": "$t", "by": -1}}},
+            }},
+            {"$set": {"gap": {"$cond": [
+                {"$eq": ["$prev", None]},
+                None,
+                {"$divide": [{"$subtract": ["$t", "$prev"]}, 1000]},
+            ]}}},
+            # sampling interval just before and just after each sample
+            {"$setWindowFields": {
+                "sortBy": {"t": 1},
+                "output": {
+                    "before": {"$avg": "$gap", "window": window(-CADENCE_WINDOW, -1)},
+                    "after": {"$avg": "$gap", "window": window(1, CADENCE_WINDOW)},
+                },
+            }},
+            # a gap is a pause that is long compared to the sampling on both sides,
+            # so a change to a slower rate is not mistaken for one
+            {"$set": {"brk": {"$cond": [
+                {"$or": [
+                    {"$eq": ["$gap", None]},
+                    {"$and": [
+                        {"$gt": ["$gap", MIN_GAP_SECONDS]},
+                        {"$gt": ["$gap", {"$multiply": [{"$ifNull": ["$before", "$gap"]}, GAP_FACTOR]}]},
+                        {"$gt": ["$gap", {"$multiply": [{"$ifNull": ["$after", "$gap"]}, GAP_FACTOR]}]},
+                    ]},
+                ]},
+                1, 0,
+            ]}}},
+            {"$set": {"inner_gap": {"$cond": [{"$eq": ["$brk", 1]}, None, "$gap"]}}},
+            # local sampling rate class (powers of two seconds) to detect rate changes
+            {"$setWindowFields": {
+                "sortBy": {"t": 1},
+                "output": {"local": {
+                    "$avg": "$inner_gap", "window": window(-CADENCE_WINDOW // 2, CADENCE_WINDOW // 2)
+                }},
+            }},
+            {"$set": {"rate": {"$cond": [
+                {"$eq": ["$local", None]},
+                None,
+                {"$round": [{"$log": [{"$max": ["$local", 1]}, 2]}, 0]},
+            ]}}},
+            {"$setWindowFields": {
+                "sortBy": {"t": 1},
+                "output": {"prev_rate": {"$shift": {"output": "$rate", "by": -1}}},
+            }},
+            # a new interval starts after every gap and wherever the rate class changes
+            {"$setWindowFields": {
+                "sortBy": {"t": 1},
+                "output": {"segment": {
+                    "$sum": {"$cond": [
+                        {"$or": [{"$eq": ["$brk", 1]}, {"$ne": ["$rate", "$prev_rate"]}]}, 1, 0
+                    ]},
+                    "window": {"documents": ["unbounded", "current"]},
+                }},
+            }},
+            {"$group": {
+                "_id": "$segment",
+                "start": {"$min": "$t"},
+                "end": {"$max": "$t"},
+                "count": {"$sum": 1},
+                "cadence": {"$avg": "$inner_gap"},
+            }},
+            {"$sort": {"start": 1}},
+            {"$project": {"_id": 0, "start": 1, "end": 1, "count": 1, "cadence": 1}},
+        ]
+
+    @staticmethod
+    def is_gap(a, b):
+        """True if the pause between intervals a and b is a data gap."""
+        sep = (b["start"] - a["end"]).total_seconds()
+        return (
+            sep > MIN_GAP_SECONDS
+            and sep > GAP_FACTOR * (a["cadence"] or 0)
+            and sep > GAP_FACTOR * (b["cadence"] or 0)
+        )
+
+    @classmethod
+    def compact(cls, segments):
+        """
+        Merge neighbouring segments that are not separated by a gap and sample
+        at a similar rate. Transition segments (fewer than CADENCE_WINDOW
+        samples) are folded into the previous interval.
+        """
+        out = []
+        for seg in segments:
+            seg = dict(seg)
+            if out and not cls.is_gap(out[-1], seg):
+                prev = out[-1]
+                cads = [c for c in (prev["cadence"], seg["cadence"]) if c]
+                same_rate = len(cads) < 2 or abs(math.log(cads[0] / cads[1])) < math.log(RATE_TOLERANCE)
+                if same_rate or min(prev["count"], seg["count"]) < CADENCE_WINDOW:
+                    n1, n2 = prev["count"], seg["count"]
+                    if prev["cadence"] and seg["cadence"]:
+                        prev["cadence"] = (prev["cadence"] * n1 + seg["cadence"] * n2) / (n1 + n2)
+                    else:
+                        prev["cadence"] = prev["cadence"] or seg["cadence"]
+                    prev["end"] = seg["end"]
+                    prev["count"] = n1 + n2
+                    continue
+            out.append(seg)
+        return out
+
+    def cached_intervals(self, collection_name):
+        """(cached intervals, whether they reach the newest sample); ([], False) before the first computation."""
+        cached = self.db[STATS_COLLECTION].find_one({"_id": collection_name}, {"coverage": 1, "latest": 1}) or {}
+        intervals = cached.get("coverage") or []
+        fresh = bool(intervals) and cached.get("latest") is not None and intervals[-1]["end"] >= cached["latest"]
+        return intervals, fresh
+
+    @single_flight
+    def get_intervals(self, collection_name, time_field):
+        """
+        Cached coverage intervals [{start, end, count, cadence}], brought up to
+        date. The first computation aggregates the whole history (minutes for
+        years of minute data), so the page runs it as a background callback.
+        """
+        stats_coll = self.db[STATS_COLLECTION]
+        intervals, fresh = self.cached_intervals(collection_name)
+        if fresh:
+            return intervals
+
+        # re-aggregate from the start of the last (possibly still growing) interval
+        since = intervals[-1]["start"] if intervals else None
+        fresh = list(self.db[collection_name].aggregate(
+            self.interval_pipeline(time_field, since), allowDiskUse=True
+        ))
+        intervals = self.compact(intervals[:-1] + fresh) if since else self.compact(fresh)
+        stats_coll.update_one(
+            {"_id": collection_name},
+            {"$set": {"coverage": intervals, "coverage_updated_at": datetime.now(timezone.utc)}},
+            upsert=True,
+        )
+        return intervals
+
+    @staticmethod
+    def summarize(intervals):
+        """Totals shown above the timeline."""
+        if not intervals:
+            return {}
+        span = (intervals[-1]["end"] - intervals[0]["start"]).total_seconds()
+        covered = sum((i["end"] - i["start"]).total_seconds() for i in intervals)
+        gaps = [
+            (b["start"] - a["end"]).total_seconds()
+            for a, b in zip(intervals, intervals[1:])
+            if CoverageGraphs.is_gap(a, b)
+        ]
+        return {
+            "first": intervals[0]["start"],
+            "last": intervals[-1]["end"],
+            "samples": sum(i["count"] for i in intervals),
+            "coverage_pct": 100 * covered / span if span else 100.0,
+            "gaps": len(gaps),
+            "longest_gap_hours": max(gaps, default=0) / 3600,
+        }
+
+    def create_coverage_figures(self, intervals):
+        figs = []
+        if not intervals:
+            return figs
+        starts = [i["start"] for i in intervals]
+        ends = [i["end"] for i in intervals]
+        cadence = typed_values([i["cadence"] for i in intervals])
+        start_ms = epoch_ms(starts)
+        # at least a minute wide so single-sample intervals stay visible
+        width = np.maximum(epoch_ms(ends) - start_ms, 60_000)
+
+        timeline = go.Figure(go.Bar(
+            base=start_ms, x=width, y=["Data"] * len(intervals),
+            orientation="h",
+            marker=dict(color=cadence, colorscale="Viridis", showscale=True,
+                        colorbar=dict(title="Interval (s)")),
+            customdata=np.column_stack([cadence, typed_values([i["count"] for i in intervals])]),
+            hovertemplate=(
+                "From %{base|%Y-%m-%d %H:%M}<br>"
+                "Samples: %{customdata[1]:.0f}<br>"
+                "Sampling interval: %{customdata[0]:.0f} s<extra></extra>"
+            ),
+        ))
+        timeline.update_layout(
+            title="Data Coverage (gaps are blank)",
+            xaxis=DATE_AXIS, xaxis_title="DateTime (UTC)",
+            template="plotly_white", height=220,
+            margin={"l": 40, "r": 20, "t": 40, "b": 40},
+        )
+        figs.append(timeline)
+
+        # sampling interval as a step line, broken at every gap
+        x, y = [], []
+        for i in intervals:
+            x += [i["start"], i["end"], None]
+            y += [i["cadence"], i["cadence"], None]
+        rate = go.Figure(go.Scatter(
+            x=epoch_ms(x), y=typed_values(y), mode="lines", connectgaps=False,
+            name="Sampling interval",
+        ))
+        rate.update_layout(
+            title="Sampling Interval",
+            xaxis=DATE_AXIS, xaxis_title="DateTime (UTC)",
+            yaxis_title="Seconds between samples", yaxis_type="log",
+            template="plotly_white",
+            margin={"l": 40, "r": 20, "t": 40, "b": 40},
+        )
+        figs.append(rate)
+        return figs
@@ -0,0 +1,44 @@
+# encoding.py
+
+import numpy as np
+import pandas as pd
+
+# Plotly (>= 6) serialises NumPy arrays as base64 typed arrays ({"dtype", "bdata"})
+# instead of JSON lists, which is both faster to encode and much smaller on the wire.
+# Plotly.js has no 64-bit integer typed array, so time axes are sent as float64
+# epoch milliseconds and flagged with DATE_AXIS so they still render as dates.
+
+DATE_AXIS = dict(type="date")
+
+
+def typed_values(values, dtype="float32"):
+    """
+    Return measurement values as a contiguous NumPy array (float32 by default).
+    Non-numeric entries and None become NaN, which Plotly renders as gaps.
+    """
+    arr = pd.to_numeric(pd.Series(values), errors="coerce")
+    return np.ascontiguousarray(arr.to_numpy(dtype=dtype, na_value=np.nan))
+
+
+def epoch_ms(values):
+    """
+    Return datetimes as float64 milliseconds since the epoch.
+    Timezone-aware values keep their wall-clock time (e.g. GST stays GST),
+    matching how Plotly displays ISO strings with an offset.
+    """
+    ts = pd.Series(pd.to_datetime(pd.Series(values)))
+    if getattr(ts.dt, "tz", None) is not None:
+        ts = ts.dt.tz_localize(None)
+    ms = ts.to_numpy(dtype="datetime64[ms]").astype("int64").astype("float64")
+    ms[ts.isna().to_numpy()] = np.nan
+    return ms
+
+
+def typed_matrix(rows, dtype="float32"):
+    """
+    Return a 2-D list of values (None for missing) as a NumPy matrix for heatmaps.
+    """
+    return np.array(
+        [[np.nan if v is None else v for v in row] for row in rows],
+        dtype=dtype
+    )
@@ -1,33 +1,29 @@
 # fidas_graphs.py
 
-from pymongo import MongoClient
 from datetime import datetime, timezone
 from dateutil.relativedelta import relativedelta
 import pandas as pd
 import plotly.graph_objects as go
-import configparser
-import os
 
-# Load configuration
-config = configparser.ConfigParser()
-config_path = os.path.join(os.path.dirname(__file__), '../config', 'config.ini')
-config.read(config_path)
+from database import MongoResource
+from sharding import read_frame
+from history_cache import history_cache, cache_key
+from schemas import compact
+from single_flight import single_flight
+from warmer import warmed
+from station_stats import get_stats
+from settings import MONGO_URI, DB_NAME, FIDAS_COLLECTION
+from graphs.encoding import typed_values, epoch_ms, DATE_AXIS
 
-# Retrieve MongoDB settings
-MONGO_URI = config.get('mongodb', 'uri')
-DB_NAME   = config.get('mongodb', 'database')
-FIDAS_COLLECTION = config.get('mongodb', 'fidas_collection')
-
-class FidasGraphs:
+class FidasGraphs(MongoResource):
     def __init__(
         self,
         mongo_uri: str = MONGO_URI,
         db_name: str = DB_NAME,
         collection_name: str = FIDAS_COLLECTION
     ):
-        self.client = MongoClient(mongo_uri)
-        self.db = self.client[db_name]
-        self.collection = self.db[collection_name]
+        # client/db/collection are opened lazily, once per process
+        self._init_mongo(mongo_uri, db_name, collection_name)
 
         # All scalar fields
         self.scalar_params = [
@@ -65,7 +61,7 @@ class FidasGraphs:
             "hIdx_nws":"Heat Index (°C)","wbgt":"WBGT (°C)"
         }
 
-    def list_datetimes(self, date_range: str):
+    def _period_filter(self, date_range: str):
         now = datetime.now(timezone.utc)
         deltas = {
             "6H":  relativedelta(hours=6),
@@ -77,9 +73,16 @@ class FidasGraphs:
             "6M":  relativedelta(months=6),
             "1Y":  relativedelta(years=1),
         }
-        filt = {}
         if date_range in deltas:
-            filt = {"datetime": {"$gte": now - deltas[date_range]}}
+            return {"datetime": {"$gte": now - deltas[date_range]}}
+        return {}
+
+    def list_datetimes(self, date_range: str):
+        filt = self._period_filter(date_range)
+        if not filt:
+            # full history: read time shards in parallel (see sharding.py)
+            df = read_frame(self, self.collection.name, "datetime", {"_id":0,"datetime":1})
+            return [t.to_pydatetime() for t in df["datetime"]] if not df.empty else []
         cursor = (
             self.collection
                 .find(filt, {"_id":0,"datetime":1})
@@ -87,6 +90,33 @@ class FidasGraphs:
         )
         return [doc["datetime"] for doc in cursor]
 
+    def latest_datetime(self, date_range: str):
+        """Newest timestamp in the period (what list_datetimes(...)[-1] returned)."""
+        stats = get_stats(self.collection.name, self.db)
+        if stats and stats.get("latest") is not None:
+            # the newest timestamp overall is also the newest in any period ending now
+            since = self._period_filter(date_range).get("datetime", {}).get("$gte")
+            latest = stats["latest"]
+            if since is None or latest.replace(tzinfo=timezone.utc) >= since:
+                return latest
+        doc = self.collection.find_one(
+            self._period_filter(date_range),
+            {"_id":0,"datetime":1},
+            sort=[("datetime", -1)]
+        )
+        return doc["datetime"] if doc else None
+
+    def first_datetime_on(self, day, date_range: str):
+        """First timestamp on calendar day `day` within the period, or None."""
+        start = datetime(day.year, day.month, day.day)
+        filt = self._period_filter(date_range)
+        bounds = {"$gte": start, "$lt": start + relativedelta(days=1)}
+        filt = {"$and": [filt, {"datetime": bounds}]} if filt else {"datetime": bounds}
+        doc = self.collection.find_one(filt, {"_id":0,"datetime":1}, sort=[("datetime", 1)])
+        return doc["datetime"] if doc else None
+
+    @warmed
+    @single_flight
     def fetch_time_series(
         self,
         date_range: str,
@@ -104,11 +134,10 @@ class FidasGraphs:
             "6M":  relativedelta(months=6),
             "1Y":  relativedelta(years=1),
         }
-        match_stage = {}
-        if date_range in deltas:
-            match_stage = {"$match": {"datetime": {"$gte": now - deltas[date_range]}}}
+        start = now - deltas[date_range] if date_range in deltas else None
 
-        # sanitize field names (no dots!)
+        # sanitize field names (no dots!); read them with $getField, since
+        # "$PM2.5" would be the nested path PM2 -> 5
         mapping = {p: p.replace(".", "_") for p in selected_params}
 
         # choose bin unit
@@ -122,26 +151,66 @@ class FidasGraphs:
             elif span.days >= 30:   unit = "day"
             else:                   unit = "hour"
 
+        if not history_cache.enabled:
+            # without the cache MongoDB averages straight into the buckets
+            group_stage = {"$group": {"_id": {
+                "$dateTrunc": {"date": "$datetime", "unit": unit, "binSize": 1}
+            }}}
+            for orig, safe in mapping.items():
+                group_stage["$group"][safe] = {"$avg": {"$getField": orig}}
+            pipeline = [{"$match": {"datetime": {"$gte": start}}}] if start else []
+            pipeline += [group_stage, {"$sort": {"_id": 1}}]
+            result = list(self.collection.aggregate(pipeline, allowDiskUse=True))
+            if not result:
+                return pd.DataFrame()
+            df = pd.DataFrame(result).rename(columns={"_id": "datetime", **{s: o for o, s in mapping.items()}})
+            return compact(df, "Fidas_Palas")
+
+        if start is not None:
+            # whole hours, so the cached hourly buckets are never partial
+            start = start.replace(minute=0, second=0, microsecond=0)
+
+        # hourly sums and counts; they add up exactly to any coarser bucket
         group_stage = {"$group": {"_id": {
-            "$dateTrunc": {"date": "$datetime", "unit": unit, "binSize": 1}
+            "$dateTrunc": {"date": "$datetime", "unit": "hour", "binSize": 1}
         }}}
-        # add sanitized avg fields
         for orig, safe in mapping.items():
-            group_stage["$group"][safe] = {"$avg": f"${orig}"}
+            group_stage["$group"][f"{safe}_sum"] = {"$sum": {"$getField": orig}}
+            group_stage["$group"][f"{safe}_n"] = {
+                "$sum": {"$cond": [{"$isNumber": {"$getField": orig}}, 1, 0]}
+            }
 
-        pipeline = []
-        if match_stage:
-            pipeline.append(match_stage)
-        pipeline += [group_stage, {"$sort": {"_id": 1}}]
+        def fetch(lo, hi):
+            bounds = {k: v for k, v in (("$gte", lo), ("$lt", hi)) if v is not None}
+            pipeline = [{"$match": {"datetime": bounds}}] if bounds else []
+            pipeline += [group_stage, {"$sort": {"_id": 1}}]
+            hours = pd.DataFrame(list(self.collection.aggregate(pipeline, allowDiskUse=True)))
+            if not hours.empty:
+                hours["_id"] = pd.to_datetime(hours["_id"])
+            return hours
 
-        result = list(self.collection.aggregate(pipeline, allowDiskUse=True))
-        if not result:
+        # settled days come from the on-disk cache (see history_cache.py)
+        key = cache_key(self.collection.name, group_stage)
+        hours = history_cache.read_through(key, "_id", start, fetch)
+        if hours.empty:
             return pd.DataFrame()
 
-        df = pd.DataFrame(result)
-        # rename _id to datetime, safe -> orig
-        df = df.rename(columns={"_id": "datetime", **{s: o for o,s in mapping.items()}})
-        return df
+        # roll the hours up to $dateTrunc's buckets (UTC; weeks start on Sunday)
+        t = hours["_id"]
+        if unit == "hour":
+            bucket = t
+        elif unit == "day":
+            bucket = t.dt.floor("D")
+        elif unit == "week":
+            bucket = t.dt.floor("D") - pd.to_timedelta((t.dt.dayofweek + 1) % 7, unit="D")
+        else:
+            bucket = t.dt.to_period("M").dt.to_timestamp()
+        sums = hours.groupby(bucket).sum(numeric_only=True)
+        df = pd.DataFrame({
+            orig: sums[f"{safe}_sum"] / sums[f"{safe}_n"].where(sums[f"{safe}_n"] > 0)
+            for orig, safe in mapping.items()
+        }, index=sums.index)
+        return compact(df.rename_axis("datetime").reset_index(), "Fidas_Palas")
 
     def fetch_spectrum_doc(self, dt: datetime):
         return self.collection.find_one(
@@ -151,17 +220,21 @@ class FidasGraphs:
 
     def create_time_series_figures(self, df: pd.DataFrame, selected_params: list):
         figs = []
+        if df.empty:
+            return figs
+        x = epoch_ms(df["datetime"])
         for p in selected_params:
             if p in df.columns:
                 fig = go.Figure()
                 fig.add_trace(go.Scatter(
-                    x=df["datetime"], y=df[p],
+                    x=x, y=typed_values(df[p]),
                     mode="markers",
                     name=self.param_labels[p]
                 ))
                 fig.update_layout(
                     title=self.param_labels[p],
                     xaxis_title="DateTime",
+                    xaxis=DATE_AXIS,
                     yaxis_title=self.param_labels[p],
                     template="plotly_white",
                     margin={"l":40,"r":20,"t":40,"b":40}
@@ -171,7 +244,9 @@ class FidasGraphs:
 
     def create_spectrum_figure(self, sizes, spectra):
         fig = go.Figure()
-        fig.add_trace(go.Scatter(x=sizes, y=spectra, mode="lines+markers"))
+        fig.add_trace(go.Scatter(
+            x=typed_values(sizes), y=typed_values(spectra), mode="lines+markers"
+        ))
         fig.update_layout(
             xaxis_type="log", yaxis_type="log",
             xaxis_title="Size (µm)",
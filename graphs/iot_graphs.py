@@ -1,29 +1,59 @@
 # iot_graphs.py
 
-from pymongo import MongoClient
 import pandas as pd
 import plotly.graph_objects as go
 from datetime import datetime, timedelta, timezone
-
-import configparser
-import os
-
-# Load configuration
-config = configparser.ConfigParser()
-config_path = os.path.join(os.path.dirname(__file__), '../config', 'config.ini')
-config.read(config_path)
-
-# Retrieve MongoDB settings
-MONGO_URI = config.get('mongodb', 'uri')
-DB_NAME   = config.get('mongodb', 'database')
-STATIONS_INFO = config.get('mongodb', 'stations_info_collection')
-
-
-class IoTGraphs:
+from functools import partial
+
+from graphs.encoding import typed_values, epoch_ms, DATE_AXIS
+
+from database import MongoResource
+from sharding import read_frame, cursor_frame, cursor_chunks
+from history_cache import history_cache, cache_key
+from row_budget import estimate_rows, coarse_bucket
+from schemas import compact
+from single_flight import single_flight
+from warmer import warmed
+from settings import MONGO_URI, DB_NAME, STATIONS_INFO
+
+TIME_DELTAS = {
+    "6H": timedelta(hours=6),
+    "12H": timedelta(hours=12),
+    "1D": timedelta(days=1),
+    "1W": timedelta(weeks=1),
+    "1M": timedelta(days=30),
+    "6M": timedelta(days=180),
+    "1Y": timedelta(days=365)
+}
+
+
+def flatten_record(selected_full, record):
+    """
+    One station document -> a row with DateTime, one column per selected
+    "<sensor>.<param>" key and the GPS position. Module level so that
+    sharded reads can run it in worker processes.
+    """
+    entry = {"DateTime": record.get("datetime")}
+    for base_param, sensor_list in selected_full.items():
+        for full_key, _ in sensor_list:
+            smk, ssk = full_key.split(".", 1)
+            sensor_data = record.get(smk, {})
+            if isinstance(sensor_data, dict) and ssk in sensor_data:
+                val = sensor_data[ssk]
+                if isinstance(val, (int, float)):
+                    entry[full_key] = val
+    gps = record.get("gps", {})
+    if isinstance(gps, dict) and "position" in gps:
+        pos = gps["position"]
+        if isinstance(pos, list) and len(pos) >= 2:
+            entry["Longitude"], entry["Latitude"] = pos[0], pos[1]
+    return entry
+
+
+class IoTGraphs(MongoResource):
     def __init__(self):
-        """Initialize MongoDB connection"""
-        self.client = MongoClient(MONGO_URI)
-        self.db = self.client[DB_NAME]
+        """MongoDB connection is opened lazily on first query"""
+        self._init_mongo(MONGO_URI, DB_NAME)
 
     def _format_param_label(self, param):
         """
@@ -53,36 +83,48 @@ class IoTGraphs:
         # Default: convert underscores to spaces and title-case the string.
         return param.replace("_", " ").title()
 
-    def get_available_parameters(self, station_num):
+    def _sensor_documents(self, station_num):
         """
-        Retrieve unique base parameters available from sensors,
-        in a fixed preferred order.
+        Yield (sensor_type, index, sensor_key, sensor_data) for every sensor
+        listed in stations_info, reading each sensor's sub-document from the
+        station collection. The per-sensor reads run concurrently.
         """
         station_info = self.db[STATIONS_INFO].find_one(
             {"station_num": station_num}, {"sensors": 1}
         )
         if not station_info or "sensors" not in station_info:
-            return {}
+            return
+
+        sensors = [
+            (sensor_type, i, f"{sensor_type}+{i}")
+            for sensor_type, count in station_info["sensors"].items()
+            for i in range(count)
+        ]
+        documents = self.find_one_many([
+            (f"station{station_num}", {}, {"_id": 0, "datetime": 1, sensor_key: 1}, None)
+            for _, _, sensor_key in sensors
+        ])
+        for (sensor_type, i, sensor_key), document in zip(sensors, documents):
+            if not document or sensor_key not in document:
+                continue
+            yield sensor_type, i, sensor_key, document[sensor_key]
 
+    def get_available_parameters(self, station_num):
+        """
+        Retrieve unique base parameters available from sensors,
+        in a fixed preferred order.
+        """
         params_set = set()
         exclude_params = {"PM1count", "PM2,5count", "PM10count"}
-        for sensor_type, count in station_info["sensors"].items():
-            for i in range(count):
-                sensor_key = f"{sensor_type}+{i}"
-                document = self.db[f"station{station_num}"].find_one(
-                    {}, {"_id": 0, "datetime": 1, sensor_key: 1}
-                )
-                if not document or sensor_key not in document:
-                    continue
-                sensor_data = document[sensor_key]
-                if isinstance(sensor_data, dict):
-                    for param, value in sensor_data.items():
-                        if (
-                            isinstance(value, (int, float))
-                            and param not in ["index", "sensor_T", "sensor_RH"]
-                            and param not in exclude_params
-                        ):
-                            params_set.add(param)
+        for sensor_type, i, sensor_key, sensor_data in self._sensor_documents(station_num):
+            if isinstance(sensor_data, dict):
+                for param, value in sensor_data.items():
+                    if (
+                        isinstance(value, (int, float))
+                        and param not in ["index", "sensor_T", "sensor_RH"]
+                        and param not in exclude_params
+                    ):
+                        params_set.add(param)
 
         param_map = {param: self._format_param_label(param) for param in params_set}
         desired_order = [
@@ -105,171 +147,199 @@ class IoTGraphs:
 
         return ordered_param_map
 
+    @staticmethod
+    def default_parameters(parameters):
+        """Parameters selected when a station page opens: PM2.5, or else all of them."""
+        return [key for key in parameters if "PM2,5" in key] or list(parameters)
+
     def get_full_sensor_parameters(self, station_num):
         """
         Retrieve full sensor parameters mapping.
         """
-        station_info = self.db[STATIONS_INFO].find_one(
-            {"station_num": station_num}, {"sensors": 1}
-        )
         full_params = {}
-        if not station_info or "sensors" not in station_info:
-            return full_params
-
-        for sensor_type, count in station_info["sensors"].items():
-            for i in range(count):
-                sensor_key = f"{sensor_type}+{i}"
-                document = self.db[f"station{station_num}"].find_one(
-                    {}, {"_id": 0, "datetime": 1, sensor_key: 1}
-                )
-                if not document or sensor_key not in document:
-                    continue
-                sensor_data = document[sensor_key]
-                if isinstance(sensor_data, dict):
-                    for param, value in sensor_data.items():
-                        if (
-                            isinstance(value, (int, float))
-                            and param not in ["index", "sensor_T", "sensor_RH"]
-                        ):
-                            base_param = param
-                            full_key = f"{sensor_key}.{param}"
-                            sensor_label = (
-                                f"{self._format_param_label(param)} - "
-                                f"{sensor_type.replace('_', ' ').title()} {i+1}"
-                            )
-                            full_params.setdefault(base_param, []).append((full_key, sensor_label))
+        for sensor_type, i, sensor_key, sensor_data in self._sensor_documents(station_num):
+            if isinstance(sensor_data, dict):
+                for param, value in sensor_data.items():
+                    if (
+                        isinstance(value, (int, float))
+                        and param not in ["index", "sensor_T", "sensor_RH"]
+                    ):
+                        base_param = param
+                        full_key = f"{sensor_key}.{param}"
+                        sensor_label = (
+                            f"{self._format_param_label(param)} - "
+                            f"{sensor_type.replace('_', ' ').title()} {i+1}"
+                        )
+                        full_params.setdefault(base_param, []).append((full_key, sensor_label))
 
         return full_params
 
-    def fetch_station_data(self, station_num, date_range, selected_parameters, split_view):
-        """
-        Fetch station data in UTC+4 (GST) instead of UTC.
-        """
-        now = datetime.now(timezone.utc)
-        time_deltas = {
-            "6H": timedelta(hours=6),
-            "12H": timedelta(hours=12),
-            "1D": timedelta(days=1),
-            "1W": timedelta(weeks=1),
-            "1M": timedelta(days=30),
-            "6M": timedelta(days=180),
-            "1Y": timedelta(days=365)
+    @staticmethod
+    def _gps_fields():
+        return {
+            name: {"$cond": [
+                {"$isArray": "$gps.position"},
+                {"$arrayElemAt": ["$gps.position", i]},
+                "$$REMOVE",
+            ]}
+            for name, i in (("Longitude", 0), ("Latitude", 1))
         }
-        start_time = now - time_deltas.get(date_range, timedelta(days=1))
-        station_collection = self.db[f"station{station_num}"]
-        query_filter = {"datetime": {"$gte": start_time}} if date_range != "All" else {}
 
+    @staticmethod
+    def combined_stages(selected_full):
+        """
+        $project computing, per timestamp, the mean of each selected parameter
+        across all sensors that report it (one column per parameter), plus the
+        GPS position. Non-numeric and missing readings are ignored, as in
+        flatten_record.
+        """
+        project = {"_id": 0, "DateTime": "$datetime"}
+        for base_param, sensor_list in selected_full.items():
+            project[base_param] = {"$avg": [f"${full_key}" for full_key, _ in sensor_list]}
+        project.update(IoTGraphs._gps_fields())
+        return [{"$project": project}]
+
+    @staticmethod
+    def bucketed_stages(selected_full, split_view, bucket):
+        """
+        Stages averaging the rows into GST-aligned time buckets (bucket is a
+        ($dateTrunc binSize, unit) pair), and {output field: frame column}.
+        Split view fields are renamed afterwards: $group output names cannot
+        contain the dot of "<sensor>.<param>".
+        """
         if split_view:
-            full_params = self.get_full_sensor_parameters(station_num)
-            selected_full = {
-                bp: full_params[bp]
-                for bp in selected_parameters
-                if bp in full_params
-            }
-            projection = {"_id": 0, "datetime": 1, **{
-                key.split('.')[0]: 1
-                for lst in selected_full.values()
-                for key, _ in lst
-            }, "gps": 1}
-
-            cursor = station_collection.find(query_filter, projection)
-            data = []
-            for record in cursor:
-                entry = {"DateTime": record.get("datetime")}
-                for base_param, sensor_list in selected_full.items():
-                    for full_key, _ in sensor_list:
-                        smk, ssk = full_key.split(".", 1)
-                        sensor_data = record.get(smk, {})
-                        if isinstance(sensor_data, dict) and ssk in sensor_data:
-                            val = sensor_data[ssk]
-                            if isinstance(val, (int, float)):
-                                entry[full_key] = val
-                gps = record.get("gps", {})
-                if isinstance(gps, dict) and "position" in gps:
-                    pos = gps["position"]
-                    if isinstance(pos, list) and len(pos) >= 2:
-                        entry["Longitude"], entry["Latitude"] = pos[0], pos[1]
-                data.append(entry)
-
-            df = pd.DataFrame(data)
-            if not df.empty:
-                df["DateTime"] = pd.to_datetime(df["DateTime"])
-                # convert timestamps from UTC to UTC+4 (GST)
-                df["DateTime"] = df["DateTime"].apply(
-                    lambda dt: dt.replace(tzinfo=timezone.utc)
-                                 .astimezone(timezone(timedelta(hours=4)))
-                )
-                df = df.sort_values(by="DateTime")
-            return df
-
+            keys = [full_key for sensor_list in selected_full.values() for full_key, _ in sensor_list]
+            names = {f"c{i}": full_key for i, full_key in enumerate(keys)}
+            stages = [{"$project": {
+                "_id": 0, "DateTime": "$datetime",
+                **{field: f"${full_key}" for field, full_key in names.items()},
+                **IoTGraphs._gps_fields(),
+            }}]
         else:
-            full_params = self.get_full_sensor_parameters(station_num)
-            selected_full = {
-                bp: full_params[bp]
-                for bp in selected_parameters
-                if bp in full_params
-            }
-            projection = {"_id": 0, "datetime": 1, **{
-                key.split('.')[0]: 1
-                for lst in selected_full.values()
-                for key, _ in lst
-            }, "gps": 1}
-
-            cursor = station_collection.find(query_filter, projection)
-            data = []
-            for record in cursor:
-                entry = {"DateTime": record.get("datetime")}
-                for base_param, sensor_list in selected_full.items():
-                    for full_key, _ in sensor_list:
-                        smk, ssk = full_key.split(".", 1)
-                        sensor_data = record.get(smk, {})
-                        if isinstance(sensor_data, dict) and ssk in sensor_data:
-                            val = sensor_data[ssk]
-                            if isinstance(val, (int, float)):
-                                entry[full_key] = val
-                gps = record.get("gps", {})
-                if isinstance(gps, dict) and "position" in gps:
-                    pos = gps["position"]
-                    if isinstance(pos, list) and len(pos) >= 2:
-                        entry["Longitude"], entry["Latitude"] = pos[0], pos[1]
-                data.append(entry)
-
-            df = pd.DataFrame(data)
-            if not df.empty:
-                df["DateTime"] = pd.to_datetime(df["DateTime"])
-                # convert timestamps from UTC to UTC+4 (GST)
-                df["DateTime"] = df["DateTime"].apply(
-                    lambda dt: dt.replace(tzinfo=timezone.utc)
-                                 .astimezone(timezone(timedelta(hours=4)))
-                )
-                df = df.sort_values(by="DateTime")
-
-            return self.combine_sensors_for_parameters(df)
-
-    def combine_sensors_for_parameters(self, df):
+            names = {base_param: base_param for base_param in selected_full}
+            stages = IoTGraphs.combined_stages(selected_full)
+        size, unit = bucket
+        fields = [*names, "Longitude", "Latitude"]
+        return stages + [
+            {"$group": {
+                "_id": {"$dateTrunc": {"date": "$DateTime", "unit": unit, "binSize": size, "timezone": "+04:00"}},
+                **{field: {"$avg": f"${field}"} for field in fields},
+            }},
+            {"$project": {"_id": 0, "DateTime": "$_id", **{field: 1 for field in fields}}},
+            {"$sort": {"DateTime": 1}},
+        ], names
+
+    @staticmethod
+    def _projection(selected_full):
+        return {"_id": 0, "datetime": 1, **{
+            key.split('.')[0]: 1
+            for lst in selected_full.values()
+            for key, _ in lst
+        }, "gps": 1}
+
+    def _selected_full(self, station_num, selected_parameters):
+        full_params = self.get_full_sensor_parameters(station_num)
+        return {bp: full_params[bp] for bp in selected_parameters if bp in full_params}
+
+    @staticmethod
+    def period(date_range, window=None):
+        """(start, end) in UTC of a view; start None for "All", end None for up to now."""
+        if window:
+            return window
+        if date_range == "All":
+            return None, None
+        return datetime.now(timezone.utc) - TIME_DELTAS.get(date_range, timedelta(days=1)), None
+
+    def plan_resolution(self, station_num, date_range, window=None):
         """
-        Combine sensor readings by averaging; preserves DateTime (UTC+4).
+        (bucket, estimated rows) of a view: bucket is None while the period
+        fits the row budget, else the time bucket to average it into (see
+        row_budget.py).
         """
-        if df.empty:
-            return df
-        combined_df = pd.DataFrame()
-        combined_df["DateTime"] = df["DateTime"]
-        grouped = {}
-        for col in df.columns:
-            if col == "DateTime":
-                continue
-            parts = col.split('.')
-            if len(parts) == 2:
-                grouped.setdefault(parts[1], []).append(col)
-
-        for param, cols in grouped.items():
-            combined_df[param] = df[cols].mean(axis=1)
-
-        for loc in ["Longitude", "Latitude"]:
-            if loc in df.columns:
-                combined_df[loc] = df[loc]
+        start, end = self.period(date_range, window)
+        rows, span = estimate_rows(self.db, f"station{station_num}", "datetime", start, end)
+        return coarse_bucket(rows, span), rows
 
-        return combined_df
+    @warmed
+    @single_flight
+    def fetch_station_data(self, station_num, date_range, selected_parameters, split_view, window=None, bucket=None):
+        """
+        Fetch station data in UTC+4 (GST) instead of UTC. Without split_view
+        the sensors are averaged by MongoDB, so only one column per parameter
+        is transferred. window: (start, end) in UTC to read instead of the
+        date range; bucket: time bucket to average the rows into, from
+        plan_resolution().
+        """
+        start_time, end_time = self.period(date_range, window)
+        collection_name = f"station{station_num}"
+
+        selected_full = self._selected_full(station_num, selected_parameters)
+        projection = self._projection(selected_full)
+        stages = None if split_view else self.combined_stages(selected_full)
+
+        decode = None if stages else partial(flatten_record, selected_full)
+        # float32 values, datetime64 times (see schemas.py), applied as the rows arrive
+        finish = partial(compact, device_type="IoTBox")
+
+        def fetch(lo, hi):
+            bounds = {k: v for k, v in (("$gte", lo), ("$lt", hi)) if v is not None}
+            query = {"datetime": bounds} if bounds else {}
+            if lo is None:
+                # full history: read time shards in parallel (see sharding.py)
+                return read_frame(
+                    self, collection_name, "datetime", projection,
+                    decode=decode, query=query, stages=stages, finish=finish
+                )
+            if stages:
+                cursor = self.db[collection_name].aggregate([{"$match": query}, *stages], allowDiskUse=True)
+            else:
+                cursor = self.db[collection_name].find(query, projection)
+            return cursor_frame(cursor, decode, finish)
+
+        if bucket:
+            # over the row budget: MongoDB averages the period into time buckets
+            bucketed, names = self.bucketed_stages(selected_full, split_view, bucket)
+            bounds = {k: v for k, v in (("$gte", start_time), ("$lt", end_time)) if v is not None}
+            cursor = self.db[collection_name].aggregate(
+                [{"$match": {"datetime": bounds} if bounds else {}}, *bucketed], allowDiskUse=True
+            )
+            df = cursor_frame(cursor, None, finish).rename(columns=names)
+        elif window:
+            df = fetch(start_time, end_time)
+        else:
+            # settled days come from the on-disk cache (see history_cache.py)
+            key = cache_key(collection_name, stages or [projection, selected_full])
+            df = history_cache.read_through(key, "DateTime", start_time, fetch)
+
+        if not df.empty:
+            # concatenated pieces may differ in dtype where a column was missing
+            df = compact(df, "IoTBox")
+            # convert timestamps from UTC to UTC+4 (GST)
+            df["DateTime"] = df["DateTime"].dt.tz_localize(timezone.utc).dt.tz_convert(timezone(timedelta(hours=4)))
+            df = df.sort_values(by="DateTime", ignore_index=True)
+        return df
+
+    def csv_chunks(self, station_num, date_range, selected_parameters):
+        """
+        Split-view rows of a period as CSV text, oldest first and CHUNK_ROWS
+        rows at a time (the header comes with the first chunk), for downloads
+        too large to build as one frame.
+        """
+        start_time, end_time = self.period(date_range)
+        selected_full = self._selected_full(station_num, selected_parameters)
+        columns = ["DateTime", *(key for lst in selected_full.values() for key, _ in lst), "Longitude", "Latitude"]
+        bounds = {k: v for k, v in (("$gte", start_time), ("$lt", end_time)) if v is not None}
+        cursor = self.db[f"station{station_num}"].find(
+            {"datetime": bounds} if bounds else {}, self._projection(selected_full)
+        ).sort("datetime", 1)
+        header = True
+        for chunk in cursor_chunks(cursor, partial(flatten_record, selected_full), partial(compact, device_type="IoTBox")):
+            chunk = chunk.reindex(columns=columns)
+            chunk["DateTime"] = chunk["DateTime"].dt.tz_localize(timezone.utc).dt.tz_convert(timezone(timedelta(hours=4)))
+            yield chunk.to_csv(index=False, header=header)
+            header = False
+        if header:
+            yield ",".join(columns) + "\n"
 
     def aggregate_data(self, df, freq):
         """Aggregate data based on the selected frequency."""
@@ -289,6 +359,7 @@ class IoTGraphs:
             return figures
 
         legend = dict(orientation="h", yanchor="bottom", y=-0.25, xanchor="center", x=0.5)
+        x = epoch_ms(df["DateTime"])
 
         if split_view:
             base_to_keys = {}
@@ -305,8 +376,8 @@ class IoTGraphs:
                 keys = base_to_keys.get(bp, [])
                 for i, key in enumerate(keys):
                     fig.add_trace(go.Scatter(
-                        x=df["DateTime"],
-                        y=df[key],
+                        x=x,
+                        y=typed_values(df[key]),
                         mode="markers",
                         name=f"{param_mapping.get(bp, bp)} - Sensor {i+1}",
                         marker=dict(color=palette[i % len(palette)], size=3)
@@ -317,7 +388,8 @@ class IoTGraphs:
                     yaxis_title=param_mapping.get(bp, bp),
                     margin={"l": 40, "r": 40, "t": 40, "b": 40},
                     template="plotly_white",
-                    legend=legend
+                    legend=legend,
+                    xaxis=DATE_AXIS
                 )
                 figures.append(fig)
         else:
@@ -325,8 +397,8 @@ class IoTGraphs:
                 if bp in df.columns:
                     fig = go.Figure()
                     fig.add_trace(go.Scatter(
-                        x=df["DateTime"],
-                        y=df[bp],
+                        x=x,
+                        y=typed_values(df[bp]),
                         mode="markers",
                         name=param_mapping.get(bp, bp),
                         marker=dict(color="black", size=3)
@@ -337,7 +409,8 @@ class IoTGraphs:
                         yaxis_title=param_mapping.get(bp, bp),
                         margin={"l": 40, "r": 40, "t": 40, "b": 40},
                         template="plotly_white",
-                        legend=legend
+                        legend=legend,
+                        xaxis=DATE_AXIS
                     )
                     figures.append(fig)
 
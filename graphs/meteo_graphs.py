@@ -5,26 +5,20 @@ import dash_daq as daq
 import pandas as pd
 import plotly.graph_objects as go
 from datetime import datetime, timedelta, timezone
-import configparser
-import os
+from functools import partial
+from graphs.encoding import typed_values, epoch_ms, DATE_AXIS
+from database import MongoResource
+from sharding import read_frame, cursor_frame
+from history_cache import history_cache, cache_key
+from schemas import compact
+from single_flight import single_flight
+from warmer import warmed
+from settings import MONGO_URI, DB_NAME, F1_METEO_COLLECTION
 
-# Load configuration
-config = configparser.ConfigParser()
-config_path = os.path.join(os.path.dirname(__file__), '../config', 'config.ini')
-config.read(config_path)
 
-# Retrieve MongoDB settings
-MONGO_URI = config.get('mongodb', 'uri')
-DB_NAME   = config.get('mongodb', 'database')
-F1_METEO_COLLECTION = config.get('mongodb', 'f1_meteo_collection')
-
-
-class meteostationGraphs:
+class meteostationGraphs(MongoResource):
     def __init__(self):
-        from pymongo import MongoClient
-        self.client = MongoClient(MONGO_URI)
-        self.db = self.client[DB_NAME]
-        self.collection = self.db[F1_METEO_COLLECTION]
+        self._init_mongo(MONGO_URI, DB_NAME, F1_METEO_COLLECTION)
         self.label_map = {
             "I3_VPOWER": "Voltage Power (V)",
             "I4_VOUT": "Voltage Output (V)",
@@ -41,6 +35,8 @@ class meteostationGraphs:
     def _format_param_label(self, param):
         return self.label_map.get(param, param)
     
+    @warmed
+    @single_flight
     def fetch_data(self, date_range="1D"):
         now = datetime.now(timezone.utc)
         time_deltas = {
@@ -52,17 +48,22 @@ class meteostationGraphs:
             "6M": timedelta(days=180),
             "1Y": timedelta(days=365)
         }
-        if date_range != "All":
-            start_time = now - time_deltas.get(date_range, timedelta(days=1))
-            query = {"Timestamp": {"$gte": start_time}}
-        else:
-            query = {}
-        cursor = self.collection.find(query, {"_id": 0})
-        data = list(cursor)
-        df = pd.DataFrame(data)
+        # numeric strings become float32 as the rows arrive
+        finish = partial(compact, device_type="Meteorological")
+
+        def fetch(lo, hi):
+            bounds = {k: v for k, v in (("$gte", lo), ("$lt", hi)) if v is not None}
+            query = {"Timestamp": bounds} if bounds else {}
+            if lo is None:
+                # full history: read time shards in parallel (see sharding.py)
+                return read_frame(self, self.collection.name, "Timestamp", {"_id": 0}, query=query, finish=finish)
+            return cursor_frame(self.collection.find(query, {"_id": 0}), finish=finish)
+
+        # settled days come from the on-disk cache (see history_cache.py)
+        start_time = None if date_range == "All" else now - time_deltas.get(date_range, timedelta(days=1))
+        df = history_cache.read_through(cache_key(self.collection.name), "Timestamp", start_time, fetch)
         if not df.empty:
-            df["Timestamp"] = pd.to_datetime(df["Timestamp"])
-            df = df.sort_values("Timestamp")
+            df = compact(df, "Meteorological").sort_values("Timestamp", ignore_index=True)
         return df
 
     def aggregate_data(self, df, freq):
@@ -92,12 +93,13 @@ class meteostationGraphs:
             xanchor="center",
             x=0.5
         )
+        x = epoch_ms(df["Timestamp"])
         for param in selected_parameters:
             if param in df.columns:
                 fig = go.Figure()
                 fig.add_trace(go.Scatter(
-                    x=df["Timestamp"],
-                    y=df[param],
+                    x=x,
+                    y=typed_values(df[param]),
                     mode="markers",
                     name=self._format_param_label(param),
                     marker=dict(size=5)
@@ -114,10 +116,8 @@ class meteostationGraphs:
                     yaxis_title=self._format_param_label(param),
                     margin={"l": 40, "r": 40, "t": 40, "b": 40},
                     template="plotly_white",
-                    legend=legend_settings
+                    legend=legend_settings,
+                    xaxis=DATE_AXIS
                 )
                 figures.append(fig)
         return figures
-
-    def close_connection(self):
-        self.client.close()
\ No newline at end of file
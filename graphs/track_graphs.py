@@ -0,0 +1,176 @@
+# track_graphs.py
+
+import numpy as np
+import pandas as pd
+import dash_leaflet as dl
+from plotly.colors import sample_colorscale
+
+from graphs.iot_graphs import IoTGraphs
+
+# Vertices kept per track after simplification
+TRACK_POINTS = 2000
+# Colour bins; the track is drawn as one multi-polyline per bin
+COLOR_BINS = 12
+TRACK_COLORSCALE = "Viridis"
+
+
+def _farthest(x, y, starts, ends):
+    """
+    For each segment (starts[i], ends[i]) the interior point farthest from its
+    chord and that distance (-1 for segments without interior points), computed
+    for all segments at once.
+    """
+    lengths = np.maximum(ends - starts - 1, 0)
+    split = np.full(len(starts), -1)
+    score = np.full(len(starts), -1.0)
+    has = lengths > 0
+    if not has.any():
+        return split, score
+    s, e, lengths = starts[has], ends[has], lengths[has]
+    seg = np.repeat(np.arange(len(s)), lengths)
+    first = np.cumsum(lengths) - lengths
+    idx = np.repeat(s + 1 - first, lengths) + np.arange(lengths.sum())
+
+    x0, y0 = x[s][seg], y[s][seg]
+    dx, dy = x[e][seg] - x0, y[e][seg] - y0
+    chord = np.hypot(dx, dy)
+    dist = np.where(
+        chord > 0,
+        np.abs(dx * (y[idx] - y0) - dy * (x[idx] - x0)) / np.where(chord > 0, chord, 1),
+        np.hypot(x[idx] - x0, y[idx] - y0),
+    )
+    best = np.maximum.reduceat(dist, first)
+    # first position of each segment's maximum
+    at_max = np.flatnonzero(dist == best[seg])
+    at_max = at_max[np.r_[True, seg[at_max][1:] != seg[at_max][:-1]]]
+    split[has], score[has] = idx[at_max], best
+    return split, score
+
+
+def simplify_track(lon, lat, budget=TRACK_POINTS):
+    """
+    Indices of at most `budget` vertices of a track, chosen by Douglas-Peucker
+    in order of error: the segments deviating most from their chord are split
+    first, so the budget goes where the track bends.
+
+    Instead of one segment per step (a heap), each round splits the worse half
+    of the pending segments, and only the new segments are scored, with NumPy
+    over all of them at once (_farthest). A round touches each fix at most
+    once, and about 2 x log2(budget) rounds are needed.
+    """
+    n = len(lon)
+    if n <= budget:
+        return np.arange(n)
+    # local equirectangular projection, so x and y distances are comparable
+    x = np.asarray(lon, dtype="float64") * np.cos(np.radians(np.nanmean(lat)))
+    y = np.asarray(lat, dtype="float64")
+
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, n - 1]] = True
+    kept = 2
+    starts, ends = np.array([0]), np.array([n - 1])
+    split, score = _farthest(x, y, starts, ends)
+    while kept < budget:
+        # straight segments (all points on the chord) need no more vertices
+        pending = score > 0
+        starts, ends, split, score = starts[pending], ends[pending], split[pending], score[pending]
+        if not len(starts):
+            break
+        count = min(budget - kept, (len(starts) + 1) // 2)
+        order = np.argsort(score)[::-1]
+        chosen, rest = order[:count], order[count:]
+        keep[split[chosen]] = True
+        kept += count
+
+        new_starts = np.r_[starts[chosen], split[chosen]]
+        new_ends = np.r_[split[chosen], ends[chosen]]
+        new_split, new_score = _farthest(x, y, new_starts, new_ends)
+        starts = np.r_[starts[rest], new_starts]
+        ends = np.r_[ends[rest], new_ends]
+        split = np.r_[split[rest], new_split]
+        score = np.r_[score[rest], new_score]
+    return np.flatnonzero(keep)
+
+
+class TrackGraphs:
+    """GPS track of a mobile IoT box, simplified and coloured by one parameter."""
+
+    def __init__(self, iot_graphs=None):
+        self.iot_graphs = iot_graphs or IoTGraphs()
+
+    def fetch_track(self, station_num, date_range, parameter=None):
+        """DateTime, Longitude, Latitude (and the parameter) of every valid fix, in time order."""
+        df = self.iot_graphs.fetch_station_data(
+            station_num, date_range, [parameter] if parameter else [], split_view=False
+        )
+        if df.empty or "Longitude" not in df.columns or "Latitude" not in df.columns:
+            return pd.DataFrame()
+        cols = ["DateTime", "Longitude", "Latitude"] + ([parameter] if parameter in df.columns else [])
+        df = df[cols].copy()
+        df["Longitude"] = pd.to_numeric(df["Longitude"], errors="coerce")
+        df["Latitude"] = pd.to_numeric(df["Latitude"], errors="coerce")
+        valid = (
+            df["Longitude"].between(-180, 180) & df["Latitude"].between(-90, 90)
+            & ~((df["Longitude"] == 0) & (df["Latitude"] == 0))
+        )
+        df = df[valid]
+        # drop repeated fixes of a parked box, keeping the first and last of each stop
+        lon, lat = df["Longitude"].to_numpy(), df["Latitude"].to_numpy()
+        same_prev = np.r_[False, (lon[1:] == lon[:-1]) & (lat[1:] == lat[:-1])]
+        same_next = np.r_[(lon[1:] == lon[:-1]) & (lat[1:] == lat[:-1]), False]
+        return df[~(same_prev & same_next)].reset_index(drop=True)
+
+    def simplify(self, df, budget=TRACK_POINTS):
+        """The track reduced to at most `budget` fixes; parameter values are averaged between kept fixes."""
+        keep = simplify_track(df["Longitude"].to_numpy(), df["Latitude"].to_numpy(), budget)
+        out = df.iloc[keep].reset_index(drop=True)
+        value_cols = [c for c in df.columns if c not in ("DateTime", "Longitude", "Latitude")]
+        if value_cols and len(keep) < len(df):
+            # each kept fix carries the mean of the fixes up to the next kept one
+            groups = np.searchsorted(keep, np.arange(len(df)), side="right") - 1
+            means = df[value_cols].groupby(groups).mean()
+            out[value_cols] = means.to_numpy()
+        return out
+
+    def create_track_layers(self, df, parameter=None, unit=None):
+        """Leaflet children: the track (binned by colour), start/end markers and a colour bar."""
+        positions = df[["Latitude", "Longitude"]].to_numpy().tolist()
+        layers = []
+        if parameter and parameter in df.columns and df[parameter].notna().any():
+            values = df[parameter].to_numpy(dtype="float64")
+            low, high = np.nanmin(values), np.nanmax(values)
+            span = high - low or 1
+            # colour of a segment = mean of its two end fixes
+            seg_values = (values[:-1] + values[1:]) / 2
+            bins = np.clip(((seg_values - low) / span * COLOR_BINS).astype("float64"), 0, COLOR_BINS - 1)
+            colors = sample_colorscale(TRACK_COLORSCALE, [(b + 0.5) / COLOR_BINS for b in range(COLOR_BINS)])
+            for b in range(COLOR_BINS):
+                segs = np.flatnonzero(np.floor(bins) == b)
+                if len(segs):
+                    layers.append(dl.Polyline(
+                        positions=[[positions[i], positions[i + 1]] for i in segs],
+                        color=colors[b], weight=4, opacity=0.9,
+                    ))
+            # segments touching a fix without a value
+            missing = np.flatnonzero(np.isnan(seg_values))
+            if len(missing):
+                layers.append(dl.Polyline(
+                    positions=[[positions[i], positions[i + 1]] for i in missing],
+                    color="#999", weight=3, opacity=0.6, dashArray="4 6",
+                ))
+            layers.append(dl.Colorbar(
+                colorscale=sample_colorscale(TRACK_COLORSCALE, [i / (COLOR_BINS - 1) for i in range(COLOR_BINS)]),
+                min=float(low), max=float(high), nTicks=5, width=20, height=200,
+                position="bottomright", tooltip=True, unit=unit or "",
+            ))
+        else:
+            layers.append(dl.Polyline(positions=positions, color="purple", weight=4))
+
+        first, last = df.iloc[0], df.iloc[-1]
+        for row, text in ((first, "Start"), (last, "End")):
+            layers.append(dl.CircleMarker(
+                center=[row["Latitude"], row["Longitude"]], radius=7,
+                color="black", fillColor="white" if text == "Start" else "black", fillOpacity=1,
+                children=dl.Tooltip(f"{text}: {row['DateTime']:%Y-%m-%d %H:%M}"),
+            ))
+        return layers
@@ -0,0 +1,47 @@
+# gunicorn.conf.py
+"""
+Gunicorn settings for the dashboard, read from the [server] section of
+config/config.ini. Start with:
+
+    gunicorn -c gunicorn.conf.py wsgi:server
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# gunicorn treats every module-level name as a setting, and `config` is one
+from settings import config as _config  # noqa: E402
+
+bind                = _config.get('server', 'bind', fallback='0.0.0.0:8050')
+workers             = _config.getint('server', 'workers', fallback=(os.cpu_count() or 1) * 2 + 1)
+threads             = _config.getint('server', 'threads', fallback=4)
+worker_class        = 'gthread' if threads > 1 else 'sync'
+timeout             = _config.getint('server', 'timeout', fallback=120)
+graceful_timeout    = _config.getint('server', 'graceful_timeout', fallback=30)
+keepalive           = _config.getint('server', 'keepalive', fallback=5)
+preload_app         = _config.getboolean('server', 'preload', fallback=True)
+max_requests        = _config.getint('server', 'max_requests', fallback=1000)
+max_requests_jitter = _config.getint('server', 'max_requests_jitter', fallback=100)
+accesslog           = _config.get('server', 'accesslog', fallback='-')
+errorlog            = _config.get('server', 'errorlog', fallback='-')
+
+
+def post_fork(server, worker):
+    """
+    Give each worker its own MongoDB connection pool. With preload_app the
+    master imported the app; any client it opened must not be shared.
+    """
+    from database import reset_clients
+    reset_clients()
+    server.log.info("worker %s: MongoDB clients reset after fork", worker.pid)
+
+
+def post_worker_init(worker):
+    """
+    Start the station_stats/snapshot updaters and the view warmer in this
+    worker (app.start_background_threads), not in the preloading master.
+    """
+    from app import start_background_threads
+    start_background_threads()
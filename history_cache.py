@@ -0,0 +1,198 @@
+# history_cache.py
+"""
+Read-through on-disk cache of station history.
+
+Samples do not change once their day is over, so the frames the data layer
+builds from MongoDB are kept as Arrow IPC files, one per collection, query
+shape and UTC day:
+
+    <directory>/<key>/<YYYY-MM-DD>.arrow
+    <directory>/<key>/manifest.json      {"from": day or null, "through": day}
+
+The manifest records the contiguous range of days that is cached ("from":
+null means from the first sample), including days without data. A read loads
+the cached days with memory mapping (numeric columns are handed to pandas
+without copying) and only asks MongoDB for what lies outside that range:
+older days the first time a longer period is requested, and everything after
+"through". Days that ended at least `settle_hours` ago are written back.
+
+[history_cache] in config.ini: enabled, directory, settle_hours. Needs
+pyarrow; without it (or with enabled = false) every read goes to MongoDB.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from settings import config
+
+ENABLED      = config.getboolean('history_cache', 'enabled', fallback=True)
+CACHE_DIR    = config.get('history_cache', 'directory', fallback='.history_cache')
+SETTLE_HOURS = config.getint('history_cache', 'settle_hours', fallback=6)
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+_lock = threading.Lock()
+
+
+def cache_key(collection_name, *shape):
+    """Directory name for a collection and the query shape (projection, stages, ...)."""
+    digest = hashlib.sha1(json.dumps(shape, sort_keys=True, default=str).encode()).hexdigest()[:12]
+    return f"{collection_name}-{digest}"
+
+
+def _write_partition(path, df):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with pa.OSFile(tmp, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp, path)
+
+
+def _read_partition(path):
+    with pa.memory_map(path, "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    return table.to_pandas(split_blocks=True)
+
+
+def _day(value):
+    return datetime.strptime(value, "%Y-%m-%d").date() if value else None
+
+
+def _midnight(day):
+    return datetime(day.year, day.month, day.day)
+
+
+class HistoryCache:
+    def __init__(self, directory=CACHE_DIR, settle_hours=SETTLE_HOURS):
+        self.directory = directory
+        self.settle = timedelta(hours=settle_hours)
+
+    @property
+    def enabled(self):
+        return ENABLED and pa is not None
+
+    def _manifest(self, key):
+        try:
+            with open(os.path.join(self.directory, key, "manifest.json")) as f:
+                m = json.load(f)
+            return _day(m["from"]), _day(m["through"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _save_manifest(self, key, first, through):
+        path = os.path.join(self.directory, key, "manifest.json")
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"from": first.isoformat() if first else None, "through": through.isoformat()}, f)
+        os.replace(tmp, path)
+
+    def _load(self, key, first, through):
+        """Cached frames for the days in [first, through] (first None = every cached day)."""
+        folder = os.path.join(self.directory, key)
+        frames = []
+        for name in sorted(os.listdir(folder)):
+            if not name.endswith(".arrow"):
+                continue
+            day = _day(name[:-len(".arrow")])
+            if (first is None or day >= first) and day <= through:
+                frames.append(_read_partition(os.path.join(folder, name)))
+        return frames
+
+    def _store(self, key, df, time_column, first, through):
+        """Write the days [first, through] of `df` and return True if all of them were written."""
+        folder = os.path.join(self.directory, key)
+        os.makedirs(folder, exist_ok=True)
+        if df.empty:
+            return True
+        days = df[time_column].dt.date
+        inside = (days <= through) if first is None else (days >= first) & (days <= through)
+        try:
+            for day, part in df[inside].groupby(days[inside]):
+                _write_partition(os.path.join(folder, f"{day.isoformat()}.arrow"), part.reset_index(drop=True))
+        except (pa.ArrowException, ValueError, TypeError) as e:
+            # e.g. columns mixing numbers and strings; leave this range uncached
+            print(f"History cache: not caching {key}: {e}")
+            return False
+        return True
+
+    def read_through(self, key, time_column, start, fetch):
+        """
+        Frame of every row with `time_column` >= start (naive UTC; None for the
+        whole history). fetch(lo, hi) reads rows with lo <= time < hi from
+        MongoDB (lo None = from the first sample, hi None = up to now) and
+        returns them with `time_column` as naive UTC datetimes.
+        """
+        if not self.enabled:
+            return fetch(start, None)
+        if start is not None and start.tzinfo is not None:
+            start = start.astimezone(timezone.utc).replace(tzinfo=None)
+
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        last_day = (now - self.settle).date() - timedelta(days=1)
+        # first day that the request covers completely
+        want = None if start is None else (
+            start.date() if start == _midnight(start.date()) else start.date() + timedelta(days=1)
+        )
+
+        cached = self._manifest(key)
+        # the cache helps if it reaches (at least) the day before the request starts;
+        # otherwise the gap after "through" would be read for nothing
+        usable = cached is not None and (start is None or start.date() <= cached[1] + timedelta(days=1))
+
+        try:
+            if not usable:
+                df = fetch(start, None)
+                if (want is None or want <= last_day) and self._store(key, df, time_column, want, last_day):
+                    with _lock:
+                        self._save_manifest(key, want, last_day)
+                return df
+
+            first, through = cached
+            frames = []
+            new_first = first
+            load_from = start.date() if start is not None else None
+            # older days than the cache holds
+            if first is not None and (start is None or start.date() < first):
+                head = fetch(start, _midnight(first))
+                frames.append(head)
+                if self._store(key, head, time_column, want, first - timedelta(days=1)):
+                    new_first = want
+                load_from = first
+            frames += self._load(key, load_from, through)
+            tail_from = _midnight(through + timedelta(days=1))
+            # a request starting after the cached range only needs its own period
+            # (the cache is not extended then, it has to stay contiguous)
+            extend = start is None or start <= tail_from
+            tail = fetch(tail_from if extend else start, None)
+            frames.append(tail)
+            new_through = through
+            if extend and last_day > through and self._store(key, tail, time_column, through + timedelta(days=1), last_day):
+                new_through = last_day
+            if (new_first, new_through) != (first, through):
+                with _lock:
+                    self._save_manifest(key, new_first, new_through)
+        except OSError as e:
+            print(f"History cache unavailable ({e}); reading from MongoDB")
+            return fetch(start, None)
+
+        frames = [f for f in frames if not f.empty]
+        if not frames:
+            return pd.DataFrame()
+        df = pd.concat(frames, ignore_index=True, sort=False)
+        if start is not None:
+            df = df[df[time_column] >= start].reset_index(drop=True)
+        return df
+
+
+history_cache = HistoryCache()
@@ -0,0 +1,345 @@
+# instrumentation.py
+"""
+Callback and query instrumentation exposed in the Prometheus text format.
+
+- Every Dash callback request (/_dash-update-component) is timed and recorded
+  in a histogram labelled with page, callback id and station.
+- A pymongo CommandListener records duration, documents returned and reply
+  bytes per collection/operation, labelled with the callback that issued it.
+- GET /metrics on app.server returns all series.
+
+The registry is deliberately tiny and dependency-free; it is per process, so
+with several workers each worker reports its own numbers.
+"""
+
+import contextvars
+import re
+import threading
+import time
+from bisect import bisect_left
+
+import bson
+import dash
+import flask
+from bson.raw_bson import RawBSONDocument
+from dash._callback import GLOBAL_CALLBACK_MAP
+from pymongo import monitoring
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Labels of the callback currently being served by this thread/context
+_current_labels = contextvars.ContextVar("dashboard_request_labels", default=None)
+
+
+# ------------------------------------------------------------------------------
+# Metric types
+# ------------------------------------------------------------------------------
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name, doc, labelnames=()):
+        self.name, self.doc, self.labelnames = name, doc, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels=()):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_fmt_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, doc, labelnames=(), buckets=DURATION_BUCKETS):
+        self.name, self.doc, self.labelnames = name, doc, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}   # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(labels)
+            if row is None:
+                row = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            row[idx] += 1
+            row[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, row in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), row[:-1]):
+                    cumulative += count
+                    le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                    lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, labels, [le])} {cumulative}")
+                lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, labels)} {row[-1]}")
+                lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+REQUEST_LABELS = ("page", "callback", "station")
+QUERY_LABELS   = ("collection", "operation") + REQUEST_LABELS
+
+CALLBACK_DURATION = Histogram(
+    "dash_callback_duration_seconds",
+    "Time spent serving a Dash callback request, including serialisation.",
+    REQUEST_LABELS + ("status",),
+)
+MONGO_DURATION = Histogram(
+    "mongo_command_duration_seconds",
+    "Duration of MongoDB commands as reported by the driver.",
+    QUERY_LABELS,
+)
+MONGO_DOCUMENTS = Counter(
+    "mongo_documents_returned_total",
+    "Documents returned by MongoDB commands (cursor batches, counts).",
+    QUERY_LABELS,
+)
+MONGO_BYTES = Counter(
+    "mongo_reply_bytes_total",
+    "BSON size of MongoDB command replies (cursor batches only when returned as raw BSON).",
+    QUERY_LABELS,
+)
+MONGO_FAILURES = Counter(
+    "mongo_command_failures_total",
+    "MongoDB commands that failed.",
+    QUERY_LABELS,
+)
+
+METRICS = [CALLBACK_DURATION, MONGO_DURATION, MONGO_DOCUMENTS, MONGO_BYTES, MONGO_FAILURES]
+
+
+def register(metric):
+    """Add a metric defined elsewhere (e.g. cache hit counters) to /metrics."""
+    METRICS.append(metric)
+    return metric
+
+
+def render_metrics():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ------------------------------------------------------------------------------
+# Request labels
+# ------------------------------------------------------------------------------
+_page_patterns = None
+
+
+def _compile_page_patterns():
+    """(regex, page name) per registered Dash page, most specific template first."""
+    patterns = []
+    for page in dash.page_registry.values():
+        template = page.get("path_template") or page.get("path")
+        if not template:
+            continue
+        regex = re.sub(r"<([^>]+)>", r"(?P<\1>[^/]+)", re.escape(template))
+        patterns.append((template.count("<"), re.compile(f"^{regex}/?$"), page["module"].split(".")[-1]))
+    patterns.sort(key=lambda p: p[0])
+    return [(regex, name) for _, regex, name in patterns]
+
+
+# Label values come from the client (callback ids, URL paths), so only known
+# ones are kept; anything else is "other", which keeps the series bounded.
+STATIONS_TTL = 300
+_stations = {"values": None, "loaded": 0.0}
+_stations_lock = threading.Lock()
+
+
+def _known_stations(load=True):
+    """station_num values in stations_info (as strings), re-read every STATIONS_TTL seconds."""
+    if load and time.time() - _stations["loaded"] > STATIONS_TTL and _stations_lock.acquire(blocking=False):
+        try:
+            # imported here: database imports this module (through async_db)
+            from database import get_db
+            from settings import STATIONS_INFO
+            values = get_db()[STATIONS_INFO].distinct("station_num")
+            _stations["values"] = {str(v) for v in values if v is not None}
+        except Exception as e:
+            print(f"Error loading station numbers for metrics labels: {e}")
+        finally:
+            _stations["loaded"] = time.time()
+            _stations_lock.release()
+    return _stations["values"]
+
+
+def station_label(station, load=True):
+    """The station number if stations_info has it, else "other" ("" stays "")."""
+    if not station:
+        return ""
+    known = _known_stations(load)
+    return station if known is not None and station in known else "other"
+
+
+def callback_label(callback):
+    """The callback id if a callback with that output is registered, else "other"."""
+    if not callback:
+        return ""
+    try:
+        registered = dash.get_app().callback_map
+    except Exception:
+        registered = {}
+    return callback if callback in registered or callback in GLOBAL_CALLBACK_MAP else "other"
+
+
+def labels_for_path(path):
+    """
+    Map a page URL path to (page, station), e.g.
+    "/stationdata/IoTBox/12" -> ("iot_meteo_visualization", "12").
+    """
+    global _page_patterns
+    if _page_patterns is None:
+        _page_patterns = _compile_page_patterns()
+    for regex, name in _page_patterns:
+        match = regex.match(path or "")
+        if match:
+            return name, match.groupdict().get("station_num", "")
+    return "unknown", ""
+
+
+def current_labels():
+    """(page, callback, station) of the callback running in this context, or blanks."""
+    return _current_labels.get() or ("", "", "")
+
+
+def bind_labels(labels):
+    """Attribute queries issued from this context (e.g. another thread) to `labels`."""
+    _current_labels.set(labels)
+
+
+def callback_labels(payload):
+    callback = payload.get("output", "") if payload else ""
+    path = flask.request.referrer or ""
+    path = re.sub(r"^[a-z]+://[^/]+", "", path).split("?")[0]
+    for item in (payload or {}).get("inputs", []) + (payload or {}).get("state", []):
+        if isinstance(item, dict) and item.get("id") == "url" and item.get("property") == "pathname":
+            path = item.get("value") or path
+    page, station = labels_for_path(path)
+    return page, callback_label(callback), station_label(station)
+
+
+# ------------------------------------------------------------------------------
+# MongoDB command monitoring
+# ------------------------------------------------------------------------------
+class QueryMetrics(monitoring.CommandListener):
+    """Records per-collection command metrics attributed to the current callback."""
+
+    _SKIP = {"hello", "ismaster", "isMaster", "ping", "endSessions", "saslStart", "saslContinue"}
+
+    def __init__(self):
+        self._pending = {}
+
+    def started(self, event):
+        if event.command_name in self._SKIP:
+            return
+        cmd = event.command
+        if event.command_name == "getMore":
+            coll = cmd.get("collection", "")
+        else:
+            coll = cmd.get(event.command_name, "")
+            coll = coll if isinstance(coll, str) else ""
+        page, callback, station = current_labels()
+        if not station:
+            match = re.match(r"^station(\d+)$", coll)
+            # no query from inside the driver's event: only checked once a callback loaded the list
+            station = station_label(match.group(1), load=False) if match else ""
+        self._pending[(event.connection_id, event.request_id)] = (
+            coll, event.command_name, page, callback, station
+        )
+
+    def succeeded(self, event):
+        labels = self._pending.pop((event.connection_id, event.request_id), None)
+        if labels is None:
+            return
+        MONGO_DURATION.observe(labels, event.duration_micros / 1e6)
+        reply = event.reply or {}
+        cursor = reply.get("cursor")
+        if isinstance(cursor, dict):
+            batch = cursor.get("firstBatch", cursor.get("nextBatch", []))
+            docs = len(batch)
+            # re-encoding batches (up to 16 MB) would slow every read down; raw
+            # documents know their size, decoded ones are not counted
+            size = sum(len(d.raw) for d in batch) if all(isinstance(d, RawBSONDocument) for d in batch) else None
+        else:
+            docs = reply.get("n", 0) if isinstance(reply.get("n"), int) else 0
+            size = len(bson.encode(reply))
+        MONGO_DOCUMENTS.inc(labels, docs)
+        if size is not None:
+            MONGO_BYTES.inc(labels, size)
+
+    def failed(self, event):
+        labels = self._pending.pop((event.connection_id, event.request_id), None)
+        if labels is None:
+            return
+        MONGO_DURATION.observe(labels, event.duration_micros / 1e6)
+        MONGO_FAILURES.inc(labels)
+
+
+_listener = None
+
+
+def install_query_monitoring():
+    """
+    Register the command listener globally. Must run before any MongoClient
+    is created, i.e. before Dash imports the pages.
+    """
+    global _listener
+    if _listener is None:
+        _listener = QueryMetrics()
+        monitoring.register(_listener)
+    return _listener
+
+
+# ------------------------------------------------------------------------------
+# Flask hooks
+# ------------------------------------------------------------------------------
+def instrument_app(app):
+    """Time every callback request and serve /metrics on app.server."""
+    server = app.server
+
+    @server.before_request
+    def _start_timer():
+        if flask.request.path.endswith("/_dash-update-component"):
+            payload = flask.request.get_json(silent=True)
+            flask.g.dashboard_labels = callback_labels(payload)
+            _current_labels.set(flask.g.dashboard_labels)
+            flask.g.dashboard_start = time.perf_counter()
+
+    @server.after_request
+    def _observe(response):
+        start = flask.g.pop("dashboard_start", None)
+        if start is not None:
+            CALLBACK_DURATION.observe(
+                flask.g.dashboard_labels + (str(response.status_code),),
+                time.perf_counter() - start,
+            )
+        return response
+
+    @server.teardown_request
+    def _reset_labels(exc):
+        _current_labels.set(None)
+
+    @server.route("/metrics")
+    def _metrics():
+        return flask.Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+    return app
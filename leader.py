@@ -0,0 +1,40 @@
+# leader.py
+"""
+One process at a time for the periodic jobs (station_stats, snapshots, the
+warmer).
+
+Every gunicorn worker starts the jobs' threads, but a pass only runs in the
+process holding <single_flight directory>/<job>.leader, an flock kept for the
+life of the process. The other workers retry each interval, so when the
+leader exits (max_requests recycling, a crash) the next worker to try takes
+over. Without flock (Windows) every process runs its own jobs.
+"""
+
+import os
+import threading
+
+from single_flight import LOCK_DIR, fcntl
+
+_held = {}   # job name -> (pid, open lock file)
+_lock = threading.Lock()
+
+
+def is_leader(name):
+    """True if this process runs the job `name`, taking its lock if it is free."""
+    if fcntl is None:
+        return True
+    pid = os.getpid()
+    with _lock:
+        held = _held.get(name)
+        if held is not None and held[0] == pid:
+            return True
+        # (a process forked from the leader does not lead: the lock is the parent's)
+        os.makedirs(LOCK_DIR, exist_ok=True)
+        lock_file = open(os.path.join(LOCK_DIR, f"{name}.leader"), "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        _held[name] = (pid, lock_file)
+        return True
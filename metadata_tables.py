@@ -0,0 +1,122 @@
+# metadata_tables.py
+"""
+Instrument metadata for the map page's metadata modal.
+
+The JSON files in metadata/ are parsed and turned into html.Table components
+once, then reused for every modal. A file is reloaded only when its
+modification time changes, so edits are picked up without a restart.
+"""
+
+import json
+import os
+import threading
+
+from dash import html
+
+METADATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'metadata')
+
+# Human-readable display names for metadata files
+DISPLAY_NAMES = {
+    "iotbox_metadata.json":        "IoT Box",
+    "meteostation_metadata.json":  "Meteorological Station",
+    "buoy_metadata.json":          "Buoy",
+    "fidas_metadata.json":         "Fidas Palas 200S",
+    "exo_metadata.json":           "EXO Sonde 2",
+    "idronaut_metadata.json":      "Idronaut",
+    "ead_ctd_metadata.json":       "EAD CTD",
+    "coral_reef_metadata.json":    "Coral Reef Monitoring"
+}
+
+# Metadata files shown for each device type
+METADATA_FILES = {
+    "IoTBox":         ["iotbox_metadata.json"],
+    "Meteorological": ["meteostation_metadata.json"],
+    "Buoy":           ["buoy_metadata.json"],
+    "Fidas_Palas":    ["fidas_metadata.json"],
+    "SBNTransect":    ["exo_metadata.json", "idronaut_metadata.json"],
+    "JWCruise":       ["exo_metadata.json", "idronaut_metadata.json", "ead_ctd_metadata.json"],
+    "underwater_probe": ["exo_metadata.json"],
+    "coral_reef":     ["coral_reef_metadata.json"]
+}
+
+_cache = {}   # file name -> (mtime, parsed JSON, built table)
+_lock = threading.Lock()
+
+
+def _build_table(items):
+    return html.Table(
+        [
+            html.Thead(html.Tr([
+                html.Th("Column"),
+                html.Th("Descriptor"),
+                html.Th("Units"),
+                html.Th("Definition")
+            ])),
+            html.Tbody([
+                html.Tr([
+                    html.Td(x["column_name"]),
+                    html.Td(x["full_descriptor"]),
+                    html.Td(x["units"]),
+                    html.Td(x["definition"])
+                ]) for x in items
+            ])
+        ],
+        style={"width": "100%", "marginBottom": "1rem"}
+    )
+
+
+def _load(fname, build_table):
+    """(parsed JSON, table or None) for a metadata file, or None if unreadable."""
+    path = os.path.join(METADATA_DIR, fname)
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    cached = _cache.get(fname)
+    if cached is not None and cached[0] == mtime:
+        _, items, table = cached
+        if table is not None or not (build_table and items):
+            return items, table
+        # parsed for metadata_items() only: build the table now
+        with _lock:
+            table = _build_table(items)
+            _cache[fname] = (mtime, items, table)
+        return items, table
+
+    with _lock:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                raw = f.read().strip()
+            items = json.loads(raw) if raw else None
+        except (json.JSONDecodeError, OSError):
+            items = None
+        table = _build_table(items) if (build_table and items) else None
+        _cache[fname] = (mtime, items, table)
+    return items, table
+
+
+def metadata_table(fname):
+    """Prebuilt html.Table for a metadata file, or None if it is missing or empty."""
+    loaded = _load(fname, build_table=True)
+    return loaded[1] if loaded else None
+
+
+def metadata_items(fname):
+    """Parsed entries of a metadata file ([] if it is missing or empty)."""
+    loaded = _load(fname, build_table=False)
+    return (loaded[0] if loaded else None) or []
+
+
+def display_name(fname):
+    return DISPLAY_NAMES.get(
+        fname,
+        fname.replace("_metadata.json", "").replace("_", " ").title()
+    )
+
+
+def special_availability(device_type):
+    """Earliest/latest entry from available_data.json for campaign-type stations."""
+    for d in metadata_items('available_data.json'):
+        if d.get('station_type') == device_type:
+            return d
+    return None
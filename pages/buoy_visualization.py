@@ -1,7 +1,9 @@
 import dash
 import dash_bootstrap_components as dbc
-from dash import html, dcc, Input, Output, State, callback_context
+from dash import html, dcc, Input, Output, State, callback_context, no_update
 from graphs.buoy_graphs import BuoyGraphs
+from background import LONG_RANGES
+from profiling import background_marker, profile_background
 
 # Register Dash page
 dash.register_page(
@@ -80,6 +82,11 @@ layout = dbc.Container([
                     dcc.Tab(label="Atmospheric Parameters", value="tab-timeseries"),
                     dcc.Tab(label="Vertical Profiles",       value="tab-profile"),
                 ]),
+                dcc.Store(id="buoy-long-request"),
+                html.Div([
+                    dbc.Spinner(size="sm", color="secondary"),
+                    html.Span(id="buoy-progress-text", style={"marginLeft": "8px"}),
+                ], id="buoy-progress", style={"display": "none"}),
                 html.Div(id="buoy-tab-content", style={
                     "height": "75vh", "overflow-y": "auto", "padding": "10px"
                 })
@@ -133,21 +140,14 @@ def _toggle_controls(tab):
     return {"display": "none"}, {"display": "block"}
 
 
-@dash.callback(
-    Output("buoy-tab-content", "children"),
-    [
-        Input("buoy-tabs", "value"),
-        Input("buoy-date-range", "value"),
-        Input("buoy-param-checklist", "value"),
-        Input("buoy-profile-date-range", "value"),
-        Input("buoy-profile-param-checklist", "value")
-    ]
-)
-def _render_tab(tab, dr_ts, params_ts, dr_pf, params_pf):
+def _build_tab(tab, dr_ts, params_ts, dr_pf, params_pf, set_progress=None):
+    progress = set_progress or (lambda message: None)
     if tab == "tab-timeseries":
+        progress("Fetching data…")
         df = buoy.fetch_time_series(dr_ts, params_ts, agg="None")
         if df.empty:
             return html.Div("No data available.", style={"color": "gray"})
+        progress("Building figures…")
         figs = buoy.create_time_series_figures(df, params_ts)
         return html.Div([
             dcc.Graph(
@@ -158,10 +158,12 @@ def _render_tab(tab, dr_ts, params_ts, dr_pf, params_pf):
         ], style={"display": "flex", "flexDirection": "column", "gap": "10px"})
 
     # Vertical Profiles: unpack fetch_profiles() directly
+    progress("Fetching profiles…")
     times, docs = buoy.fetch_profiles(dr_pf)
     if not times or not docs:
         return html.Div("No profile data.", style={"color": "gray"})
 
+    progress("Building figures…")
     graphs = []
     for p in params_pf:
         fig = buoy.create_profile_figure(times, docs, p)
@@ -172,6 +174,48 @@ def _render_tab(tab, dr_ts, params_ts, dr_pf, params_pf):
     return html.Div(graphs, style={"display": "flex", "flexDirection": "column", "gap": "10px"})
 
 
+@dash.callback(
+    [Output("buoy-tab-content", "children"), Output("buoy-long-request", "data")],
+    [
+        Input("buoy-tabs", "value"),
+        Input("buoy-date-range", "value"),
+        Input("buoy-param-checklist", "value"),
+        Input("buoy-profile-date-range", "value"),
+        Input("buoy-profile-param-checklist", "value")
+    ]
+)
+def _render_tab(tab, dr_ts, params_ts, dr_pf, params_pf):
+    # long ranges are rendered by the background callback below
+    active_range = dr_ts if tab == "tab-timeseries" else dr_pf
+    if active_range in LONG_RANGES:
+        # the last item tells the job whether to profile itself (profiling.py)
+        return no_update, [tab, dr_ts, params_ts, dr_pf, params_pf, background_marker()]
+    return _build_tab(tab, dr_ts, params_ts, dr_pf, params_pf), no_update
+
+
+@dash.callback(
+    Output("buoy-tab-content", "children", allow_duplicate=True),
+    Input("buoy-long-request", "data"),
+    background=True,
+    progress=Output("buoy-progress-text", "children"),
+    running=[(Output("buoy-progress", "style"), {"display": "block"}, {"display": "none"})],
+    cancel=[
+        Input("buoy-tabs", "value"),
+        Input("buoy-date-range", "value"),
+        Input("buoy-param-checklist", "value"),
+        Input("buoy-profile-date-range", "value"),
+        Input("buoy-profile-param-checklist", "value")
+    ],
+    prevent_initial_call=True
+)
+def _render_tab_background(set_progress, request):
+    if not request:
+        return no_update
+    *args, marker = request
+    with profile_background("buoy-tab-content.children", args, marker):
+        return _build_tab(*args, set_progress=set_progress)
+
+
 @dash.callback(
     Output("buoy-download-modal", "is_open"),
     [Input("buoy-download-open", "n_clicks"), Input("buoy-download-close", "n_clicks")],
@@ -0,0 +1,87 @@
+import dash
+import dash_bootstrap_components as dbc
+from dash import html, dcc, Input, Output, State, callback
+from graphs.compare_graphs import CompareGraphs, QUANTITIES
+
+# One parameter overlaid across many stations
+dash.register_page(__name__, path="/compare", title="Station Monitoring Dashboard")
+
+compare_graphs = CompareGraphs()
+
+layout = dbc.Container([
+    dcc.Location(id="compare-url", refresh=False),
+    dbc.Row([
+        dbc.Col([
+            dbc.Card([
+                dbc.CardBody([
+                    html.Label("Parameter", style={"font-weight": "bold"}),
+                    dcc.Dropdown(
+                        id="compare-quantity",
+                        options=[{"label": spec["label"], "value": q} for q, spec in QUANTITIES.items()],
+                        value="PM2.5",
+                        clearable=False
+                    ),
+                    html.Hr(style={"border-top": "2px solid purple"}),
+                    html.Label("Display Period", style={"font-weight": "bold"}),
+                    dcc.Dropdown(
+                        id="compare-date-range",
+                        options=[
+                            {"label": "Past 1 Day", "value": "1D"},
+                            {"label": "Past 1 Week", "value": "1W"},
+                            {"label": "Past 1 Month", "value": "1M"},
+                            {"label": "Past 6 Months", "value": "6M"},
+                            {"label": "Past 1 Year", "value": "1Y"},
+                            {"label": "All Data", "value": "All"}
+                        ],
+                        value="1W",
+                        clearable=False
+                    ),
+                    html.Hr(style={"border-top": "2px solid purple"}),
+                    html.Label("Stations", style={"font-weight": "bold"}),
+                    dcc.Dropdown(id="compare-stations", multi=True, placeholder="Select stations..."),
+                ])
+            ], style={
+                "border": "3px solid purple",
+                "box-shadow": "2px 2px 5px lightgrey",
+                "height": "85vh",
+                "overflow-y": "auto"
+            })
+        ], width=3, style={"padding": "10px"}),
+        dbc.Col([
+            dbc.Card([
+                dbc.CardBody([
+                    dcc.Loading(html.Div(id="compare-output"), type="circle")
+                ])
+            ], style={
+                "border": "3px solid purple",
+                "box-shadow": "2px 2px 5px lightgrey",
+                "height": "85vh",
+                "overflow-y": "auto"
+            })
+        ], width=9, style={"padding": "10px"})
+    ], class_name="mb-3")
+], fluid=True)
+
+@callback(
+    Output("compare-stations", "options"),
+    Input("compare-url", "pathname")
+)
+def load_station_options(pathname):
+    return compare_graphs.station_options()
+
+@callback(
+    Output("compare-output", "children"),
+    Input("compare-quantity", "value"),
+    Input("compare-date-range", "value"),
+    Input("compare-stations", "value"),
+    State("compare-stations", "options")
+)
+def update_comparison(quantity, date_range, stations, options):
+    if not stations:
+        return html.Div("Select stations to compare.", style={"color": "gray"})
+    labels = {o["value"]: o["label"] for o in options or []}
+    df = compare_graphs.fetch_comparison({v: labels.get(v, v) for v in stations}, quantity, date_range)
+    if df.empty:
+        return html.Div("No data available for the selected stations and period.", style={"color": "gray"})
+    fig = compare_graphs.create_comparison_figure(df, quantity)
+    return dcc.Graph(figure=fig, style={"height": "75vh", "border": "2px solid lightgray", "padding": "5px"})
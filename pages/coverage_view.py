@@ -0,0 +1,97 @@
+import dash
+import dash_bootstrap_components as dbc
+from dash import html, dcc, Input, Output, callback, no_update
+from availability import collection_for, time_field
+from graphs.coverage_graphs import CoverageGraphs
+
+# Data coverage over the full history of one station
+dash.register_page(__name__, path_template="/coverage/<device_type>/<station_num>", title="Station Monitoring Dashboard")
+
+coverage_graphs = CoverageGraphs()
+
+# URL device names as used by the station data pages
+DEVICE_TYPES = {"iotbox": "IoTBox", "meteostation": "Meteorological", "meteorological": "Meteorological",
+                "buoy": "Buoy", "fidas_palas": "Fidas_Palas"}
+
+def layout(device_type=None, station_num=None):
+    return dbc.Container([
+        dcc.Store(id="coverage-station", data={"device_type": device_type, "station_num": station_num}),
+        dbc.Card([
+            dbc.CardBody([
+                html.H4("Data Coverage", style={"color": "purple"}),
+                dcc.Store(id="coverage-request"),
+                html.Div([
+                    dbc.Spinner(size="sm", color="secondary"),
+                    html.Span("Updating the coverage from the full history…", style={"marginLeft": "8px"}),
+                ], id="coverage-progress", style={"display": "none"}),
+                dcc.Loading(html.Div(id="coverage-output"), type="circle"),
+            ])
+        ], style={
+            "border": "3px solid purple",
+            "box-shadow": "2px 2px 5px lightgrey",
+            "margin": "10px"
+        })
+    ], fluid=True)
+
+def _coverage_view(intervals):
+    if not intervals:
+        return html.Div("No data available for this station.", style={"color": "gray"})
+    summary = coverage_graphs.summarize(intervals)
+    stats = html.Div([
+        html.P(f"First sample: {summary['first']:%Y-%m-%d %H:%M}"),
+        html.P(f"Last sample: {summary['last']:%Y-%m-%d %H:%M}"),
+        html.P(f"Samples: {summary['samples']:,}"),
+        html.P(f"Coverage: {summary['coverage_pct']:.1f}%"),
+        html.P(f"Gaps: {summary['gaps']} (longest {summary['longest_gap_hours']:.1f} h)"),
+    ])
+    figures = coverage_graphs.create_coverage_figures(intervals)
+    return html.Div(
+        [stats] + [dcc.Graph(figure=fig, style={"border": "2px solid lightgray", "padding": "5px"}) for fig in figures],
+        style={"display": "flex", "flex-direction": "column", "gap": "10px"}
+    )
+
+@callback(
+    Output("coverage-output", "children"),
+    Output("coverage-request", "data"),
+    Input("coverage-station", "data")
+)
+def update_coverage(station):
+    device_type = DEVICE_TYPES.get(str((station or {}).get("device_type")).lower())
+    station_num = (station or {}).get("station_num")
+    if device_type == "IoTBox" and not str(station_num).isdigit():
+        return html.Div("Invalid station selected.", style={"color": "red"}), no_update
+    collection = collection_for(device_type, station_num)
+    if not collection:
+        return html.Div("No coverage information for this station.", style={"color": "gray"}), no_update
+    try:
+        intervals, fresh = coverage_graphs.cached_intervals(collection)
+    except Exception as e:
+        print(f"Error reading data coverage for {collection}: {e}")
+        return html.Div("Error computing data coverage.", style={"color": "red"}), no_update
+    if fresh:
+        return _coverage_view(intervals), no_update
+    # (re-)aggregating the history can outlast a worker's timeout: show what is
+    # cached and bring it up to date in the background callback below
+    request = {"collection": collection, "time_field": time_field(device_type)}
+    if not intervals:
+        return html.Div("Computing data coverage…", style={"color": "gray"}), request
+    return _coverage_view(intervals), request
+
+@callback(
+    Output("coverage-output", "children", allow_duplicate=True),
+    Input("coverage-request", "data"),
+    background=True,
+    running=[(Output("coverage-progress", "style"), {"display": "block"}, {"display": "none"})],
+    cancel=[Input("coverage-station", "data")],
+    prevent_initial_call=True
+)
+def update_coverage_background(request):
+    if not request:
+        return no_update
+    try:
+        # concurrent visitors (and workers) share one computation (single_flight.py)
+        intervals = coverage_graphs.get_intervals(request["collection"], request["time_field"])
+    except Exception as e:
+        print(f"Error computing data coverage for {request['collection']}: {e}")
+        return html.Div("Error computing data coverage.", style={"color": "red"})
+    return _coverage_view(intervals)
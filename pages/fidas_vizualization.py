@@ -8,6 +8,8 @@ from datetime import datetime
 from dateutil.relativedelta import relativedelta
 import plotly.graph_objects as go
 from graphs.fidas_graphs import FidasGraphs
+from background import LONG_RANGES
+from profiling import background_marker, profile_background
 
 dash.register_page(
     __name__,
@@ -20,6 +22,7 @@ fidas = FidasGraphs()
 layout = dbc.Container([
     dcc.Location(id="url", refresh=False),
     dcc.Store(id="fidas-current-dt"),
+    dcc.Store(id="fidas-long-request"),
 
     dbc.Row([
       # Controls
@@ -94,6 +97,10 @@ layout = dbc.Container([
             dcc.Tab(label="Time Series", value="tab-timeseries"),
             dcc.Tab(label="Spectra",     value="tab-spectra"),
           ]),
+          html.Div([
+            dbc.Spinner(size="sm", color="secondary"),
+            html.Span(id="fidas-progress-text", style={"margin-left":"8px"}),
+          ], id="fidas-progress", style={"display":"none"}),
           html.Div(id="fidas-tab-content", style={
             "height":"80vh","overflow-y":"auto","padding":"10px"
           })
@@ -183,16 +190,14 @@ def _update_current_dt(
 
     # initialize when period or params first fire
     if trig in ("fidas-date-range","fidas-param-checklist") and cur_iso is None:
-        times = fidas.list_datetimes(dr)
-        return times[-1].isoformat() if times else None
+        latest = fidas.latest_datetime(dr)
+        return latest.isoformat() if latest else None
 
     # date‐picker jump
     if trig == "fidas-date-picker" and picked_date:
         day = pd.to_datetime(picked_date).date()
-        for t in fidas.list_datetimes(dr):
-            if t.date()==day:
-                return t.isoformat()
-        return cur_iso
+        t = fidas.first_datetime_on(day, dr)
+        return t.isoformat() if t else cur_iso
 
     # stepping
     delta_map = {
@@ -224,8 +229,20 @@ def _update_current_dt(
     return cur_iso
 
 
+def _build_time_series(dr, agg, params, set_progress=None):
+    progress = set_progress or (lambda message: None)
+    progress("Fetching data…")
+    df = fidas.fetch_time_series(dr, params, agg)
+    if df.empty:
+        return html.Div("No data available.", style={"color":"gray"})
+    progress("Building figures…")
+    figs = fidas.create_time_series_figures(df, params)
+    return html.Div([dcc.Graph(figure=fig) for fig in figs],
+                    style={"display":"flex","flexDirection":"column","gap":"10px"})
+
+
 @dash.callback(
-    Output("fidas-tab-content","children"),
+    [Output("fidas-tab-content","children"), Output("fidas-long-request","data")],
     [
       Input("fidas-tabs","value"),
       Input("fidas-date-range","value"),
@@ -236,22 +253,45 @@ def _update_current_dt(
 )
 def _render_tab(tab, dr, agg, params, cur_iso):
     if tab=="tab-timeseries":
-        df = fidas.fetch_time_series(dr, params, agg)
-        if df.empty:
-            return html.Div("No data available.", style={"color":"gray"})
-        figs = fidas.create_time_series_figures(df, params)
-        return html.Div([dcc.Graph(figure=fig) for fig in figs],
-                        style={"display":"flex","flexDirection":"column","gap":"10px"})
+        # long ranges are rendered by the background callback below
+        if dr in LONG_RANGES:
+            if callback_context.triggered_id == "fidas-current-dt":
+                return no_update, no_update
+            # the last item tells the job whether to profile itself (profiling.py)
+            return no_update, [dr, agg, params, background_marker()]
+        return _build_time_series(dr, agg, params), no_update
 
     # Spectra
     if not cur_iso:
-        return html.Div("No spectrum selected.", style={"color":"gray"})
+        return html.Div("No spectrum selected.", style={"color":"gray"}), no_update
     dt = datetime.fromisoformat(cur_iso)
     doc = fidas.fetch_spectrum_doc(dt)
     if not doc:
-        return html.Div("Spectrum not found.", style={"color":"gray"})
+        return html.Div("Spectrum not found.", style={"color":"gray"}), no_update
     fig = fidas.create_spectrum_figure(doc["sizes"], doc["spectra"])
-    return dcc.Graph(figure=fig, style={"height":"100%"})
+    return dcc.Graph(figure=fig, style={"height":"100%"}), no_update
+
+
+@dash.callback(
+    Output("fidas-tab-content","children", allow_duplicate=True),
+    Input("fidas-long-request","data"),
+    background=True,
+    progress=Output("fidas-progress-text","children"),
+    running=[(Output("fidas-progress","style"), {"display":"block"}, {"display":"none"})],
+    cancel=[
+      Input("fidas-tabs","value"),
+      Input("fidas-date-range","value"),
+      Input("fidas-aggregation","value"),
+      Input("fidas-param-checklist","value")
+    ],
+    prevent_initial_call=True
+)
+def _render_tab_background(set_progress, request):
+    if not request:
+        return no_update
+    *args, marker = request
+    with profile_background("fidas-tab-content.children", args, marker):
+        return _build_time_series(*args, set_progress=set_progress)
 
 
 # Download‐modal callbacks (unchanged)
@@ -1,25 +1,18 @@
 import dash
 import dash_bootstrap_components as dbc
-from dash import html, dcc, Input, Output, callback, State
+from dash import html, dcc, Input, Output, callback, clientside_callback, State, no_update, ALL
 import dash_daq as daq
 import pandas as pd
 import plotly.graph_objects as go
 from datetime import datetime, timedelta, timezone
 from graphs.iot_graphs import IoTGraphs
 from graphs.meteo_graphs import meteostationGraphs
-from pymongo import MongoClient
-import configparser
-import os
-
-# Load configuration
-config = configparser.ConfigParser()
-config_path = os.path.join(os.path.dirname(__file__), '../config', 'config.ini')
-config.read(config_path)
-
-# Retrieve MongoDB settings
-MONGO_URI = config.get('mongodb', 'uri')
-DB_NAME   = config.get('mongodb', 'database')
-STATIONS_INFO = config.get('mongodb', 'stations_info_collection')
+from database import get_db
+from settings import STATIONS_INFO
+from background import LONG_RANGES
+from row_budget import MAX_ROWS, bucket_label
+from downloads import stream_url
+from profiling import background_marker, profile_background
 
 
 dash.register_page(__name__, path_template="/stationdata/<device_type>/<station_num>", title="Station Monitoring Dashboard")
@@ -27,18 +20,19 @@ dash.register_page(__name__, path_template="/stationdata/<device_type>/<station_
 iot_graphs = IoTGraphs()
 meteo_graphs = meteostationGraphs()
 
+GST = timezone(timedelta(hours=4))
+# server-side buckets matching the aggregation choices, for downloads over the row budget
+AGGREGATION_BUCKETS = {"H": (1, "hour"), "D": (1, "day"), "W": (1, "week"), "M": (1, "month")}
+
 def add_location_info(df, station_num):
     """
     Given a DataFrame and a station number, query the stations_info collection
     to retrieve location information (long and lat) and add them as "Longitude" and "Latitude" columns.
     """
     try:
-        client = MongoClient(MONGO_URI)
-        db = client[DB_NAME]
-        collection = db[STATIONS_INFO]
+        collection = get_db()[STATIONS_INFO]
         # Query for the document with the given station_num (converted to int)
         doc = collection.find_one({"station_num": int(station_num)})
-        client.close()
         if doc and "long" in doc and "lat" in doc:
             df["Longitude"] = doc["long"]
             df["Latitude"] = doc["lat"]
@@ -94,6 +88,10 @@ layout = dbc.Container([
                         html.Label("Individual Sensor Readings", style={"font-weight": "bold"}),
                         daq.BooleanSwitch(id="split-toggle", on=False, label="OFF/ON", labelPosition="top"),
                     ], id="sensor-readings-container"),
+                    html.Hr(style={"border-top": "2px solid purple"}),
+                    dcc.Link("Data Coverage", id="coverage-link", href="#"),
+                    html.Br(),
+                    dcc.Link("GPS Track", id="track-link", href="#"),
                 ])
             ], className="mb-2", style={
                 "border": "3px solid purple",
@@ -105,6 +103,13 @@ layout = dbc.Container([
         dbc.Col([
             dbc.Card([
                 dbc.CardBody([
+                    dcc.Store(id="graph-long-request"),
+                    # zoomed part of a coarsened view: {"pathname", "date_range", "window": [start, end] UTC}
+                    dcc.Store(id="zoom-window"),
+                    html.Div([
+                        dbc.Spinner(size="sm", color="secondary"),
+                        html.Span(id="graph-progress-text", style={"marginLeft": "8px"}),
+                    ], id="graph-progress", style={"display": "none"}),
                     html.Div(id="graph-output", style={
                         "height": "80vh",
                         "overflow-y": "auto",
@@ -166,7 +171,10 @@ layout = dbc.Container([
             dbc.Button("Close", id="close-download-modal", color="secondary")
         ])
     ], id="download-modal", is_open=False),
-    dcc.Download(id="download-data")
+    dcc.Download(id="download-data"),
+    # URL of a streamed download (downloads.py), opened by the clientside callback below
+    dcc.Store(id="download-stream-url"),
+    html.Div(id="download-stream", style={"display": "none"})
 ], fluid=True)
 
 @callback(
@@ -187,27 +195,49 @@ def load_parameters(pathname):
         if not station_num.isdigit():
             return [], []
         parameters = iot_graphs.get_available_parameters(int(station_num))
-        default_selection = [key for key in parameters.keys() if "PM2,5" in key]
-        if not default_selection:
-            default_selection = list(parameters.keys())
+        default_selection = iot_graphs.default_parameters(parameters)
     options = [{"label": label, "value": key} for key, label in parameters.items()]
     return options, default_selection
 
-@callback(
-    Output("graph-output", "children"),
-    [Input("url", "pathname"),
-     Input("date-range-dropdown", "value"),
-     Input("aggregation-dropdown", "value"),
-     Input("parameter-checklist", "value"),
-     Input("split-toggle", "on")]
-)
-def update_visualization(pathname, date_range, aggregation, selected_parameters, split_view):
+def _resolution_notice(bucket, rows, window):
+    """Note above the graphs when the view is averaged (row budget) or zoomed."""
+    if not bucket and not window:
+        return None
+    text = ""
+    if window:
+        start, end = (t.astimezone(GST) for t in window)
+        text = f"Zoomed to {start:%Y-%m-%d %H:%M} – {end:%Y-%m-%d %H:%M} (GST). "
+    if bucket:
+        text += (
+            f"About {rows:,} samples, more than the {MAX_ROWS:,} shown at once: "
+            f"showing {bucket_label(bucket)} means. Drag across a graph's time axis "
+            f"to zoom in; the zoomed part is loaded at full resolution once it fits."
+        )
+    else:
+        text += "Full resolution."
+    children = [html.Span(text)]
+    if window:
+        children.append(dbc.Button(
+            "Back to the whole period", id={"type": "zoom-reset", "index": 0},
+            color="link", size="sm", className="p-0 ms-2 align-baseline"
+        ))
+    return dbc.Alert(children, color="info", className="py-2 mb-0")
+
+def _build_graphs(pathname, date_range, aggregation, selected_parameters, split_view, zoom=None, set_progress=None):
+    """
+    Fetch, aggregate and plot one station. zoom (IoT boxes only) is the
+    zoom-window store for this view; set_progress (background runs only)
+    receives a short status message before each slow step.
+    """
+    progress = set_progress or (lambda message: None)
     parts = pathname.strip("/").split("/")
     if len(parts) < 3:
         return html.Div("Invalid URL.", style={"color": "red"})
     device_type = parts[1].lower()
     station_num = parts[2]
+    notice, graph_type = None, None
     if device_type in ["meteostation", "meteorological"]:
+        progress("Fetching data…")
         df = meteo_graphs.fetch_data(date_range)
         if not df.empty and "Timestamp" in df.columns:
             if selected_parameters:
@@ -218,6 +248,7 @@ def update_visualization(pathname, date_range, aggregation, selected_parameters,
                     df[col] = pd.to_numeric(df[col], errors="coerce")
         if df.empty or "Timestamp" not in df.columns:
             return html.Div("No data available for the selected period.", style={"color": "gray"})
+        progress("Building figures…")
         df_aggregated = meteo_graphs.aggregate_data(df, aggregation) if aggregation != "None" else df
         figures = meteo_graphs.create_figures(df_aggregated, selected_parameters)
     else:
@@ -226,9 +257,17 @@ def update_visualization(pathname, date_range, aggregation, selected_parameters,
         station_num_int = int(station_num)
         if not selected_parameters:
             return html.Div("Please select parameters to display.", style={"color": "gray"})
-        df = iot_graphs.fetch_station_data(station_num_int, date_range, selected_parameters, split_view)
+        window = tuple(datetime.fromisoformat(t) for t in zoom["window"]) if zoom else None
+        # periods over the row budget are averaged by MongoDB (see row_budget.py)
+        bucket, rows = iot_graphs.plan_resolution(station_num_int, date_range, window)
+        progress("Fetching data…")
+        df = iot_graphs.fetch_station_data(
+            station_num_int, date_range, selected_parameters, split_view, window=window, bucket=bucket
+        )
+        notice = _resolution_notice(bucket, rows, window)
         if df.empty:
-            return html.Div("No data available for the selected period.", style={"color": "gray"})
+            return html.Div([notice, html.Div("No data available for the selected period.", style={"color": "gray"})])
+        progress("Building figures…")
         df_aggregated = iot_graphs.aggregate_data(df, aggregation)
         figures = iot_graphs.create_iotbox_figures(
             df_aggregated,
@@ -236,11 +275,97 @@ def update_visualization(pathname, date_range, aggregation, selected_parameters,
             iot_graphs.get_available_parameters(station_num_int),
             split_view
         )
+        # zooming into a coarsened graph loads that part (update_zoom_window)
+        graph_type = "coarse-graph" if bucket else None
+    graphs = [
+        dcc.Graph(figure=fig, style={"border": "2px solid lightgray", "padding": "5px"},
+                  **({"id": {"type": graph_type, "index": i}} if graph_type else {}))
+        for i, fig in enumerate(figures)
+    ]
     return html.Div(
-        [dcc.Graph(figure=fig, style={"border": "2px solid lightgray", "padding": "5px"}) for fig in figures],
+        ([notice] if notice else []) + graphs,
         style={"display": "flex", "flex-direction": "column", "gap": "10px"}
     )
 
+@callback(
+    [Output("graph-output", "children"),
+     Output("graph-long-request", "data")],
+    [Input("url", "pathname"),
+     Input("date-range-dropdown", "value"),
+     Input("aggregation-dropdown", "value"),
+     Input("parameter-checklist", "value"),
+     Input("split-toggle", "on"),
+     Input("zoom-window", "data")]
+)
+def update_visualization(pathname, date_range, aggregation, selected_parameters, split_view, zoom):
+    # a zoom only applies to the view it was made in
+    if not zoom or (zoom.get("pathname"), zoom.get("date_range")) != (pathname, date_range):
+        zoom = None
+    # long ranges are rendered by the background callback below
+    if date_range in LONG_RANGES:
+        return no_update, {
+            "pathname": pathname, "date_range": date_range, "aggregation": aggregation,
+            "selected_parameters": selected_parameters, "split_view": split_view, "zoom": zoom,
+            "profile": background_marker(),
+        }
+    return _build_graphs(pathname, date_range, aggregation, selected_parameters, split_view, zoom), no_update
+
+@callback(
+    Output("graph-output", "children", allow_duplicate=True),
+    Input("graph-long-request", "data"),
+    background=True,
+    progress=Output("graph-progress-text", "children"),
+    running=[(Output("graph-progress", "style"), {"display": "block"}, {"display": "none"})],
+    cancel=[
+        Input("url", "pathname"),
+        Input("date-range-dropdown", "value"),
+        Input("aggregation-dropdown", "value"),
+        Input("parameter-checklist", "value"),
+        Input("split-toggle", "on"),
+        Input("zoom-window", "data"),
+    ],
+    prevent_initial_call=True
+)
+def update_visualization_background(set_progress, request):
+    if not request:
+        return no_update
+    request = dict(request)
+    marker = request.pop("profile", None)
+    with profile_background("graph-output.children", request, marker):
+        return _build_graphs(set_progress=set_progress, **request)
+
+def _relayout_range(relayout):
+    """(start, end) of an x-axis zoom from a graph's relayoutData, or None."""
+    relayout = relayout or {}
+    if "xaxis.range[0]" in relayout and "xaxis.range[1]" in relayout:
+        return relayout["xaxis.range[0]"], relayout["xaxis.range[1]"]
+    if isinstance(relayout.get("xaxis.range"), list) and len(relayout["xaxis.range"]) == 2:
+        return tuple(relayout["xaxis.range"])
+    return None
+
+@callback(
+    Output("zoom-window", "data"),
+    Input({"type": "coarse-graph", "index": ALL}, "relayoutData"),
+    Input({"type": "zoom-reset", "index": ALL}, "n_clicks"),
+    State("url", "pathname"),
+    State("date-range-dropdown", "value"),
+    prevent_initial_call=True
+)
+def update_zoom_window(relayouts, resets, pathname, date_range):
+    ctx = dash.callback_context
+    trigger = ctx.triggered_id
+    if not isinstance(trigger, dict):
+        return no_update
+    if trigger["type"] == "zoom-reset":
+        return None if any(resets) else no_update
+    zoomed = _relayout_range(ctx.triggered[0]["value"])
+    if not zoomed:
+        return no_update
+    # the axis shows GST wall-clock time (graphs/encoding.py)
+    start, end = (pd.Timestamp(t).tz_localize(GST).tz_convert(timezone.utc) for t in zoomed)
+    return {"pathname": pathname, "date_range": date_range,
+            "window": [start.isoformat(), end.isoformat()]}
+
 @callback(
     [Output("download-parameter-checklist", "options"),
      Output("download-parameter-checklist", "value")],
@@ -259,9 +384,7 @@ def load_download_parameters(pathname):
         if not station_num.isdigit():
             return [], []
         parameters = iot_graphs.get_available_parameters(int(station_num))
-        default_selection = [key for key in parameters.keys() if "PM2,5" in key]
-        if not default_selection:
-            default_selection = list(parameters.keys())
+        default_selection = iot_graphs.default_parameters(parameters)
     options = [{"label": label, "value": key} for key, label in parameters.items()]
     return options, default_selection
 
@@ -287,6 +410,7 @@ def toggle_download_modal(open_click, close_click, confirm_click, is_open):
 
 @callback(
     Output("download-data", "data"),
+    Output("download-stream-url", "data"),
     Input("confirm-download-button", "n_clicks"),
     State("download-type-radio", "value"),
     State("download-parameter-checklist", "value"),
@@ -298,7 +422,7 @@ def toggle_download_modal(open_click, close_click, confirm_click, is_open):
 def generate_csv(n_clicks, download_type, download_params, download_date_range, aggregation, pathname):
     parts = pathname.strip("/").split("/")
     if len(parts) < 3:
-        return
+        return no_update, no_update
     device_type = parts[1].lower()
     station_num = parts[2]
     if device_type in ["meteostation", "meteorological"]:
@@ -319,24 +443,40 @@ def generate_csv(n_clicks, download_type, download_params, download_date_range,
             # Always add location info from stations_info collection
             df = add_location_info(df, station_num)
         if df.empty or "Timestamp" not in df.columns:
-            return dcc.send_data_frame(lambda: "", filename="meteostation.csv")
+            return dcc.send_data_frame(lambda: "", filename="meteostation.csv"), no_update
         df_aggregated = meteo_graphs.aggregate_data(df, aggregation) if aggregation != "None" else df
         filename = "meteostation.csv"
     else:
         if not station_num.isdigit():
-            return
+            return no_update, no_update
         station_num_int = int(station_num)
         if download_type == "all":
-            full_params = iot_graphs.get_full_sensor_parameters(station_num_int)
-            parameters = list(full_params.keys())
-            df = iot_graphs.fetch_station_data(station_num_int, download_date_range, parameters, True)
+            parameters = list(iot_graphs.get_full_sensor_parameters(station_num_int))
         else:
-            df = iot_graphs.fetch_station_data(station_num_int, download_date_range, download_params, True)
+            parameters = download_params or []
+        # over the row budget: MongoDB aggregates, or the raw rows are streamed (downloads.py)
+        bucket, _ = iot_graphs.plan_resolution(station_num_int, download_date_range)
+        if bucket and aggregation in AGGREGATION_BUCKETS:
+            df = iot_graphs.fetch_station_data(
+                station_num_int, download_date_range, parameters, True, bucket=AGGREGATION_BUCKETS[aggregation]
+            )
+            aggregation = "None"
+        elif bucket:
+            return no_update, stream_url(station_num_int, download_date_range, parameters)
+        else:
+            df = iot_graphs.fetch_station_data(station_num_int, download_date_range, parameters, True)
         if df.empty:
-            return dcc.send_data_frame(lambda: "", filename=f"station{station_num}.csv")
+            return dcc.send_data_frame(lambda: "", filename=f"station{station_num}.csv"), no_update
         df_aggregated = iot_graphs.aggregate_data(df, aggregation)
         filename = f"station{station_num}.csv"
-    return dcc.send_data_frame(df_aggregated.to_csv, filename=filename, index=False)
+    return dcc.send_data_frame(df_aggregated.to_csv, filename=filename, index=False), no_update
+
+clientside_callback(
+    "function(url) { if (url) { window.location.assign(url); } return ''; }",
+    Output("download-stream", "children"),
+    Input("download-stream-url", "data"),
+    prevent_initial_call=True
+)
 
 @callback(
     Output("sensor-readings-container", "style"),
@@ -351,20 +491,18 @@ def toggle_sensor_readings_container(pathname):
         return {"display": "none"}
     return {}
 
-def add_location_info(df, station_num):
-    """
-    Given a DataFrame and a station number, query the stations_info collection to
-    retrieve location information (long and lat) and add them as "Longitude" and "Latitude" columns.
-    """
-    try:
-        client = MongoClient("mongodb://localhost:27017/")
-        db = client["all_stations_db"]
-        collection = db["stations_info"]
-        doc = collection.find_one({"station_num": int(station_num)})
-        client.close()
-        if doc and "long" in doc and "lat" in doc:
-            df["Longitude"] = doc["long"]
-            df["Latitude"] = doc["lat"]
-    except Exception as e:
-        print(f"Error retrieving location info: {e}")
-    return df
+@callback(
+    [Output("coverage-link", "href"),
+     Output("track-link", "href"),
+     Output("track-link", "style")],
+    Input("url", "pathname")
+)
+def update_page_links(pathname):
+    parts = pathname.strip("/").split("/")
+    # only IoT boxes report GPS positions
+    is_meteo = len(parts) >= 2 and parts[1].lower() in ["meteostation", "meteorological"]
+    return (
+        pathname.replace("/stationdata/", "/coverage/", 1),
+        pathname.replace("/stationdata/", "/track/", 1),
+        {"display": "none"} if is_meteo else {}
+    )
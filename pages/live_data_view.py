@@ -1,8 +1,9 @@
 import dash
 import dash_bootstrap_components as dbc
-from dash import html, dcc, Input, Output, callback, State
+from dash import html, dcc, Input, Output, callback, State, no_update
 import pandas as pd
 from graphs.iot_graphs import IoTGraphs
+from station_stats import get_stats
 
 # Register the page with a URL pattern for device_type and station_num
 dash.register_page(__name__, path_template="/livedata/<device_type>/<station_num>", title="Station Monitoring Dashboard")
@@ -31,6 +32,8 @@ def layout(station_num=None, device_type=None):
         ),
         # Hidden store to save URL parameters (station number and device type)
         dcc.Store(id="station-info", data={"station_num": station_num, "device_type": device_type}),
+        # newest timestamp the cards were built from (station_stats high-water mark)
+        dcc.Store(id="live-last-seen"),
         # Main content container (padding-top adjusted to avoid navbar overlap)
         dbc.Container(id="live-data-content", style={"paddingTop": "150px"}),
         # Interval component for live updates (update every 5 seconds)
@@ -39,10 +42,12 @@ def layout(station_num=None, device_type=None):
 
 @callback(
     Output("live-data-content", "children"),
+    Output("live-last-seen", "data"),
     Input("live-update-interval", "n_intervals"),
-    State("station-info", "data")
+    State("station-info", "data"),
+    State("live-last-seen", "data")
 )
-def update_live_data(n_intervals, station_info):
+def update_live_data(n_intervals, station_info, last_seen):
     """
     Callback to update the live dashboard data.
     It fetches the available parameters for the station, gets recent data from the last 6 hours,
@@ -50,22 +55,28 @@ def update_live_data(n_intervals, station_info):
     populate styled cards that mimic your HTML template -this is just an addition to the commments.
     """
     if not station_info or not station_info.get("station_num"):
-        return html.Div("Invalid station information.", style={"color": "red"})
+        return html.Div("Invalid station information.", style={"color": "red"}), no_update
     try:
         station_num = int(station_info["station_num"])
     except ValueError:
-        return html.Div("Invalid station number.", style={"color": "red"})
+        return html.Div("Invalid station number.", style={"color": "red"}), no_update
+
+    # Skip the refresh when station_stats reports no new data since the last one
+    stats = get_stats(f"station{station_num}")
+    latest = stats["latest"].isoformat() if stats and stats.get("latest") else None
+    if latest is not None and latest == last_seen:
+        return no_update, no_update
     
     # Get the available parameters and their labels
     parameters = iot_graphs.get_available_parameters(station_num)
     if not parameters:
-        return html.Div("No parameters available for this station.", style={"color": "gray"})
+        return html.Div("No parameters available for this station.", style={"color": "gray"}), latest
     
     # Fetch recent data for the station (using a 6-hour window)
     selected_parameters = list(parameters.keys())
     df = iot_graphs.fetch_station_data(station_num, "6H", selected_parameters, split_view=False)
     if df.empty:
-        return html.Div("No recent data available.", style={"color": "gray"})
+        return html.Div("No recent data available.", style={"color": "gray"}), latest
     
     # Prepare a card for each parameter
     cards = []
@@ -142,6 +153,6 @@ def update_live_data(n_intervals, station_info):
         cards.append(card)
     
     # Return the row of cards
-    return dbc.Row(cards, justify="start")
+    return dbc.Row(cards, justify="start"), latest
 
 # End of liveData.py
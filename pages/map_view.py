@@ -1,51 +1,18 @@
 # map_view.py
 
+from datetime import datetime, timedelta, timezone
+
 import dash
 import dash_bootstrap_components as dbc
-from dash import html, dcc, callback_context, no_update
-from dash.dependencies import Input, Output, State, ALL
-
-import json
-import os
-import configparser
-import pandas as pd
+from dash import html, dcc, callback_context, clientside_callback, no_update
+from dash.dependencies import ClientsideFunction, Input, Output, State
 
-from pymongo import MongoClient
-from station_map import StationMap
-
-# ------------------------------------------------------------------------------
-# Load configuration
-# ------------------------------------------------------------------------------
-cfg = configparser.ConfigParser()
-cfg_path = os.path.join(os.path.dirname(__file__), '../config/config.ini')
-cfg.read(cfg_path)
-
-MONGO_URI          = cfg.get('mongodb', 'uri')
-DB_NAME            = cfg.get('mongodb', 'database')
-BUOY_COLL          = cfg.get('mongodb', 'buoy_01_collection')
-METEO_COLL         = cfg.get('mongodb', 'f1_meteo_collection')
-
-# ------------------------------------------------------------------------------
-# Load special‐station available data
-# ------------------------------------------------------------------------------
-avail_path = os.path.join(os.path.dirname(__file__), '..', 'metadata', 'available_data.json')
-with open(avail_path, 'r', encoding='utf-8') as f:
-    _avail_list = json.load(f)
-SPECIAL_AVAIL = {d['station_type']: d for d in _avail_list}
-
-# ------------------------------------------------------------------------------
-# Human-readable display names for metadata files
-# ------------------------------------------------------------------------------
-DISPLAY_NAMES = {
-    "iotbox_metadata.json":        "IoT Box",
-    "meteostation_metadata.json":  "Meteorological Station",
-    "buoy_metadata.json":          "Buoy",
-    "fidas_metadata.json":         "Fidas Palas 200S",
-    "exo_metadata.json":           "EXO Sonde 2",
-    "idronaut_metadata.json":      "Idronaut",
-    "ead_ctd_metadata.json":       "EAD CTD",
-    "coral_reef_metadata.json":    "Coral Reef Monitoring"
-}
+from availability import summary as availability, collection_for, time_field
+from graphs.compare_graphs import GST, QUANTITIES
+from metadata_tables import METADATA_FILES, display_name, metadata_table, special_availability
+from settings import MONGO_URI, DB_NAME
+from snapshots import SLIDER_DAYS, get_frame, latest_hour
+from station_map import StationMap, LAYER_RANGES
 
 # ------------------------------------------------------------------------------
 # Register page & initialize StationMap
@@ -59,6 +26,10 @@ station_map = StationMap(mongo_uri=MONGO_URI, db_name=DB_NAME)
 layout = dbc.Container(
     [
         dcc.Location(id="url", refresh=False),
+        # set by the "Station Metadata" popup button (assets/station_map.js)
+        dcc.Store(id="metadata-request"),
+        # every mappable station, loaded once per visit and filtered in the browser
+        dcc.Store(id="station-features"),
 
         dbc.Row(
             [
@@ -128,6 +99,56 @@ layout = dbc.Container(
                                     ],
                                     value="all",
                                 ),
+                                html.Br(),
+                                html.Label("Parameter Layer", style={"fontWeight": "bold"}),
+                                dcc.Dropdown(
+                                    id="layer-quantity",
+                                    options=[{"label": "Off", "value": "off"}] + [
+                                        {"label": spec["label"], "value": q} for q, spec in QUANTITIES.items()
+                                    ],
+                                    value="off",
+                                    clearable=False,
+                                ),
+                                html.Div(
+                                    [
+                                        html.Div(id="layer-time", style={"marginTop": "10px"}),
+                                        dcc.Slider(
+                                            id="layer-hour",
+                                            min=-(SLIDER_DAYS * 24 - 1),
+                                            max=0,
+                                            step=1,
+                                            value=0,
+                                            marks={-d * 24: f"-{d}d" if d else "latest" for d in range(SLIDER_DAYS)},
+                                        ),
+                                        html.Div(
+                                            [
+                                                dbc.Button(
+                                                    "Play",
+                                                    id="layer-play",
+                                                    n_clicks=0,
+                                                    size="sm",
+                                                    style={"backgroundColor": "purple", "color": "white"}
+                                                ),
+                                                dcc.RadioItems(
+                                                    id="layer-step",
+                                                    options=[
+                                                        {"label": " Hourly", "value": 1},
+                                                        {"label": " Daily", "value": 24},
+                                                    ],
+                                                    value=1,
+                                                    inline=True,
+                                                    labelStyle={"marginLeft": "10px"},
+                                                ),
+                                            ],
+                                            style={"display": "flex", "alignItems": "center"},
+                                        ),
+                                        dcc.Interval(id="layer-interval", interval=1000, disabled=True),
+                                        # newest snapshot hour, read once when a parameter is chosen
+                                        dcc.Store(id="layer-latest"),
+                                    ],
+                                    id="layer-controls",
+                                    style={"display": "none"},
+                                ),
                             ]
                         ),
                         style={"height": "100%", "border": "2px solid purple", "boxShadow": "2px 2px 5px lightgrey"},
@@ -139,7 +160,14 @@ layout = dbc.Container(
                 dbc.Col(
                     dbc.Card(
                         dbc.CardBody(
-                            html.Div(id="map-output", style={"height": "100%"})
+                            html.Div(
+                                [
+                                    html.Div("No stations found", id="map-empty-notice", style={"display": "none"}),
+                                    station_map.create_map([]),
+                                ],
+                                id="map-output",
+                                style={"height": "100%"},
+                            )
                         ),
                         style={"height": "100%", "border": "2px solid purple", "boxShadow": "2px 2px 5px lightgrey"},
                     ),
@@ -173,116 +201,116 @@ layout = dbc.Container(
 # Callbacks
 # ------------------------------------------------------------------------------
 @dash.callback(
-    Output("map-output", "children"),
+    Output("station-features", "data"),
+    Input("url", "pathname"),
+)
+def load_stations(pathname):
+    return station_map.station_features(station_map.fetch_station_data())
+
+
+# Search, privacy, type and status filters run client-side (assets/station_map.js)
+clientside_callback(
+    ClientsideFunction(namespace="stationMap", function_name="filterStations"),
+    Output("station-layer", "data"),
+    Output("station-map", "viewport"),
+    Output("map-empty-notice", "style"),
     Input("search-button", "n_clicks"),
-    State("search-input", "value"),
     Input("privacy-dropdown", "value"),
     Input("type-dropdown", "value"),
     Input("status-dropdown", "value"),
-    prevent_initial_call=False,
+    Input("station-features", "data"),
+    State("search-input", "value"),
 )
-def update_filters(n_clicks, search_term, privacy_filter, type_filter, status_filter):
-    data = station_map.fetch_station_data()
 
-    # Name fallback for IoTBox
-    for s in data:
-        if not s.get("Station Name") and s["Device Type"] == "IoTBox":
-            s["Station Name"] = f"Station {s['Station Num']}"
 
-    # Apply search filter
-    if search_term:
-        term = search_term.lower()
-        data = [
-            s for s in data
-            if term in s.get("Station Name", "").lower()
-            or term == str(s.get("Station Num", ""))
-        ]
-
-    # Apply privacy filter
-    if privacy_filter != "all":
-        data = [s for s in data if s["Privacy"] == privacy_filter]
-
-    # Apply type filter
-    if type_filter != "all":
-        data = [s for s in data if s["Device Type"] == type_filter]
-
-    # Apply status filter
-    if status_filter != "all":
-        data = [s for s in data if s["Status"] == status_filter]
+# Parameter layer: one snapshot document per frame (snapshots.py)
+@dash.callback(
+    Output("station-layer", "hideout"),
+    Output("station-layer", "cluster"),
+    Output("layer-controls", "style"),
+    Output("layer-time", "children"),
+    Output("layer-latest", "data"),
+    Input("layer-quantity", "value"),
+    Input("layer-hour", "value"),
+    State("layer-latest", "data"),
+    prevent_initial_call=True,
+)
+def update_parameter_layer(quantity, offset, latest):
+    if quantity == "off":
+        return station_map.map_hideout(), True, {"display": "none"}, "", None
+    if callback_context.triggered[0]["prop_id"] == "layer-quantity.value" or latest is None:
+        hour = latest_hour()
+        latest = hour.isoformat() if hour else None
+    if latest is None:
+        return station_map.map_hideout(), True, {"display": "block"}, "No snapshots available yet.", None
+
+    hour = datetime.fromisoformat(latest) + timedelta(hours=offset or 0)
+    frame = get_frame(hour)
+    low, high = LAYER_RANGES.get(quantity, (0, 100))
+    shown = hour.replace(tzinfo=timezone.utc).astimezone(GST).strftime("%Y-%m-%d %H:00 GST")
+    caption = [html.B(shown), html.Br(), f"Colour scale: {low} (purple) to {high} (yellow)"]
+    # unclustered, so every coloured station is visible at once
+    hideout = station_map.layer_hideout(frame, quantity, QUANTITIES[quantity]["label"])
+    return hideout, False, {"display": "block"}, caption, latest
 
-    if not data:
-        return html.Div("No stations found")
 
-    return station_map.create_map(data)
+@dash.callback(
+    Output("layer-interval", "disabled"),
+    Output("layer-play", "children"),
+    Input("layer-play", "n_clicks"),
+    prevent_initial_call=True,
+)
+def toggle_layer_playback(n_clicks):
+    playing = n_clicks % 2 == 1
+    return not playing, "Pause" if playing else "Play"
+
+
+clientside_callback(
+    ClientsideFunction(namespace="stationMap", function_name="advanceSlider"),
+    Output("layer-hour", "value"),
+    Input("layer-interval", "n_intervals"),
+    State("layer-hour", "value"),
+    State("layer-step", "value"),
+    State("layer-hour", "min"),
+    State("layer-hour", "max"),
+    prevent_initial_call=True,
+)
 
 
 @dash.callback(
     Output("metadata-modal", "is_open"),
     Output("modal-body", "children"),
-    Input({"type": "metadata-button", "station": ALL, "device": ALL}, "n_clicks"),
+    Input("metadata-request", "data"),
     Input("close-modal", "n_clicks"),
     State("metadata-modal", "is_open"),
+    prevent_initial_call=True,
 )
-def toggle_metadata_modal(meta_clicks, close_clicks, is_open):
-    # Prevent auto-open on page load
-    if (not meta_clicks or sum(meta_clicks) == 0) and close_clicks == 0:
-        return False, no_update
-
+def toggle_metadata_modal(request, close_clicks, is_open):
     trigger = callback_context.triggered[0]["prop_id"]
-    if trigger == "close-modal.n_clicks":
+    if trigger == "close-modal.n_clicks" or not request:
         return False, no_update
 
-    # Parse which metadata button was clicked
-    raw = trigger.split(".")[0]
-    info = json.loads(raw)
-    sid, dev = info["station"], info["device"]
+    # Station and device of the popup whose metadata button was clicked
+    sid, dev = request["station"], request["device"]
 
-    # Fetch station list & lookup by Station ID
-    all_stations = station_map.fetch_station_data()
-    entry = next((s for s in all_stations if s["Station ID"] == sid), None)
+    entry = station_map.fetch_station(sid)
     station_name = entry["Station Name"] if entry else "Unknown"
     station_num  = entry["Station Num"]  if entry else None
 
     # Determine earliest & latest timestamps
     special = {"SBNTransect", "JWCruise", "underwater_probe", "coral_reef"}
     if dev in special:
-        avail = SPECIAL_AVAIL.get(dev)
+        avail = special_availability(dev)
         if avail:
             earliest = avail["earliest"]
             latest   = avail["latest"]
         else:
             earliest = latest = "N/A"
     else:
-        client = MongoClient(MONGO_URI)
-        db = client[DB_NAME]
-
-        # select correct collection
-        if dev == "IoTBox":
-            coll_name = f"station{station_num}"
-        elif dev == "Buoy":
-            coll_name = BUOY_COLL
-        elif dev == "Meteorological":
-            coll_name = METEO_COLL
-        elif dev == "Fidas_Palas":
-            coll_name = "fidas_nyuad"
-        else:
-            coll_name = None
-
-        # pick correct time field
-        time_field = "Timestamp" if dev == "Meteorological" else "datetime"
-
-        if coll_name and coll_name in db.list_collection_names():
-            coll = db[coll_name]
-            first = coll.find_one({time_field: {"$exists": True}}, sort=[(time_field, 1)])
-            last  = coll.find_one({time_field: {"$exists": True}}, sort=[(time_field, -1)])
-
-            def fmt(doc):
-                if not doc or time_field not in doc:
-                    return "N/A"
-                return pd.to_datetime(doc[time_field]).strftime("%Y-%m-%d %H:%M:%S")
-
-            earliest = fmt(first)
-            latest   = fmt(last)
+        # cached summary, refreshed periodically in the background
+        coll_name = collection_for(dev, station_num)
+        if coll_name:
+            earliest, latest = availability.span(coll_name, time_field(dev))
         else:
             earliest = latest = "N/A"
 
@@ -310,61 +338,13 @@ def toggle_metadata_modal(meta_clicks, close_clicks, is_open):
         ]
     )
 
-    # Load appropriate metadata JSON files
-    metadata_map = {
-        "IoTBox":         ["iotbox_metadata.json"],
-        "Meteorological": ["meteostation_metadata.json"],
-        "Buoy":           ["buoy_metadata.json"],
-        "Fidas_Palas":    ["fidas_metadata.json"],
-        "SBNTransect":    ["exo_metadata.json", "idronaut_metadata.json"],
-        "JWCruise":       ["exo_metadata.json", "idronaut_metadata.json", "ead_ctd_metadata.json"],
-        "underwater_probe": ["exo_metadata.json"],
-        "coral_reef":     ["coral_reef_metadata.json"]
-    }
-    meta_dir = os.path.join(os.path.dirname(__file__), "..", "metadata")
-
+    # Metadata tables are built once and reloaded when a file changes
     tabs = []
-    for fname in metadata_map.get(dev, []):
-        path = os.path.join(meta_dir, fname)
-        if not os.path.exists(path):
-            continue
-
-        # safely load JSON
-        try:
-            with open(path, 'r', encoding='utf-8') as f:
-                raw = f.read().strip()
-                if not raw:
-                    continue
-                items = json.loads(raw)
-        except (json.JSONDecodeError, OSError):
+    for fname in METADATA_FILES.get(dev, []):
+        table = metadata_table(fname)
+        if table is None:
             continue
-
-        table = html.Table(
-            [
-                html.Thead(html.Tr([
-                    html.Th("Column"),
-                    html.Th("Descriptor"),
-                    html.Th("Units"),
-                    html.Th("Definition")
-                ])),
-                html.Tbody([
-                    html.Tr([
-                        html.Td(x["column_name"]),
-                        html.Td(x["full_descriptor"]),
-                        html.Td(x["units"]),
-                        html.Td(x["definition"])
-                    ]) for x in items
-                ])
-            ],
-            style={"width": "100%", "marginBottom": "1rem"}
-        )
-
-        label = DISPLAY_NAMES.get(
-            fname,
-            fname.replace("_metadata.json", "").replace("_", " ").title()
-        )
-
-        tabs.append(dbc.Tab(label=label, tab_id=f"tab-{fname}", children=[table]))
+        tabs.append(dbc.Tab(label=display_name(fname), tab_id=f"tab-{fname}", children=[table]))
 
     instruments_heading = html.H5("Instrument(s)", style={"marginTop": "1rem", "marginBottom": "0.5rem"})
     tabs_component = dbc.Tabs(
@@ -0,0 +1,109 @@
+import dash
+import dash_bootstrap_components as dbc
+import dash_leaflet as dl
+from dash import html, dcc, Input, Output, State, callback, no_update
+from graphs.track_graphs import TrackGraphs, TRACK_POINTS
+
+# GPS track of a mobile IoT box, coloured by one parameter
+dash.register_page(__name__, path_template="/track/<device_type>/<station_num>", title="Station Monitoring Dashboard")
+
+track_graphs = TrackGraphs()
+
+def layout(device_type=None, station_num=None):
+    return dbc.Container([
+        dcc.Store(id="track-station", data={"device_type": device_type, "station_num": station_num}),
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.Label("Display Period", style={"font-weight": "bold"}),
+                        dcc.Dropdown(
+                            id="track-date-range",
+                            options=[
+                                {"label": "Past 6 Hours", "value": "6H"},
+                                {"label": "Past 12 Hours", "value": "12H"},
+                                {"label": "Past 1 Day", "value": "1D"},
+                                {"label": "Past 1 Week", "value": "1W"},
+                                {"label": "Past 1 Month", "value": "1M"},
+                                {"label": "Past 6 Months", "value": "6M"}
+                            ],
+                            value="1D",
+                            clearable=False
+                        ),
+                        html.Hr(style={"border-top": "2px solid purple"}),
+                        html.Label("Colour By", style={"font-weight": "bold"}),
+                        dcc.Dropdown(id="track-parameter", placeholder="None"),
+                        html.Hr(style={"border-top": "2px solid purple"}),
+                        dcc.Loading(html.Div(id="track-info"), type="circle"),
+                    ])
+                ], style={
+                    "border": "3px solid purple",
+                    "box-shadow": "2px 2px 5px lightgrey",
+                    "height": "85vh",
+                    "overflow-y": "auto"
+                })
+            ], width=3, style={"padding": "10px"}),
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        dl.Map(
+                            id="track-map",
+                            center=[24.53, 54.43],
+                            zoom=10,
+                            children=[dl.TileLayer(), dl.LayerGroup(id="track-layer")],
+                            style={"width": "100%", "height": "100%"}
+                        )
+                    ])
+                ], style={
+                    "border": "3px solid purple",
+                    "box-shadow": "2px 2px 5px lightgrey",
+                    "height": "85vh"
+                })
+            ], width=9, style={"padding": "10px"})
+        ], class_name="mb-3")
+    ], fluid=True)
+
+@callback(
+    Output("track-parameter", "options"),
+    Output("track-parameter", "value"),
+    Input("track-station", "data")
+)
+def load_track_parameters(station):
+    station_num = str((station or {}).get("station_num"))
+    if not station_num.isdigit():
+        return [], None
+    parameters = track_graphs.iot_graphs.get_available_parameters(int(station_num))
+    options = [{"label": label, "value": key} for key, label in parameters.items()]
+    default = next((key for key in parameters if "PM2,5" in key), None)
+    return options, default
+
+@callback(
+    Output("track-layer", "children"),
+    Output("track-map", "viewport"),
+    Output("track-info", "children"),
+    Input("track-station", "data"),
+    Input("track-date-range", "value"),
+    Input("track-parameter", "value"),
+    State("track-parameter", "options")
+)
+def update_track(station, date_range, parameter, options):
+    station_num = str((station or {}).get("station_num"))
+    if not station_num.isdigit():
+        return [], no_update, html.Div("Invalid station selected.", style={"color": "red"})
+    df = track_graphs.fetch_track(int(station_num), date_range, parameter)
+    if df.empty:
+        return [], no_update, html.Div("No GPS fixes for the selected period.", style={"color": "gray"})
+
+    simplified = track_graphs.simplify(df, TRACK_POINTS)
+    label = next((o["label"] for o in options or [] if o["value"] == parameter), None)
+    layers = track_graphs.create_track_layers(simplified, parameter, label)
+    bounds = [
+        [float(df["Latitude"].min()), float(df["Longitude"].min())],
+        [float(df["Latitude"].max()), float(df["Longitude"].max())]
+    ]
+    info = html.Div([
+        html.P(f"From: {df['DateTime'].iloc[0]:%Y-%m-%d %H:%M}"),
+        html.P(f"To: {df['DateTime'].iloc[-1]:%Y-%m-%d %H:%M}"),
+        html.P(f"GPS fixes: {len(df):,} (drawn with {len(simplified):,} points)"),
+    ])
+    return layers, {"bounds": bounds}, info
@@ -0,0 +1,259 @@
+# profiling.py
+"""
+Opt-in profiling of individual Dash callback executions.
+
+A callback request is profiled when either
+- [profiling] enabled = true in config.ini (optionally limited to the callback
+  ids listed in `callbacks`), or
+- the page was opened with a signed `?profile=<token>` query parameter, so a
+  single slow page can be captured for a single user in production.
+
+Long-range views run as background jobs in another process; those are
+profiled inside the job (profile_background), selected the same way.
+
+Each profiled request writes a pstats file (or a pyinstrument HTML report when
+`profiler = pyinstrument` and pyinstrument is installed) to `output_dir`, and
+appends a line to `index.jsonl` with the callback id, its input/state values
+and the wall time. Inspect pstats files with `python -m pstats` or snakeviz.
+
+Generate a signed link (valid for `token_ttl_hours`):
+    python profiling.py /stationdata/IoTBox/12
+"""
+
+import cProfile
+import hashlib
+import hmac
+import json
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from urllib.parse import parse_qs, urlparse
+
+import flask
+
+from instrumentation import callback_labels, labels_for_path
+from settings import config
+
+PROFILING_ENABLED = config.getboolean('profiling', 'enabled', fallback=False)
+PROFILING_SECRET  = config.get('profiling', 'secret', fallback='')
+PROFILER          = config.get('profiling', 'profiler', fallback='cprofile')
+TOKEN_TTL_HOURS   = config.getfloat('profiling', 'token_ttl_hours', fallback=24)
+PROFILE_CALLBACKS = [
+    c.strip() for c in config.get('profiling', 'callbacks', fallback='').split(',') if c.strip()
+]
+# relative paths are resolved against the repository root
+OUTPUT_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    config.get('profiling', 'output_dir', fallback='profiles')
+)
+
+
+# ------------------------------------------------------------------------------
+# Signed tokens
+# ------------------------------------------------------------------------------
+def _signature(path, expires, secret):
+    msg = f"{path}|{expires}".encode("utf-8")
+    return hmac.new(secret.encode("utf-8"), msg, hashlib.sha256).hexdigest()[:32]
+
+
+def sign(path, secret=PROFILING_SECRET, ttl_hours=TOKEN_TTL_HOURS):
+    """Return a `profile` token for a page path, valid for ttl_hours."""
+    expires = int(time.time() + ttl_hours * 3600)
+    return f"{expires}.{_signature(path, expires, secret)}"
+
+
+def verify(path, token, secret=PROFILING_SECRET):
+    """True if `token` was signed for `path` with `secret` and has not expired."""
+    if not secret or not token or "." not in token:
+        return False
+    expires, sig = token.split(".", 1)
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(sig, _signature(path, int(expires), secret))
+
+
+# ------------------------------------------------------------------------------
+# Request hooks
+# ------------------------------------------------------------------------------
+def _requested_by_link():
+    """Signed ?profile= token on the page that issued this callback request."""
+    ref = urlparse(flask.request.referrer or "")
+    token = parse_qs(ref.query).get("profile", [None])[0]
+    return verify(ref.path, token)
+
+
+def _selected(callback):
+    """True if config.ini profiles this callback."""
+    return PROFILING_ENABLED and (not PROFILE_CALLBACKS or any(c in callback for c in PROFILE_CALLBACKS))
+
+
+def _should_profile(callback):
+    return _selected(callback) or _requested_by_link()
+
+
+def _arguments(payload):
+    """{component.property: value} for the callback's inputs and state."""
+    args = {}
+    for item in (payload.get("inputs", []) + payload.get("state", [])):
+        for entry in (item if isinstance(item, list) else [item]):
+            if isinstance(entry, dict) and "id" in entry:
+                key = entry["id"] if isinstance(entry["id"], str) else json.dumps(entry["id"], sort_keys=True)
+                args[f"{key}.{entry.get('property')}"] = entry.get("value")
+    return args
+
+
+# One profile per process at a time: gthread workers serve several requests at
+# once, and Python 3.12+ refuses a second active cProfile.
+_active = threading.Lock()
+
+
+class _Run:
+    """One profiled callback execution."""
+
+    @classmethod
+    def start(cls, labels, args):
+        """A started _Run, or None (request served unprofiled) if a profile is already running."""
+        if not _active.acquire(blocking=False):
+            print(f"Profiling busy; not profiling {labels[1]}")
+            return None
+        try:
+            return cls(labels, args)
+        except ValueError as e:   # another profiler (not ours) is active
+            _active.release()
+            print(f"Not profiling {labels[1]}: {e}")
+            return None
+
+    def __init__(self, labels, args):
+        self.labels, self.args = labels, args
+        self.started = time.perf_counter()
+        self.sampler = None
+        self.profiler = None
+        if PROFILER == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+                self.sampler = Profiler()
+            except ImportError:
+                print("pyinstrument is not installed; falling back to cProfile")
+        if self.sampler is not None:
+            self.sampler.start()
+        else:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def finish(self):
+        elapsed = time.perf_counter() - self.started
+        try:
+            if self.sampler is not None:
+                self.sampler.stop()
+            else:
+                self.profiler.disable()
+        finally:
+            _active.release()
+
+        page, callback, station = self.labels
+        args_json = json.dumps(self.args, sort_keys=True, default=str)
+        digest = hashlib.sha1(f"{callback}|{args_json}".encode("utf-8")).hexdigest()[:10]
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        safe_cb = re.sub(r"[^A-Za-z0-9_-]+", "_", callback).strip("_")[:80] or "callback"
+        ext = "html" if self.sampler is not None else "pstats"
+        fname = f"{stamp}_{safe_cb}_{digest}.{ext}"
+
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        path = os.path.join(OUTPUT_DIR, fname)
+        if self.sampler is not None:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(self.sampler.output_html())
+        else:
+            self.profiler.dump_stats(path)
+
+        entry = {
+            "file": fname,
+            "created": stamp,
+            "page": page,
+            "callback": callback,
+            "station": station,
+            "args_hash": digest,
+            "args": self.args,
+            "seconds": round(elapsed, 4),
+        }
+        with open(os.path.join(OUTPUT_DIR, "index.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, default=str) + "\n")
+
+
+def install_profiling(app):
+    """Profile callback requests selected by config or a signed ?profile= link."""
+    server = app.server
+
+    @server.before_request
+    def _start_profile():
+        if not flask.request.path.endswith("/_dash-update-component"):
+            return
+        if not (PROFILING_ENABLED or PROFILING_SECRET):
+            return
+        payload = flask.request.get_json(silent=True) or {}
+        labels = callback_labels(payload)
+        if _should_profile(labels[1]):
+            run = _Run.start(labels, _arguments(payload))
+            if run is not None:
+                flask.g.dashboard_profile = run
+
+    @server.after_request
+    def _finish_profile(response):
+        run = flask.g.pop("dashboard_profile", None)
+        if run is not None:
+            run.finish()
+        return response
+
+    @server.teardown_request
+    def _release_profile(exc):
+        # a request that failed before after_request must not hold the profiler
+        run = flask.g.pop("dashboard_profile", None)
+        if run is not None:
+            run.finish()
+
+    return app
+
+
+# ------------------------------------------------------------------------------
+# Background jobs
+# ------------------------------------------------------------------------------
+# Long-range views run as background callbacks in another process (background.py),
+# where the callback request above only dispatched the job. The dispatching
+# callback adds background_marker() to the job's request; the job runs inside
+# profile_background().
+def background_marker():
+    """{"path", "token"} of the page issuing this callback request, for a background job."""
+    if not flask.has_request_context():
+        return None
+    ref = urlparse(flask.request.referrer or "")
+    return {"path": ref.path, "token": parse_qs(ref.query).get("profile", [None])[0]}
+
+
+@contextmanager
+def profile_background(callback, args, marker=None):
+    """
+    Profile a background job when config.ini selects `callback` or the marker
+    carries a valid signed link. The marker comes back through the browser,
+    so the token is verified again here.
+    """
+    marker = marker or {}
+    run = None
+    if _selected(callback) or verify(marker.get("path"), marker.get("token")):
+        page, station = labels_for_path(marker.get("path"))
+        run = _Run.start((page, callback, station), args)
+    try:
+        yield
+    finally:
+        if run is not None:
+            run.finish()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or not PROFILING_SECRET:
+        sys.exit("usage: python profiling.py <page path>   (requires [profiling] secret in config.ini)")
+    page_path = sys.argv[1]
+    print(f"{page_path}?profile={sign(page_path)}")
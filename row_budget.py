@@ -0,0 +1,93 @@
+# row_budget.py
+"""
+Row budget for station time series.
+
+"All Data" without aggregation on a busy IoT box can mean tens of millions of
+rows in one worker. Before such a read, the rows in the period are estimated
+from the collection's station_stats document (its count, spread evenly
+between the earliest and latest sample). Collections without a stats document
+yet fall back to count_documents() over the period, or to
+estimated_document_count() for the whole history. If the estimate exceeds
+`max_rows`, the period is read as MongoDB-side means over the finest time
+bucket that keeps it within the budget, and the page says so. Zooming into a
+graph then loads the zoomed part, at full resolution once it fits the budget.
+
+[row_budget] in config.ini: enabled, max_rows.
+"""
+
+from datetime import datetime, timezone
+
+from settings import config
+from station_stats import get_stats
+
+ENABLED  = config.getboolean('row_budget', 'enabled', fallback=True)
+MAX_ROWS = config.getint('row_budget', 'max_rows', fallback=1_000_000)
+
+# ($dateTrunc binSize, unit) candidates, finest first
+BUCKETS = [
+    (1, "minute"), (5, "minute"), (15, "minute"),
+    (1, "hour"), (3, "hour"), (6, "hour"),
+    (1, "day"), (1, "week"),
+]
+UNIT_SECONDS = {"minute": 60, "hour": 3600, "day": 86400, "week": 604800}
+
+
+def finest_bucket(span_seconds, max_buckets):
+    """Finest (binSize, unit) that splits a span into at most max_buckets buckets."""
+    for size, unit in BUCKETS:
+        if span_seconds / (size * UNIT_SECONDS[unit]) <= max_buckets:
+            return size, unit
+    return BUCKETS[-1]
+
+
+def bucket_label(bucket):
+    size, unit = bucket
+    return f"{size}-{unit}"
+
+
+def _naive_utc(value):
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def estimate_rows(db, collection_name, time_field, start=None, end=None):
+    """
+    (estimated rows, span in seconds) of the period start <= time < end
+    (None = from the first sample / up to now). (0, 0) if it cannot be estimated.
+    """
+    start, end = _naive_utc(start), _naive_utc(end)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    try:
+        stats = get_stats(collection_name, db)
+        if stats and stats.get("count") and stats.get("earliest") and stats.get("latest"):
+            earliest, latest = stats["earliest"], stats["latest"]
+            lo = max(start or earliest, earliest)
+            hi = min(end or latest, latest)
+            span = ((end or now) - (start or earliest)).total_seconds()
+            if hi < lo:
+                return 0, span
+            total = (latest - earliest).total_seconds()
+            share = (hi - lo).total_seconds() / total if total > 0 else 1
+            return int(stats["count"] * share), span
+        bounds = {k: v for k, v in (("$gte", start), ("$lt", end)) if v is not None}
+        if bounds:
+            rows = db[collection_name].count_documents({time_field: bounds})
+        else:
+            # the whole collection: from its metadata, without a scan
+            rows = db[collection_name].estimated_document_count()
+        if start is None:
+            first = db[collection_name].find_one({}, {time_field: 1}, sort=[(time_field, 1)])
+            start = first[time_field] if first else now
+        return rows, ((end or now) - start).total_seconds()
+    except Exception as e:
+        print(f"Error estimating rows of {collection_name}: {e}")
+        return 0, 0
+
+
+def coarse_bucket(rows, span_seconds, max_rows=None):
+    """None while `rows` fit the budget, else the (binSize, unit) to average the period into."""
+    max_rows = max_rows or MAX_ROWS
+    if not ENABLED or rows <= max_rows:
+        return None
+    return finest_bucket(span_seconds, max_rows)
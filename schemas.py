@@ -0,0 +1,126 @@
+# schemas.py
+"""
+Compact column types for the frames the data layer fetches.
+
+Each device type declares which metadata/*.json entry describes each of its
+fields; the kind of a column follows from the entry's units:
+
+- "time"        (units with a date pattern)  -> datetime64[ns]
+- "code"        (no units: flags, modes)     -> smallest nullable integer, or
+                                                float32 if a value is fractional
+- "measurement" (anything else)              -> float32
+
+GPS positions are float32 as well: steps of about half a metre, well below
+the receivers' accuracy. Other float64 columns become float32; remaining
+columns are left alone. compact() runs on every partial frame (shard chunks,
+cached days), so large reads never hold float64/object copies of the whole
+period.
+"""
+
+import numpy as np
+import pandas as pd
+
+from metadata_tables import METADATA_FILES, metadata_items
+
+# frame column -> metadata column_name, per device type. IoT columns are
+# matched on the parameter name in lower case ("<sensor>.<param>" in split view).
+FIELDS = {
+    "IoTBox": {
+        "temperature": "Temperature", "humidity": "Humidity", "pressure": "Pressure", "co2": "CO2",
+        "pm1mass": "PM1Mass", "pm2,5mass": "PM2.5Mass", "pm2.5mass": "PM2.5Mass", "pm10mass": "PM10Mass",
+    },
+    "Meteorological": {
+        "S1_RAD": "Radiation", "S2_DP[C]": "DewPoint", "S2_PA": "AtmosphericPressure",
+        "S2_PREC[MM]": "Precipitation", "S2_RH[%]": "RelativeHumidity", "S2_TA[C]": "Temperature",
+        "S2_WD": "WindDirection", "S2_WS[M/S]": "WindSpeed",
+    },
+    "Buoy": {
+        "datetime": "Datetime", "wind_speed": "Wind Speed", "wind_direction": "Wind Direction",
+        "air_temp": "Air Temperature", "barometric_pressure": "Barometric Pressure", "albedo": "Albedo",
+    },
+    "Fidas_Palas": {
+        "PM1": "PM1Mass", "PM2.5": "PM2.5Mass", "PM4": "PM4Mass", "PM10": "PM10Mass", "PMtot": "TotalPMMass",
+        "Cn": "CountNumber", "rH": "RelativeHumidity", "dewT": "DewPoint", "T": "AirTemperature",
+        "p": "AtmosphericPressure", "Wspeed": "WindSpeed", "Wdir": "WindDirection", "Wq": "WindQuality",
+        "prec": "PrecipitationIntensity", "ptype": "PrecipitationType", "flowrate": "Flowrate",
+        "velocity": "Velocity", "coincidence": "Coincidence", "po": "PumpOutput",
+        "IADS_T": "IADSTemperature", "cd": "ChannelDeviation", "LED_T": "LEDTemperature",
+        "errors": "ErrorFlags", "mode": "OperationMode",
+        "PM1a": "PM1AmbientMass", "PM2.5a": "PM2.5AmbientMass", "PM4a": "PM4AmbientMass",
+        "PM10a": "PM10AmbientMass", "PMtota": "TotalPMAmbientMass",
+        "PM1c": "PM1ClassicMass", "PM2.5c": "PM2.5ClassicMass", "PM4c": "PM4ClassicMass",
+        "PM10c": "PM10ClassicMass", "PMtotc": "TotalPMClassicMass",
+        "PMth": "ThoracicPMMass", "PMal": "AlveolarPMMass", "PMre": "RespirablePMMass",
+        "pT": "PerceivedTemperature", "feelLike": "FeelsLikeTemperature",
+        "hIdx_nws": "HeatIndex", "wbgt": "WBGT",
+    },
+}
+# columns the metadata does not describe
+EXTRA = {
+    "IoTBox": {"DateTime": "time", "Longitude": "measurement", "Latitude": "measurement"},
+    "Meteorological": {"Timestamp": "time", "I3_VPOWER": "measurement", "I4_VOUT": "measurement"},
+    "Buoy": {},
+    "Fidas_Palas": {"datetime": "time"},
+}
+# kind of any other column (IoT frames hold nothing but parameters besides the above)
+DEFAULT = {"IoTBox": "measurement"}
+
+INT_TYPES = ["Int8", "Int16", "Int32", "Int64"]
+
+_schemas = {}
+
+
+def _kind(units):
+    units = (units or "").strip()
+    if "YYYY" in units:
+        return "time"
+    return "measurement" if units else "code"
+
+
+def schema(device_type):
+    """{column: kind} for a device type."""
+    if device_type not in _schemas:
+        units = {
+            item.get("column_name"): item.get("units")
+            for fname in METADATA_FILES.get(device_type, [])
+            for item in metadata_items(fname)
+        }
+        declared = {
+            column: _kind(units[name])
+            for column, name in FIELDS.get(device_type, {}).items() if name in units
+        }
+        _schemas[device_type] = {**declared, **EXTRA.get(device_type, {})}
+    return _schemas[device_type]
+
+
+def _code(values):
+    values = pd.to_numeric(values, errors="coerce")
+    finite = values.dropna()
+    if not len(finite) or not np.array_equal(finite.to_numpy(), np.floor(finite.to_numpy())):
+        return values.astype("float32")
+    for name in INT_TYPES:
+        info = np.iinfo(name.lower())
+        if finite.min() >= info.min and finite.max() <= info.max:
+            return values.astype(name)
+    return values.astype("float32")
+
+
+def compact(df, device_type):
+    """The frame with the device type's column types (in place, also returned)."""
+    if df.empty:
+        return df
+    kinds = schema(device_type)
+    for col in df.columns:
+        kind = kinds.get(col)
+        if kind is None and device_type == "IoTBox":
+            kind = kinds.get(str(col).split(".")[-1].lower())
+        if kind is None:
+            kind = DEFAULT.get(device_type) or ("measurement" if df[col].dtype == "float64" else None)
+        dtype = df[col].dtype
+        if kind == "time" and dtype.kind != "M":
+            df[col] = pd.to_datetime(df[col])
+        elif kind == "code":
+            df[col] = _code(df[col])
+        elif kind == "measurement" and dtype != "float32":
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float32")
+    return df
@@ -0,0 +1,27 @@
+# settings.py
+"""
+Single loader for config/config.ini.
+
+The file is parsed once per process, the first time any module asks for it.
+Modules keep reading their settings at import time, as before, but through
+`config` from here instead of each building its own ConfigParser.
+"""
+
+import configparser
+import os
+
+# MACCESS_CONFIG points at another file (the tests use config.ini.example)
+CONFIG_PATH = os.environ.get('MACCESS_CONFIG') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'config', 'config.ini'
+)
+
+config = configparser.ConfigParser()
+config.read(CONFIG_PATH)
+
+# Retrieve MongoDB settings
+MONGO_URI           = config.get('mongodb', 'uri')
+DB_NAME             = config.get('mongodb', 'database')
+STATIONS_INFO       = config.get('mongodb', 'stations_info_collection')
+BUOY_01_COLLECTION  = config.get('mongodb', 'buoy_01_collection')
+F1_METEO_COLLECTION = config.get('mongodb', 'f1_meteo_collection')
+FIDAS_COLLECTION    = config.get('mongodb', 'fidas_collection')
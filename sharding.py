@@ -0,0 +1,163 @@
+# sharding.py
+"""
+Time-sharded parallel reads for full-history ("All") queries.
+
+A single cursor over years of minute data is fetched, BSON-decoded and
+flattened on one core. read_frame() instead splits the [first, last] time span
+of the matching documents into equal shards. Each shard is read by its own
+worker with its own cursor, which decodes the documents into a partial
+DataFrame. The partial frames are concatenated in time order.
+
+[sharding] in config.ini:
+- executor: "process" (default) decodes on separate cores. "thread" only
+  overlaps network and server time, because BSON decoding holds the GIL.
+- workers: pool size, default the CPU count. 1 disables sharding.
+- min_documents: collections smaller than this are read with a single cursor.
+
+Process workers open their own per-process client (database.get_client), so
+their queries do not show up in the web worker's /metrics. Documents whose
+time field is missing or not a date are not part of any shard.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pandas as pd
+
+from database import get_db
+from settings import config
+
+EXECUTOR      = config.get('sharding', 'executor', fallback='process')
+WORKERS       = config.getint('sharding', 'workers', fallback=os.cpu_count() or 1)
+MIN_DOCUMENTS = config.getint('sharding', 'min_documents', fallback=200_000)
+# rows decoded before cursor_frame's `finish` shrinks them into a partial frame
+CHUNK_ROWS    = 50_000
+
+_pools = {}
+_lock = threading.Lock()
+
+
+def _pool(kind):
+    """Shared executor of this process; process pools use spawn, never fork."""
+    key = (os.getpid(), kind)
+    pool = _pools.get(key)
+    if pool is None:
+        with _lock:
+            pool = _pools.get(key)
+            if pool is None:
+                if kind == "process":
+                    pool = ProcessPoolExecutor(
+                        WORKERS, mp_context=multiprocessing.get_context("spawn")
+                    )
+                else:
+                    pool = ThreadPoolExecutor(WORKERS, thread_name_prefix="shard")
+                _pools[key] = pool
+    return pool
+
+
+def _read_shard(source, filt, projection, time_field, decode, stages=None, finish=None):
+    """One shard as a DataFrame. `source` is a collection or (uri, db, collection)."""
+    if isinstance(source, tuple):
+        uri, db_name, collection_name = source
+        source = get_db(db_name, uri)[collection_name]
+    if stages:
+        cursor = source.aggregate(
+            [{"$match": filt}, {"$sort": {time_field: 1}}, *stages], allowDiskUse=True
+        )
+    else:
+        cursor = source.find(filt, dict(projection) if projection else None).sort(time_field, 1)
+    return cursor_frame(cursor, decode, finish)
+
+
+def cursor_chunks(cursor, decode=None, finish=None):
+    """Yield a cursor's documents (decoded by `decode`) as frames of CHUNK_ROWS rows, each passed through `finish`."""
+    finish = finish or (lambda frame: frame)
+    rows = []
+    for doc in cursor:
+        rows.append(decode(doc) if decode else doc)
+        if len(rows) == CHUNK_ROWS:
+            yield finish(pd.DataFrame(rows))
+            rows = []
+    if rows:
+        yield finish(pd.DataFrame(rows))
+
+
+def cursor_frame(cursor, decode=None, finish=None):
+    """
+    DataFrame of a cursor's documents (decoded by `decode`). `finish` runs on
+    every CHUNK_ROWS rows, so the raw rows of a long period are never all held
+    at once.
+    """
+    if not finish:
+        return pd.DataFrame([decode(doc) for doc in cursor] if decode else list(cursor))
+    frames = [f for f in cursor_chunks(cursor, decode, finish) if not f.empty]
+    return pd.concat(frames, ignore_index=True, sort=False) if frames else pd.DataFrame()
+
+
+def shard_filters(collection, time_field, query=None, shards=WORKERS):
+    """
+    Split the time span of the documents matching `query` into `shards`
+    contiguous filters, oldest first. Returns [] if nothing matches.
+    """
+    query = query or {}
+    first = collection.find_one(query, {"_id": 0, time_field: 1}, sort=[(time_field, 1)])
+    last  = collection.find_one(query, {"_id": 0, time_field: 1}, sort=[(time_field, -1)])
+    if not first or not last or time_field not in first or time_field not in last:
+        return []
+    lo, hi = first[time_field], last[time_field]
+    step = (hi - lo) / max(shards, 1)
+    edges = [lo + step * k for k in range(shards)] + [hi]
+
+    filters = []
+    for k in range(len(edges) - 1):
+        upper = "$lte" if k == len(edges) - 2 else "$lt"
+        bounds = {time_field: {"$gte": edges[k], upper: edges[k + 1]}}
+        filters.append({"$and": [query, bounds]} if query else bounds)
+    return filters
+
+
+def read_frame(resource, collection_name, time_field, projection, decode=None, query=None, stages=None,
+               finish=None):
+    """
+    DataFrame of every document matching `query`, in `time_field` order.
+
+    `resource` is a MongoResource. `decode(doc)` turns a raw document into a
+    row dict; it runs inside the workers, so with the process executor it has
+    to be picklable (a module-level function or a functools.partial of one).
+    With `stages`, each shard is read by an aggregation ($match, $sort, then
+    the stages) instead of a find, and `projection` is not used. `finish(df)`
+    shrinks the rows as they arrive (see cursor_frame), e.g. schemas.compact;
+    the same picklability rule as for decode applies.
+    """
+    collection = resource.db[collection_name]
+    explicit = resource._client is not None or resource._db is not None
+
+    shards = WORKERS
+    if shards > 1 and collection.estimated_document_count() < MIN_DOCUMENTS:
+        shards = 1
+    filters = shard_filters(collection, time_field, query, shards) if shards > 1 else []
+    if not filters:
+        return _read_shard(collection, query or {}, projection, time_field, decode, stages, finish)
+
+    # explicitly assigned clients (benchmark, mongomock) cannot cross processes;
+    # daemonic processes may not start children
+    kind = EXECUTOR
+    if explicit or multiprocessing.current_process().daemon:
+        kind = "thread"
+    if kind == "process":
+        source = (resource._mongo_uri, resource._db_name, collection_name)
+    else:
+        source = collection
+
+    pool = _pool(kind)
+    futures = [
+        pool.submit(_read_shard, source, f, projection, time_field, decode, stages, finish)
+        for f in filters
+    ]
+    frames = [f.result() for f in futures]
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True, sort=False)
@@ -0,0 +1,171 @@
+# single_flight.py
+"""
+Request coalescing for the data-layer fetchers.
+
+When a station link is shared, many users open the same page at once and
+issue identical queries. `@single_flight` on a fetch method makes concurrent
+identical calls share one execution:
+
+- threads of a worker wait on the call that is already running and get a
+  copy of its result;
+- across workers (and the background-callback processes) the running call
+  holds an flock on <directory>/<key>.lock. A process that finds the lock
+  taken waits for it, and if the holder published a result that finished
+  after it started waiting, uses that result instead of querying again.
+  Results are only published (pickled into a small diskcache) when another
+  process is waiting.
+
+Only calls that overlap are coalesced; nothing is cached beyond that (see
+background.py and history_cache.py for caching). Objects pointed at an
+explicitly assigned client/db (benchmark, mongomock) are coalesced within
+the process only.
+
+[single_flight] in config.ini: enabled, directory.
+"""
+
+import copy
+import functools
+import hashlib
+import inspect
+import os
+import threading
+import time
+
+import diskcache
+
+from instrumentation import Counter, register
+from settings import config
+
+try:
+    import fcntl
+except ImportError:  # no flock (Windows): coalesce within the process only
+    fcntl = None
+
+ENABLED = config.getboolean('single_flight', 'enabled', fallback=True)
+LOCK_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    config.get('single_flight', 'directory', fallback='.single_flight')
+)
+# published results are only for processes that were already waiting
+RESULT_TTL = 60
+
+CALLS = register(Counter(
+    "single_flight_calls_total",
+    "Fetch calls by outcome: executed, shared_thread (joined a call in this "
+    "worker) or shared_process (used another worker's result).",
+    ("function", "outcome"),
+))
+
+_inflight = {}
+_lock = threading.Lock()
+_results = {}
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.waiters = 0
+        self.shared = None
+        self.error = None
+
+
+def _shared_results():
+    """Per-process handle on the result store (sqlite connections do not survive a fork)."""
+    pid = os.getpid()
+    if pid not in _results:
+        with _lock:
+            if pid not in _results:
+                _results.clear()
+                _results[pid] = diskcache.Cache(os.path.join(LOCK_DIR, "results"))
+    return _results[pid]
+
+
+def call_key(method, resource, args, kwargs):
+    """
+    Hash of a call: the method, the resource's database and collection, and
+    the arguments with defaults applied (positional and keyword calls match).
+    """
+    bound = inspect.signature(method).bind(resource, *args, **kwargs)
+    bound.apply_defaults()
+    shape = (
+        method.__qualname__, getattr(resource, "_mongo_uri", None), getattr(resource, "_db_name", None),
+        getattr(resource, "_collection_name", None), list(bound.arguments.values())[1:],
+    )
+    return hashlib.sha1(repr(shape).encode()).hexdigest()
+
+
+def _across_processes(key, fn):
+    """Run fn() under the key's lock file, or take the result of the holder we waited for."""
+    os.makedirs(LOCK_DIR, exist_ok=True)
+    results = _shared_results()
+    waiting_key = f"{key}:waiting"
+    with open(os.path.join(LOCK_DIR, f"{key}.lock"), "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            since = time.time()
+            results.incr(waiting_key, default=0)
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            finally:
+                results.decr(waiting_key, default=1)
+            published = results.get(key)
+            if published is not None and published[0] >= since:
+                return published[1], True
+        try:
+            result = fn()
+            if results.get(waiting_key, 0) > 0:
+                results.set(key, (time.time(), result), expire=RESULT_TTL)
+            return result, False
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def single_flight(method):
+    """Decorator for MongoResource fetch methods; see the module docstring."""
+    name = method.__qualname__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not ENABLED:
+            return method(self, *args, **kwargs)
+        explicit = getattr(self, "_client", None) is not None or getattr(self, "_db", None) is not None
+        key = call_key(method, self, args, kwargs)
+        if explicit:
+            key = f"{key}-{id(self)}"
+
+        with _lock:
+            call = _inflight.get(key)
+            leader = call is None
+            if leader:
+                call = _inflight[key] = _Call()
+            else:
+                call.waiters += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            CALLS.inc((name, "shared_thread"))
+            # callers modify frames in place (set_index, new columns)
+            return copy.deepcopy(call.shared)
+
+        result = None
+        try:
+            if fcntl is not None and not explicit:
+                result, shared = _across_processes(key, lambda: method(self, *args, **kwargs))
+            else:
+                result, shared = method(self, *args, **kwargs), False
+            CALLS.inc((name, "shared_process" if shared else "executed"))
+            return result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with _lock:
+                del _inflight[key]
+            if call.waiters and call.error is None:
+                # a private copy, before our caller gets to modify the result
+                call.shared = copy.deepcopy(result)
+            call.done.set()
+
+    return wrapper
@@ -0,0 +1,168 @@
+# snapshots.py
+"""
+Hourly snapshots of the map's parameter layer (the `station_snapshots`
+collection): one document per UTC hour holding the hourly mean of every
+comparable quantity (graphs/compare_graphs.QUANTITIES) for each IoT box and
+the Fidas, so a map frame is a single _id lookup instead of a query against
+every station{N} collection.
+
+    {_id: <hour>, values: {"<collection>": {"PM2_5": 12.3, "Temperature": 31.2, ...}}}
+
+Quantity names are stored with dots replaced (snapshot_key).
+
+Each update re-aggregates from the last hour it wrote (kept as
+`snapshot_hour` in the collection's station_stats document); the first run
+goes back `backfill_days`.
+
+    python snapshots.py              # update once
+    python snapshots.py --loop 600   # keep updating every 10 minutes
+"""
+
+import argparse
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from pymongo import UpdateOne
+
+from database import get_db
+from graphs.compare_graphs import CompareGraphs, QUANTITIES, number_field
+from leader import is_leader
+from settings import config, STATIONS_INFO, FIDAS_COLLECTION
+from station_stats import STATS_COLLECTION
+
+SNAPSHOT_COLLECTION = config.get('snapshots', 'collection', fallback='station_snapshots')
+UPDATE_INTERVAL     = config.getint('snapshots', 'update_interval', fallback=600)
+RUN_IN_APP          = config.getboolean('snapshots', 'run_in_app', fallback=True)
+BACKFILL_DAYS       = config.getint('snapshots', 'backfill_days', fallback=30)
+# days the map's time slider reaches back from the newest snapshot
+SLIDER_DAYS         = config.getint('snapshots', 'slider_days', fallback=7)
+
+
+def snapshot_key(quantity):
+    return quantity.replace(".", "_")
+
+
+def snapshot_targets(db):
+    """(collection, time field, {quantity: value expression}) for every IoT box and the Fidas."""
+    nums = [
+        s["station_num"]
+        for s in db[STATIONS_INFO].find(
+            {"type": "IoTBox", "station_num": {"$ne": None}}, {"_id": 0, "station_num": 1}
+        )
+    ]
+    compare = CompareGraphs()
+    compare.db = compare.iot_graphs.db = db
+    fields = {q: compare.iot_fields(nums, spec["iot"]) for q, spec in QUANTITIES.items()}
+    targets = []
+    for n in nums:
+        exprs = {
+            q: {"$avg": [f"${k}" for k in fields[q][n]]}
+            for q in QUANTITIES if fields[q].get(n)
+        }
+        if exprs:
+            targets.append((f"station{n}", "datetime", exprs))
+    if FIDAS_COLLECTION:
+        targets.append((FIDAS_COLLECTION, "datetime", {
+            q: number_field(spec["fidas"]) for q, spec in QUANTITIES.items() if spec["fidas"]
+        }))
+    return targets
+
+
+def hourly_pipeline(time_field, exprs, since):
+    return [
+        {"$match": {time_field: {"$gte": since}}},
+        {"$group": {
+            "_id": {"$dateTrunc": {"date": f"${time_field}", "unit": "hour"}},
+            **{snapshot_key(q): {"$avg": expr} for q, expr in exprs.items()},
+        }},
+        {"$sort": {"_id": 1}},
+    ]
+
+
+def update_collection(db, name, time_field, exprs):
+    """Write the hourly means of `name` since its last snapshot hour. Returns the hours written."""
+    stats = db[STATS_COLLECTION].find_one({"_id": name}, {"snapshot_hour": 1}) or {}
+    since = stats.get("snapshot_hour") or (
+        datetime.now(timezone.utc) - timedelta(days=BACKFILL_DAYS)
+    ).replace(minute=0, second=0, microsecond=0)
+
+    keys = [snapshot_key(q) for q in exprs]
+    writes = []
+    last = None
+    for doc in db[name].aggregate(hourly_pipeline(time_field, exprs, since), allowDiskUse=True):
+        values = {k: round(doc[k], 2) for k in keys if doc.get(k) is not None}
+        last = doc["_id"]
+        if values:
+            writes.append(UpdateOne({"_id": last}, {"$set": {f"values.{name}": values}}, upsert=True))
+    if writes:
+        db[SNAPSHOT_COLLECTION].bulk_write(writes, ordered=False)
+    if last is not None:
+        db[STATS_COLLECTION].update_one({"_id": name}, {"$set": {"snapshot_hour": last}}, upsert=True)
+    return len(writes)
+
+
+def update_all(db=None):
+    """Update the snapshots of every IoT box and the Fidas. Returns the hours written."""
+    db = db if db is not None else get_db()
+    written = 0
+    for name, field, exprs in snapshot_targets(db):
+        try:
+            written += update_collection(db, name, field, exprs)
+        except Exception as e:
+            print(f"Error updating snapshots for {name}: {e}")
+    return written
+
+
+def latest_hour(db=None):
+    """Newest snapshot hour, or None."""
+    db = db if db is not None else get_db()
+    doc = db[SNAPSHOT_COLLECTION].find_one({}, {"_id": 1}, sort=[("_id", -1)])
+    return doc["_id"] if doc else None
+
+
+def get_frame(hour, db=None):
+    """{collection: {snapshot_key(quantity): value}} for one hour (one _id lookup)."""
+    db = db if db is not None else get_db()
+    doc = db[SNAPSHOT_COLLECTION].find_one({"_id": hour})
+    return doc.get("values", {}) if doc else {}
+
+
+_updater = {"pid": None}
+
+
+def start_updater(interval=UPDATE_INTERVAL):
+    """
+    Run update_all() every `interval` seconds on a daemon thread (once per
+    process). Only the leader process (leader.py) updates; the others stand by.
+    """
+    if interval <= 0 or _updater["pid"] == os.getpid():
+        return
+    _updater["pid"] = os.getpid()
+
+    def _loop():
+        # first pass after one interval, so importing the app opens no connections
+        while True:
+            time.sleep(interval)
+            if not is_leader("snapshots"):
+                continue
+            try:
+                update_all()
+            except Exception as e:
+                print(f"Error updating snapshots: {e}")
+
+    threading.Thread(target=_loop, name="station-snapshots", daemon=True).start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update the hourly station_snapshots collection.")
+    parser.add_argument("--loop", type=int, metavar="SECONDS",
+                        help="keep updating every SECONDS instead of once")
+    args = parser.parse_args()
+    while True:
+        written = update_all()
+        print(f"wrote {written} hourly snapshot(s)")
+        if not args.loop:
+            break
+        time.sleep(args.loop)
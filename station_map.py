@@ -1,24 +1,59 @@
 # station_map.py
-from dash import html
 import dash_leaflet as dl
-from pymongo import MongoClient
 import pandas as pd
 import numpy as np
-import math
+from plotly.colors import sample_colorscale
 from typing import List, Dict, Tuple
-import configparser
-import os
 
-config = configparser.ConfigParser()
-config_path = os.path.join(os.path.dirname(__file__), 'config', 'config.ini')
-config.read(config_path)
-
-STATIONS_INFO = config.get('mongodb', 'stations_info_collection')
-
-class StationMap:
+from availability import collection_for
+from database import MongoResource
+from station_stats import all_stats, freshness_status
+from settings import config, STATIONS_INFO
+from warmer import warmed
+
+ICON_MAP = {
+    "IoTBox": "iotbox.png",
+    "Meteorological": "meteostation.png",
+    "Buoy": "buoy.png",
+    "Fidas_Palas": "fidas.png",
+    "SBNTransect": "transect.png",
+    "JWCruise": "cruise.png",
+    "underwater_probe": "underwater.png",
+    "coral_reef": "coral.png"
+}
+# Campaign-type stations whose data lives on the main MACCESS site
+EXTERNAL_TYPES = ["SBNTransect", "JWCruise", "underwater_probe", "coral_reef"]
+# Device types coloured by the parameter layer (hourly snapshots, see snapshots.py)
+LAYER_TYPES = ["IoTBox", "Fidas_Palas"]
+# Fixed colour range per quantity, so colours mean the same in every frame
+LAYER_RANGES = {
+    "PM2.5": (0, 75),
+    "PM10": (0, 150),
+    "PM1": (0, 50),
+    "Temperature": (15, 50),
+    "Humidity": (0, 100),
+    "Pressure": (990, 1030),
+}
+LAYER_COLORSCALE = "Viridis"
+# Expected sampling cadence (seconds) per device type for the map status; other
+# types are judged against their measured cadence (station_stats)
+EXPECTED_CADENCE = {
+    "IoTBox": 60,
+    "Meteorological": 60,
+    "Buoy": 1800,
+    "Fidas_Palas": 60,
+}
+# Statuses set by hand in stations_info that data freshness does not override
+MANUAL_STATUSES = ["Maintenance", "Faulty", "Decommissioned"]
+# Stations left off the map ([map] hidden_statuses in config.ini)
+HIDDEN_STATUSES = [
+    s.strip() for s in config.get('map', 'hidden_statuses', fallback='Offline').split(',') if s.strip()
+]
+
+
+class StationMap(MongoResource):
     def __init__(self, mongo_uri: str, db_name: str):
-        self.client = MongoClient(mongo_uri)
-        self.db = self.client[db_name]
+        self._init_mongo(mongo_uri, db_name)
         self.device_type_labels = {
             "IoTBox": "IoT Box",
             "Meteorological": "Meteorological Station",
@@ -30,38 +65,42 @@ class StationMap:
             "coral_reef": "Coral Reef Monitoring"
         }
 
+    @staticmethod
+    def _station_record(s, stats) -> Dict[str, str]:
+        """
+        Map record of a stations_info document. Status comes from the age of the
+        newest sample (station_stats) against the device type's EXPECTED_CADENCE,
+        unless it was set by hand to one of MANUAL_STATUSES or the station has
+        no data collection.
+        """
+        doc = stats.get(collection_for(s.get("type"), s.get("station_num")))
+        status = s.get("status", "Unknown")
+        if status not in MANUAL_STATUSES:
+            status = freshness_status(doc, cadence_seconds=EXPECTED_CADENCE.get(s.get("type"))) or status
+        return {
+            "Station Num": s.get("station_num"),
+            "Station Name": s.get("name") or f"Station {s.get('station_num')}",
+            "Latitude": s.get("lat"),
+            "Longitude": s.get("long"),
+            "Device Type": s.get("type", "Unknown"),
+            "Status": status,
+            "Station ID": s.get("id"),
+            "Privacy": s.get("public"),
+            "Latest Data": StationMap._latest(doc),
+        }
+
+    @warmed
     def fetch_station_data(self) -> List[Dict[str, str]]:
         collection = self.db[STATIONS_INFO]
-        stations = collection.find({"lat": {"$ne": None}, "long": {"$ne": None}})
-        return [
-            {
-                "Station Num": s.get("station_num"),
-                "Station Name": s.get("name") or f"Station {s.get('station_num')}",
-                "Latitude": s.get("lat"),
-                "Longitude": s.get("long"),
-                "Device Type": s.get("type", "Unknown"),
-                "Status": s.get("status", "Unknown"),
-                "Station ID": s.get("id"),
-                "Privacy": s.get("public"),
-            }
-            for s in stations
-        ]
+        stations = list(collection.find({"lat": {"$ne": None}, "long": {"$ne": None}}))
+        # newest timestamp per data collection, from station_stats (one query)
+        stats = all_stats(self.db) if stations else {}
+        return [self._station_record(s, stats) for s in stations]
 
-    def get_station_time_series(self, station_num: str, start_date: str, end_date: str):
-        collection = self.db[f"station{station_num}"]
-        query = {}
-        if start_date or end_date:
-            query["datetime"] = {}
-            if start_date:
-                query["datetime"]["$gte"] = pd.to_datetime(start_date)
-            if end_date:
-                query["datetime"]["$lte"] = pd.to_datetime(end_date)
-        cursor = collection.find(query, {"_id": 0, "datetime": 1})
-        df = pd.DataFrame([{"DateTime": r["datetime"]} for r in cursor])
-        if not df.empty:
-            df["DateTime"] = pd.to_datetime(df["DateTime"])
-            df = df.sort_values("DateTime")
-        return df
+    def fetch_station(self, station_id: str):
+        """One station by its ID (indexed lookup), or None."""
+        s = self.db[STATIONS_INFO].find_one({"id": station_id})
+        return self._station_record(s, {}) if s else None
 
     def fetch_station_location_data(self) -> Tuple[float, float]:
         collection = self.db[STATIONS_INFO]
@@ -72,132 +111,124 @@ class StationMap:
             return None
         return float(np.mean(lats)), float(np.mean(longs))
 
-    def create_map(self, station_data: List[Dict[str, str]]):
+    def station_features(self, station_data: List[Dict[str, str]]) -> Dict:
+        """
+        Compact GeoJSON FeatureCollection of the stations shown on the map.
+        Stations with one of HIDDEN_STATUSES and stations without valid
+        coordinates are skipped.
+        """
+        features = []
         for s in station_data:
-            s["true_lat"] = s["Latitude"]
-            s["true_lon"] = s["Longitude"]
-
-        coord_groups: Dict[Tuple[float, float], List[int]] = {}
-        for i, s in enumerate(station_data):
-            try:
-                lat = float(s["true_lat"])
-                lon = float(s["true_lon"])
-            except (TypeError, ValueError):
-                continue
-            coord_groups.setdefault((lat, lon), []).append(i)
-
-        for (lat, lon), idxs in coord_groups.items():
-            if len(idxs) > 1:
-                step = 2 * math.pi / len(idxs)
-                r = 0.0003
-                for j, idx in enumerate(idxs):
-                    station_data[idx]["display_lat"] = lat + r * math.sin(j * step)
-                    station_data[idx]["display_lon"] = lon + r * math.cos(j * step)
-            else:
-                station_data[idxs[0]]["display_lat"] = lat
-                station_data[idxs[0]]["display_lon"] = lon
-
-        markers = []
-        active = []
-        icon_map = {
-            "IoTBox": "iotbox.png",
-            "Meteorological": "meteostation.png",
-            "Buoy": "buoy.png",
-            "Fidas_Palas": "fidas.png",
-            "SBNTransect": "transect.png",
-            "JWCruise": "cruise.png",
-            "underwater_probe": "underwater.png",
-            "coral_reef": "coral.png"
-        }
-
-        for s in station_data:
-            if s.get("Status") == "Offline":
+            if s.get("Status") in HIDDEN_STATUSES:
                 continue
             try:
-                lat0 = float(s["true_lat"])
-                lon0 = float(s["true_lon"])
-                dlat = float(s["display_lat"])
-                dlon = float(s["display_lon"])
+                lat = float(s["Latitude"])
+                lon = float(s["Longitude"])
             except (TypeError, ValueError):
                 continue
-
-            active.append((dlat, dlon))
-            dt = s.get("Device Type", "Unknown")
-            label = self.device_type_labels.get(dt, dt)
-            icon = dict(
-                iconUrl=f"/assets/{icon_map.get(dt, 'buoy.png')}",
-                iconSize=[60, 60],
-                iconAnchor=[30, 30],
-                popupAnchor=[0, -30]
-            )
-
-            # both links now use btn-link styling
-            if dt in ["SBNTransect", "JWCruise", "underwater_probe", "coral_reef"]:
-                base = html.A(
-                    "Station Data",
-                    href=f"https://nyuadmaccess.org/login?next=/dashboard?open_station={s['Station ID']}",
-                    target="_self",
-                    className="btn btn-link",
-                    style={"padding": 0, "color": "blue"}
-                )
-            elif dt == "Fidas_Palas":
-                base = html.A(
-                    "Station Data",
-                    href="http://10.224.41.15",
-                    target="_blank",
-                    className="btn btn-link",
-                    style={"padding": 0, "color": "blue"}
-                )
-            else:
-                base = html.A(
-                    "View All Station Data",
-                    href=f"/stationdata/{dt}/{s['Station Num']}",
-                    target="_self",
-                    className="btn btn-link",
-                    style={"padding": 0, "color": "blue"}
-                )
-
-            meta_btn = html.Button(
-                "Station Metadata",
-                id={
-                    "type": "metadata-button",
-                    "station": s["Station ID"],
-                    "device": dt
+            features.append({
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [lon, lat]},
+                "properties": {
+                    "num": s.get("Station Num"),
+                    "id": s.get("Station ID"),
+                    "name": s.get("Station Name"),
+                    "type": s.get("Device Type", "Unknown"),
+                    "status": s.get("Status"),
+                    "public": s.get("Privacy"),
+                    "latest": s.get("Latest Data"),
+                    "coll": collection_for(s.get("Device Type"), s.get("Station Num")),
                 },
-                n_clicks=0,
-                className="btn btn-link",
-                style={"marginLeft": "10px", "padding": 0,"color": "blue" }
-            )
+            })
+        return {"type": "FeatureCollection", "features": features}
 
-            popup = html.Div([
-                html.P(f"Name: {s['Station Name']}"),
-                html.P(f"Type: {label}"),
-                html.P(f"Location: ({lat0:.3f}, {lon0:.3f})"),
-                html.Div([base, meta_btn], style={"display": "flex", "alignItems": "center"})
-            ])
+    @staticmethod
+    def _latest(doc):
+        if not doc or doc.get("latest") is None:
+            return None
+        return pd.to_datetime(doc["latest"]).strftime("%Y-%m-%d %H:%M")
+
+    def map_hideout(self) -> Dict:
+        """Labels, icons and link templates used by assets/station_map.js."""
+        external = {
+            "text": "Station Data",
+            "href": "https://nyuadmaccess.org/login?next=/dashboard?open_station={id}",
+            "target": "_self",
+        }
+        return {
+            "labels": self.device_type_labels,
+            "icons": ICON_MAP,
+            "default_icon": "buoy.png",
+            "links": {
+                **{dt: external for dt in EXTERNAL_TYPES},
+                "Fidas_Palas": {"text": "Station Data", "href": "http://10.224.41.15", "target": "_blank"},
+            },
+            "default_link": {
+                "text": "View All Station Data",
+                "href": "/stationdata/{type}/{num}",
+                "target": "_self",
+            },
+        }
 
-            markers.append(dl.Marker(
-                position=(dlat, dlon),
-                icon=icon,
-                bubblingMouseEvents=False,
-                children=dl.Popup([popup])
-            ))
+    def layer_hideout(self, frame: Dict, quantity: str, label: str) -> Dict:
+        """
+        map_hideout() plus marker colours for one snapshot frame
+        ({collection: {key: value}}). Stations of LAYER_TYPES are drawn as
+        coloured circles by assets/station_map.js, grey when the frame has no value.
+        """
+        low, high = LAYER_RANGES.get(quantity, (0, 100))
+        key = quantity.replace(".", "_")
+        values = {
+            coll: v[key] for coll, v in frame.items()
+            if isinstance(v, dict) and v.get(key) is not None
+        }
+        positions = [min(max((v - low) / (high - low), 0), 1) for v in values.values()]
+        colors = sample_colorscale(LAYER_COLORSCALE, positions, colortype="rgb") if positions else []
+        return {
+            **self.map_hideout(),
+            "layer": {
+                "types": LAYER_TYPES,
+                "label": label,
+                "values": values,
+                "colors": dict(zip(values, colors)),
+            },
+        }
 
-        if active:
-            if len(active) > 1:
-                lats = [c[0] for c in active]
-                lons = [c[1] for c in active]
-                map_args = {"bounds": [[min(lats), min(lons)], [max(lats), max(lons)]]}
-            else:
-                map_args = {"center": active[0], "zoom": 12}
-        else:
-            map_args = {"center": [24.53, 54.43], "zoom": 8}
+    @staticmethod
+    def feature_bounds(features: Dict) -> Dict:
+        """Map viewport (bounds, or center/zoom) fitting every feature."""
+        coords = [f["geometry"]["coordinates"] for f in features["features"]]
+        if not coords:
+            return {"center": [24.53, 54.43], "zoom": 8}
+        if len(coords) == 1:
+            return {"center": [coords[0][1], coords[0][0]], "zoom": 12}
+        lons = [c[0] for c in coords]
+        lats = [c[1] for c in coords]
+        return {"bounds": [[min(lats), min(lons)], [max(lats), max(lons)]]}
 
+    def create_map(self, station_data: List[Dict[str, str]]):
+        """
+        Clustered station map. Stations ship as a compact GeoJSON feature list;
+        clustering, marker icons and popups are done in the browser
+        (assets/station_map.js), and co-located stations spiderfy at max zoom.
+        """
+        features = self.station_features(station_data)
         return dl.Map(
-            children=[dl.TileLayer(), dl.LayerGroup(markers)],
+            id="station-map",
+            children=[
+                dl.TileLayer(),
+                dl.GeoJSON(
+                    id="station-layer",
+                    data=features,
+                    cluster=True,
+                    zoomToBoundsOnClick=True,
+                    spiderfyOnMaxZoom=True,
+                    superClusterOptions={"radius": 60, "maxZoom": 15},
+                    pointToLayer={"variable": "stationMap.pointToLayer"},
+                    onEachFeature={"variable": "stationMap.onEachFeature"},
+                    hideout=self.map_hideout(),
+                ),
+            ],
             style={"height": "100%", "width": "100%"},
-            **map_args
+            **self.feature_bounds(features)
         )
-
-    def close_connection(self):
-        self.client.close()
@@ -0,0 +1,215 @@
+# station_stats.py
+"""
+Incrementally maintained per-collection statistics (the `station_stats`
+collection), so pages can read one small document instead of running sorted
+scans over the station{N}, buoy, meteo and Fidas collections.
+
+One document per data collection, keyed by collection name:
+    {_id, time_field, earliest, latest, count, cadence_seconds,
+     last_values: {"<field path>": number}, updated_at}
+
+Each update only reads documents newer than the stored `latest` (the
+high-water mark) and moves it forward with a compare-and-set, so several web
+workers or a cron job can run updates side by side without double counting.
+
+    python station_stats.py              # update once
+    python station_stats.py --loop 30    # keep updating every 30 seconds
+
+With [station_stats] run_in_app = true (default) the web app runs the loop on
+a background thread.
+"""
+
+import argparse
+import os
+import statistics
+import threading
+import time
+from datetime import datetime, timezone
+
+from pymongo.errors import DuplicateKeyError
+
+from database import get_db
+from leader import is_leader
+from settings import (
+    config, STATIONS_INFO,
+    BUOY_01_COLLECTION, F1_METEO_COLLECTION, FIDAS_COLLECTION,
+)
+
+STATS_COLLECTION = config.get('station_stats', 'collection', fallback='station_stats')
+UPDATE_INTERVAL  = config.getint('station_stats', 'update_interval', fallback=30)
+RUN_IN_APP       = config.getboolean('station_stats', 'run_in_app', fallback=True)
+# a station is Offline once its newest sample is older than offline_factor x its
+# sampling cadence, and never before offline_min_minutes
+OFFLINE_FACTOR      = config.getfloat('station_stats', 'offline_factor', fallback=3)
+OFFLINE_MIN_MINUTES = config.getint('station_stats', 'offline_min_minutes', fallback=30)
+
+# Newest timestamps used to estimate the sampling cadence
+CADENCE_SAMPLE = 500
+
+
+def stats_targets(db):
+    """(collection, time field) for every data collection the app reads."""
+    targets = [
+        (f"station{s['station_num']}", "datetime")
+        for s in db[STATIONS_INFO].find(
+            {"type": "IoTBox", "station_num": {"$ne": None}}, {"_id": 0, "station_num": 1}
+        )
+    ]
+    targets += [
+        (BUOY_01_COLLECTION, "datetime"),
+        (F1_METEO_COLLECTION, "Timestamp"),
+        (FIDAS_COLLECTION, "datetime"),
+    ]
+    return [(name, field) for name, field in targets if name]
+
+
+def numeric_leaves(doc, prefix=""):
+    """{"a.b": number} for every scalar numeric (or numeric string) field; arrays are skipped."""
+    values = {}
+    for key, value in doc.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            values.update(numeric_leaves(value, path + "."))
+        elif isinstance(value, bool):
+            continue
+        elif isinstance(value, (int, float)):
+            values[path] = value
+        elif isinstance(value, str):
+            try:
+                values[path] = float(value)
+            except ValueError:
+                pass
+    return values
+
+
+def _cadence(times):
+    """Median spacing in seconds of newest-first timestamps, or None."""
+    gaps = [(a - b).total_seconds() for a, b in zip(times, times[1:])]
+    gaps = [g for g in gaps if g > 0]
+    return statistics.median(gaps) if gaps else None
+
+
+def update_collection(db, name, time_field):
+    """
+    Fold documents newer than the stored high-water mark into the stats
+    document of `name`. Returns True if the document changed.
+    """
+    stats = db[STATS_COLLECTION].find_one({"_id": name}) or {}
+    hwm = stats.get("latest")
+    coll = db[name]
+    new = {time_field: {"$gt": hwm}} if hwm is not None else {time_field: {"$exists": True}}
+
+    newest = coll.find_one(new, {"_id": 0}, sort=[(time_field, -1)])
+    if not newest:
+        return False
+    # everything below reads the same snapshot: documents inserted after `newest`
+    # are left for the next pass, which starts from it, so none is counted twice
+    new = {time_field: {**({"$gt": hwm} if hwm is not None else {}), "$lte": newest[time_field]}}
+    recent = [
+        d[time_field]
+        for d in coll.find(new, {"_id": 0, time_field: 1}).sort(time_field, -1).limit(CADENCE_SAMPLE)
+    ]
+
+    fields = {
+        "time_field": time_field,
+        "latest": newest[time_field],
+        "last_values": numeric_leaves({k: v for k, v in newest.items() if k != time_field}),
+        "cadence_seconds": _cadence(recent) or stats.get("cadence_seconds"),
+        "updated_at": datetime.now(timezone.utc),
+    }
+    if hwm is None:
+        first = coll.find_one(new, {"_id": 0, time_field: 1}, sort=[(time_field, 1)])
+        fields["earliest"] = first[time_field]
+    update = {"$set": fields, "$inc": {"count": coll.count_documents(new)}}
+
+    # only advance from the high-water mark we read; a concurrent updater wins otherwise
+    try:
+        if hwm is None:
+            result = db[STATS_COLLECTION].update_one(
+                {"_id": name, "latest": {"$exists": False}}, update, upsert=True
+            )
+        else:
+            result = db[STATS_COLLECTION].update_one({"_id": name, "latest": hwm}, update)
+    except DuplicateKeyError:
+        return False
+    return bool(result.modified_count or result.upserted_id)
+
+
+def update_all(db=None):
+    """Update the stats of every data collection. Returns the names that changed."""
+    db = db if db is not None else get_db()
+    changed = []
+    for name, field in stats_targets(db):
+        try:
+            if update_collection(db, name, field):
+                changed.append(name)
+        except Exception as e:
+            print(f"Error updating station stats for {name}: {e}")
+    return changed
+
+
+def get_stats(name, db=None):
+    db = db if db is not None else get_db()
+    return db[STATS_COLLECTION].find_one({"_id": name})
+
+
+def all_stats(db=None):
+    """{collection name: stats document} without per-parameter values and coverage."""
+    db = db if db is not None else get_db()
+    return {d["_id"]: d for d in db[STATS_COLLECTION].find({}, {"last_values": 0, "coverage": 0})}
+
+
+def freshness_status(doc, now=None, cadence_seconds=None):
+    """
+    "Online" or "Offline" from a stats document's newest sample age against
+    the expected `cadence_seconds` (default: the collection's measured
+    cadence), None without data.
+    """
+    if not doc or doc.get("latest") is None:
+        return None
+    latest = doc["latest"]
+    if latest.tzinfo is None:
+        latest = latest.replace(tzinfo=timezone.utc)
+    now = now or datetime.now(timezone.utc)
+    cadence = cadence_seconds or doc.get("cadence_seconds") or 0
+    limit = max(OFFLINE_FACTOR * cadence, OFFLINE_MIN_MINUTES * 60)
+    return "Online" if (now - latest).total_seconds() <= limit else "Offline"
+
+
+_updater = {"pid": None}
+
+
+def start_updater(interval=UPDATE_INTERVAL):
+    """
+    Run update_all() every `interval` seconds on a daemon thread (once per
+    process). Only the leader process (leader.py) updates; the others stand by.
+    """
+    if interval <= 0 or _updater["pid"] == os.getpid():
+        return
+    _updater["pid"] = os.getpid()
+
+    def _loop():
+        # first pass after one interval, so importing the app opens no connections
+        while True:
+            time.sleep(interval)
+            if not is_leader("station-stats"):
+                continue
+            try:
+                update_all()
+            except Exception as e:
+                print(f"Error updating station stats: {e}")
+
+    threading.Thread(target=_loop, name="station-stats", daemon=True).start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update the station_stats collection.")
+    parser.add_argument("--loop", type=int, metavar="SECONDS",
+                        help="keep updating every SECONDS instead of once")
+    args = parser.parse_args()
+    while True:
+        changed = update_all()
+        print(f"updated {len(changed)} collection(s): {', '.join(changed) or '-'}")
+        if not args.loop:
+            break
+        time.sleep(args.loop)
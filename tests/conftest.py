@@ -0,0 +1,8 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the modules read config.ini at import; the example keeps the tests independent of a local setup
+os.environ.setdefault("MACCESS_CONFIG", os.path.join(ROOT, "config", "config.ini.example"))
+sys.path.insert(0, ROOT)
@@ -0,0 +1,27 @@
+from datetime import datetime
+
+import availability
+from availability import AvailabilitySummary
+
+
+def test_stats_documents_without_a_span_are_read_from_the_collection(monkeypatch):
+    monkeypatch.setattr(availability, "get_db", lambda: None)
+    monkeypatch.setattr(availability, "stats_targets", lambda db: [
+        ("station1", "datetime"), ("station2", "datetime"), ("station3", "datetime"),
+    ])
+    monkeypatch.setattr(availability, "all_stats", lambda: {
+        "station1": {"earliest": datetime(2024, 1, 1), "latest": datetime(2025, 1, 1)},
+        # only coverage / snapshot fields so far
+        "station2": {"coverage": [], "snapshot_hour": datetime(2025, 1, 1)},
+    })
+    read = []
+
+    def read_spans(targets):
+        read.extend(targets)
+        return {name: ("2023-01-01 00:00:00", "2025-01-01 00:00:00") for name, _ in targets}
+
+    monkeypatch.setattr(availability, "read_spans", read_spans)
+    summary = AvailabilitySummary()
+    assert summary.span("station1", "datetime") == ("2024-01-01 00:00:00", "2025-01-01 00:00:00")
+    assert summary.span("station2", "datetime") == ("2023-01-01 00:00:00", "2025-01-01 00:00:00")
+    assert sorted(read) == [("station2", "datetime"), ("station3", "datetime")]
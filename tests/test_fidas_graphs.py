@@ -0,0 +1,38 @@
+import json
+
+import pytest
+
+import history_cache as history_cache_module
+import warmer
+from graphs.fidas_graphs import FidasGraphs
+from history_cache import history_cache
+
+
+class Recorder:
+    name = "fidas"
+
+    def __init__(self):
+        self.pipelines = []
+
+    def aggregate(self, pipeline, **kwargs):
+        self.pipelines.append(pipeline)
+        return iter([])
+
+
+@pytest.fixture
+def fidas(monkeypatch):
+    monkeypatch.setattr(warmer, "ENABLED", False)
+    fidas = FidasGraphs(collection_name="fidas")
+    fidas.db = {}
+    fidas.collection = Recorder()
+    return fidas
+
+
+@pytest.mark.parametrize("cached", [False, True])
+def test_dotted_fields_are_read_with_getfield(fidas, monkeypatch, cached):
+    monkeypatch.setattr(history_cache_module, "ENABLED", cached)
+    monkeypatch.setattr(history_cache, "read_through", lambda key, field, start, fetch: fetch(start, None))
+    fidas.fetch_time_series("1D", ["PM2.5", "PMtot"], "H")
+    text = json.dumps(fidas.collection.pipelines, default=str)
+    assert '"$PM2.5"' not in text
+    assert '{"$getField": "PM2.5"}' in text
@@ -0,0 +1,171 @@
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import history_cache
+from history_cache import HistoryCache, _read_partition, _write_partition
+
+DAY = timedelta(days=1)
+
+
+class Source:
+    """Hourly rows for ten days before `end`, with a record of the fetch(lo, hi) calls."""
+
+    def __init__(self, end):
+        times = pd.date_range(end - 10 * DAY, end, freq="h", inclusive="left")
+        self.rows = pd.DataFrame({"t": times, "v": np.arange(len(times), dtype="float32")})
+        self.calls = []
+
+    def fetch(self, lo, hi):
+        self.calls.append((lo, hi))
+        keep = pd.Series(True, index=self.rows.index)
+        if lo is not None:
+            keep &= self.rows["t"] >= lo
+        if hi is not None:
+            keep &= self.rows["t"] < hi
+        return self.rows[keep].reset_index(drop=True)
+
+    def expected(self, start):
+        return self.rows[self.rows["t"] >= start].reset_index(drop=True)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Sets the cache's "now" (naive UTC)."""
+    monkeypatch.setattr(history_cache, "ENABLED", True)
+
+    def set_now(now):
+        class Clock(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return now.replace(tzinfo=tz) if tz else now
+        monkeypatch.setattr(history_cache, "datetime", Clock)
+    return set_now
+
+
+def manifest(cache, key):
+    return cache._manifest(key)
+
+
+def test_cold_read_stores_settled_days(tmp_path, clock):
+    now = datetime(2026, 3, 10, 12)
+    clock(now)
+    source, cache = Source(now), HistoryCache(str(tmp_path), settle_hours=6)
+    start = now - 3 * DAY
+
+    df = cache.read_through("k", "t", start, source.fetch)
+
+    pd.testing.assert_frame_equal(df, source.expected(start))
+    assert source.calls == [(start, None)]
+    # the partial first day is not cached; yesterday ended 12 h ago, so it is
+    assert manifest(cache, "k") == (datetime(2026, 3, 8).date(), datetime(2026, 3, 9).date())
+    assert sorted(os.listdir(tmp_path / "k")) == ["2026-03-08.arrow", "2026-03-09.arrow", "manifest.json"]
+
+
+def test_warm_read_only_fetches_the_tail(tmp_path, clock):
+    now = datetime(2026, 3, 10, 12)
+    clock(now)
+    source, cache = Source(now), HistoryCache(str(tmp_path), settle_hours=6)
+    start = now - 3 * DAY
+    cache.read_through("k", "t", start, source.fetch)
+    source.calls.clear()
+
+    df = cache.read_through("k", "t", start, source.fetch)
+
+    pd.testing.assert_frame_equal(df, source.expected(start))
+    assert source.calls == [(start, datetime(2026, 3, 8)), (datetime(2026, 3, 10), None)]
+
+
+def test_head_extension_adds_older_days(tmp_path, clock):
+    now = datetime(2026, 3, 10, 12)
+    clock(now)
+    source, cache = Source(now), HistoryCache(str(tmp_path), settle_hours=6)
+    cache.read_through("k", "t", datetime(2026, 3, 8), source.fetch)
+    source.calls.clear()
+    start = datetime(2026, 3, 5)
+
+    df = cache.read_through("k", "t", start, source.fetch)
+
+    pd.testing.assert_frame_equal(df, source.expected(start))
+    assert source.calls[0] == (start, datetime(2026, 3, 8))
+    assert manifest(cache, "k") == (datetime(2026, 3, 5).date(), datetime(2026, 3, 9).date())
+    # served from the cache alone (apart from today) the next time
+    source.calls.clear()
+    pd.testing.assert_frame_equal(cache.read_through("k", "t", start, source.fetch), source.expected(start))
+    assert source.calls == [(datetime(2026, 3, 10), None)]
+
+
+def test_tail_extension_as_days_settle(tmp_path, clock):
+    now = datetime(2026, 3, 10, 12)
+    clock(now)
+    source, cache = Source(now + 2 * DAY), HistoryCache(str(tmp_path), settle_hours=6)
+    start = datetime(2026, 3, 8)
+    cache.read_through("k", "t", start, source.fetch)
+
+    later = now + 2 * DAY
+    clock(later)
+    df = cache.read_through("k", "t", start, source.fetch)
+
+    pd.testing.assert_frame_equal(df, source.expected(start))
+    assert manifest(cache, "k") == (datetime(2026, 3, 8).date(), datetime(2026, 3, 11).date())
+
+
+@pytest.mark.parametrize("hour, through", [(5, 8), (7, 9)])
+def test_settle_boundary(tmp_path, clock, hour, through):
+    # yesterday (the 9th) is cached once it ended settle_hours ago
+    now = datetime(2026, 3, 10, hour)
+    clock(now)
+    source, cache = Source(now), HistoryCache(str(tmp_path), settle_hours=6)
+    cache.read_through("k", "t", datetime(2026, 3, 7), source.fetch)
+    assert manifest(cache, "k") == (datetime(2026, 3, 7).date(), datetime(2026, 3, through).date())
+
+
+def test_start_after_cached_range(tmp_path, clock):
+    now = datetime(2026, 3, 10, 12)
+    clock(now)
+    source, cache = Source(now), HistoryCache(str(tmp_path), settle_hours=6)
+    cache.read_through("k", "t", datetime(2026, 3, 7), source.fetch)
+    source.calls.clear()
+
+    # within the day after "through": only the requested period is read, the cache stays as it is
+    start = datetime(2026, 3, 10, 6)
+    df = cache.read_through("k", "t", start, source.fetch)
+
+    pd.testing.assert_frame_equal(df, source.expected(start))
+    assert source.calls == [(start, None)]
+    assert manifest(cache, "k") == (datetime(2026, 3, 7).date(), datetime(2026, 3, 9).date())
+
+
+def test_whole_history(tmp_path, clock):
+    now = datetime(2026, 3, 10, 12)
+    clock(now)
+    source, cache = Source(now), HistoryCache(str(tmp_path), settle_hours=6)
+    cache.read_through("k", "t", None, source.fetch)
+    source.calls.clear()
+
+    df = cache.read_through("k", "t", None, source.fetch)
+
+    pd.testing.assert_frame_equal(df, source.rows)
+    assert manifest(cache, "k") == (None, datetime(2026, 3, 9).date())
+    assert source.calls == [(datetime(2026, 3, 10), None)]
+
+
+def test_partition_round_trip_keeps_compact_types(tmp_path):
+    df = pd.DataFrame({
+        "t": pd.to_datetime(["2026-03-01 00:00", "2026-03-01 01:00", "2026-03-01 02:00"]),
+        "pm": pd.Series([1.5, np.nan, 3.25], dtype="float32"),
+        "mode": pd.Series([1, pd.NA, 3], dtype="Int8"),
+        "errors": pd.Series([0, 2**40, pd.NA], dtype="Int64"),
+    })
+    path = str(tmp_path / "2026-03-01.arrow")
+
+    _write_partition(path, df)
+    back = _read_partition(path)
+
+    pd.testing.assert_frame_equal(back, df)
+    assert back.dtypes.to_dict() == df.dtypes.to_dict()
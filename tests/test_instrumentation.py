@@ -0,0 +1,26 @@
+import time
+from types import SimpleNamespace
+
+import instrumentation
+from instrumentation import callback_label, station_label
+
+
+def test_unregistered_callback_ids_are_other(monkeypatch):
+    app = SimpleNamespace(callback_map={"graph-output.children": {}})
+    monkeypatch.setattr(instrumentation.dash, "get_app", lambda: app)
+    assert callback_label("graph-output.children") == "graph-output.children"
+    assert callback_label("made-up-1234.children") == "other"
+    assert callback_label("") == ""
+
+
+def test_unknown_stations_are_other(monkeypatch):
+    monkeypatch.setitem(instrumentation._stations, "values", {"1", "12"})
+    monkeypatch.setitem(instrumentation._stations, "loaded", time.time())
+    assert station_label("12") == "12"
+    assert station_label("999999") == "other"
+    assert station_label("") == ""
+
+
+def test_stations_not_loaded_yet_are_other(monkeypatch):
+    monkeypatch.setitem(instrumentation._stations, "values", None)
+    assert station_label("12", load=False) == "other"
@@ -0,0 +1,43 @@
+import subprocess
+import sys
+
+import pytest
+
+import leader
+from leader import is_leader
+
+pytestmark = pytest.mark.skipif(leader.fcntl is None, reason="needs flock")
+
+OTHER_PROCESS = """
+import sys
+sys.path.insert(0, {root!r})
+import leader
+leader.LOCK_DIR = {lock_dir!r}
+print(leader.is_leader("job"))
+"""
+
+
+@pytest.fixture(autouse=True)
+def lock_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(leader, "LOCK_DIR", str(tmp_path))
+    monkeypatch.setattr(leader, "_held", {})
+    return tmp_path
+
+
+def _other_process_leads(lock_dir):
+    from conftest import ROOT
+    code = OTHER_PROCESS.format(root=ROOT, lock_dir=str(lock_dir))
+    return subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout.strip()
+
+
+def test_one_leader_per_job(lock_dir):
+    assert _other_process_leads(lock_dir) == "True"   # and exits, releasing the lock
+    assert is_leader("job") and is_leader("job")
+    assert _other_process_leads(lock_dir) == "False"
+    assert is_leader("other job")
+
+
+def test_next_process_takes_over(lock_dir):
+    assert is_leader("job")
+    leader._held.pop("job")[1].close()   # the leader exits
+    assert _other_process_leads(lock_dir) == "True"
@@ -0,0 +1,25 @@
+import pytest
+
+import metadata_tables
+from metadata_tables import metadata_items, metadata_table
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(metadata_tables, "_cache", {})
+
+
+def test_table_after_items():
+    assert metadata_items("iotbox_metadata.json")
+    assert metadata_table("iotbox_metadata.json") is not None
+
+
+def test_items_after_table():
+    table = metadata_table("iotbox_metadata.json")
+    assert metadata_items("iotbox_metadata.json")
+    assert metadata_table("iotbox_metadata.json") is table
+
+
+def test_missing_file():
+    assert metadata_items("no_such_metadata.json") == []
+    assert metadata_table("no_such_metadata.json") is None
@@ -0,0 +1,45 @@
+import cProfile
+import threading
+
+import pytest
+
+import profiling
+from profiling import _Run
+
+
+@pytest.fixture(autouse=True)
+def output_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "OUTPUT_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_overlapping_requests_are_served_unprofiled(output_dir):
+    labels = ("data", "graph-output.children", "12")
+    first = _Run.start(labels, {})
+    assert first is not None
+    results = []
+    second = threading.Thread(target=lambda: results.append(_Run.start(labels, {})))
+    second.start()
+    second.join()
+    assert results == [None]
+    first.finish()
+    third = _Run.start(labels, {})
+    assert third is not None
+    third.finish()
+    assert len((output_dir / "index.jsonl").read_text().splitlines()) == 2
+
+
+def test_another_active_profiler_is_not_an_error():
+    other = cProfile.Profile()
+    try:
+        other.enable()
+    except ValueError:
+        pytest.skip("a profiler is already active")
+    try:
+        run = _Run.start(("data", "graph-output.children", "12"), {})
+    finally:
+        other.disable()
+    if run is not None:   # Python < 3.12 allows a second profiler
+        run.finish()
+    assert profiling._active.acquire(blocking=False)
+    profiling._active.release()
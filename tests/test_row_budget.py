@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+import row_budget
+from row_budget import coarse_bucket, estimate_rows, finest_bucket
+from station_stats import STATS_COLLECTION
+
+NOW = datetime.utcnow().replace(microsecond=0)
+
+
+@pytest.fixture
+def db():
+    db = mongomock.MongoClient().db
+    db.station1.insert_many([{"datetime": NOW - timedelta(minutes=i)} for i in range(1000)])
+    return db
+
+
+def test_estimate_from_stats(db):
+    db[STATS_COLLECTION].insert_one({
+        "_id": "station1", "earliest": NOW - timedelta(days=10), "latest": NOW, "count": 10_000_000,
+    })
+    rows, span = estimate_rows(db, "station1", "datetime")
+    assert rows == 10_000_000 and span == pytest.approx(10 * 86400, abs=5)
+    rows, _ = estimate_rows(db, "station1", "datetime", NOW - timedelta(days=1))
+    assert rows == pytest.approx(1_000_000, rel=0.01)
+
+
+def test_estimate_without_stats_counts_the_period(db):
+    rows, span = estimate_rows(db, "station1", "datetime", NOW - timedelta(minutes=100))
+    assert rows == 101 and span == pytest.approx(6000, abs=5)
+
+
+def test_whole_history_without_stats_does_not_scan(db, monkeypatch):
+    def count_documents(self, *args, **kwargs):
+        raise AssertionError("count_documents() over the whole collection")
+    monkeypatch.setattr(mongomock.collection.Collection, "count_documents", count_documents)
+    # (mongomock's own estimate counts the documents)
+    monkeypatch.setattr(mongomock.collection.Collection, "estimated_document_count", lambda self, **kw: 1234)
+    rows, span = estimate_rows(db, "station1", "datetime")
+    assert rows == 1234 and span == pytest.approx(999 * 60, abs=5)
+
+
+def test_coarse_bucket(monkeypatch):
+    monkeypatch.setattr(row_budget, "ENABLED", True)
+    assert coarse_bucket(999, 86400, max_rows=1000) is None
+    assert coarse_bucket(5000, 86400, max_rows=1000) == (5, "minute")
+    assert finest_bucket(10 * 365 * 86400, 1000) == (1, "week")
@@ -0,0 +1,33 @@
+from datetime import datetime, timedelta, timezone
+
+from station_map import StationMap
+
+NOW = datetime.now(timezone.utc)
+
+
+def _status(device_type, age, cadence_seconds, status="Online"):
+    station = {"type": device_type, "station_num": 12, "status": status}
+    stats = {"station12": {"latest": NOW - age, "cadence_seconds": cadence_seconds}}
+    return StationMap._station_record(station, stats)["Status"]
+
+
+def test_status_uses_the_expected_cadence_of_the_device_type():
+    # an IoT box that only reported every 6 hours is still late after 3 hours
+    assert _status("IoTBox", timedelta(hours=3), cadence_seconds=6 * 3600) == "Offline"
+    assert _status("IoTBox", timedelta(minutes=10), cadence_seconds=6 * 3600) == "Online"
+
+
+def test_manual_statuses_are_kept():
+    assert _status("IoTBox", timedelta(days=3), 60, status="Maintenance") == "Maintenance"
+
+
+def test_offline_stations_are_hidden(monkeypatch):
+    records = [
+        {"Station Num": n, "Latitude": 24.5, "Longitude": 54.4, "Status": status}
+        for n, status in enumerate(["Online", "Offline", "Decommissioned"])
+    ]
+    station_map = StationMap.__new__(StationMap)
+    shown = [f["properties"]["status"] for f in station_map.station_features(records)["features"]]
+    assert shown == ["Online", "Decommissioned"]
+    monkeypatch.setattr("station_map.HIDDEN_STATUSES", [])
+    assert len(station_map.station_features(records)["features"]) == 3
@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+
+import warmer
+from warmer import warmed
+
+
+class Source:
+    _collection_name = "station1"
+
+    def __init__(self):
+        self.calls = 0
+
+    @warmed
+    def fetch(self, date_range="1W"):
+        self.calls += 1
+        return pd.DataFrame({"value": [1.0, 2.0]})
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(warmer, "ENABLED", True)
+    monkeypatch.setattr(warmer, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(warmer, "_stores", {})
+
+
+def test_warmed_results_are_shared_copies():
+    leader, worker = Source(), Source()
+    warmer._refresh("station1", leader.fetch)
+    assert leader.calls == 1
+
+    frame = worker.fetch()
+    frame["value"] *= 10
+    assert worker.fetch()["value"].tolist() == [1.0, 2.0]
+    assert worker.calls == 0
+    # a different call is not warmed
+    worker.fetch("1D")
+    assert worker.calls == 1
+
+
+def test_stale_results_are_not_served(monkeypatch):
+    source = Source()
+    warmer._refresh("station1", source.fetch)
+    monkeypatch.setattr(warmer, "MAX_AGE", -1)
+    source.fetch()
+    assert source.calls == 2
@@ -0,0 +1,173 @@
+# warmer.py
+"""
+Cache warming for the views most visitors open first.
+
+The first visitor after a deploy (or after the data moved on) pays the full
+query cost of the default views. A background thread precomputes them on
+startup and then every `interval` seconds:
+
+- the station map,
+- every IoT box and the meteo station at "Past 1 Week" with the default
+  parameters,
+- both buoy tabs at "Past 1 Day",
+- the Fidas "Past 1 Day" PM2.5/PMtot time series.
+
+Only the leader process (leader.py) warms, at most `concurrency` views at a
+time, and stores the results in a diskcache in `directory`. Fetch methods
+decorated with `@warmed` in any worker serve a warmed result from there while
+it is at most `max_age` seconds old, so these views may lag the database by
+that much; anything else is fetched as usual.
+
+Hits and misses per fetch method are counted in warm_cache_requests_total on
+/metrics. [warmer] in config.ini: enabled, interval, max_age, concurrency,
+directory.
+"""
+
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import diskcache
+
+from instrumentation import Counter, register
+from settings import config, MONGO_URI, DB_NAME, STATIONS_INFO
+from leader import is_leader
+from single_flight import call_key
+
+ENABLED     = config.getboolean('warmer', 'enabled', fallback=True)
+INTERVAL    = config.getint('warmer', 'interval', fallback=300)
+MAX_AGE     = config.getint('warmer', 'max_age', fallback=360)
+CONCURRENCY = config.getint('warmer', 'concurrency', fallback=2)
+CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    config.get('warmer', 'directory', fallback='.warmer')
+)
+
+REQUESTS = register(Counter(
+    "warm_cache_requests_total",
+    "Calls of warmed fetch methods, by whether a warmed result was served (hit) or not (miss).",
+    ("function", "result"),
+))
+
+_stores = {}   # pid -> diskcache of call key -> (time warmed, result)
+_lock = threading.Lock()
+_refreshing = threading.local()
+
+
+def _entries():
+    """Per-process handle on the shared results (sqlite connections do not survive a fork)."""
+    pid = os.getpid()
+    if pid not in _stores:
+        with _lock:
+            if pid not in _stores:
+                _stores.clear()
+                _stores[pid] = diskcache.Cache(CACHE_DIR)
+    return _stores[pid]
+
+
+def warmed(method):
+    """Decorator for fetch methods whose default calls the warmer precomputes."""
+    name = method.__qualname__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not ENABLED:
+            return method(self, *args, **kwargs)
+        key = call_key(method, self, args, kwargs)
+        if getattr(_refreshing, "active", False):
+            result = method(self, *args, **kwargs)
+            _entries().set(key, (time.time(), result), expire=MAX_AGE)
+            return result
+        entry = _entries().get(key)
+        if entry is not None and time.time() - entry[0] <= MAX_AGE:
+            REQUESTS.inc((name, "hit"))
+            # unpickled, so a copy callers may modify in place
+            return entry[1]
+        REQUESTS.inc((name, "miss"))
+        return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+def default_views():
+    """(label, fetch) for every view to warm; each fetch() calls a @warmed method."""
+    from graphs.buoy_graphs import BuoyGraphs
+    from graphs.fidas_graphs import FidasGraphs
+    from graphs.iot_graphs import IoTGraphs
+    from graphs.meteo_graphs import meteostationGraphs
+    from settings import BUOY_01_COLLECTION, F1_METEO_COLLECTION, FIDAS_COLLECTION
+    from station_map import StationMap
+
+    station_map = StationMap(mongo_uri=MONGO_URI, db_name=DB_NAME)
+    iot = IoTGraphs()
+    # the page defaults (pages/*.py)
+    views = [("map", station_map.fetch_station_data)]
+    nums = [
+        s["station_num"]
+        for s in station_map.db[STATIONS_INFO].find(
+            {"type": "IoTBox", "station_num": {"$ne": None}}, {"_id": 0, "station_num": 1}
+        )
+    ]
+    for n in nums:
+        def fetch_iot(n=n):
+            parameters = iot.default_parameters(iot.get_available_parameters(n))
+            if parameters:
+                iot.fetch_station_data(n, "1W", parameters, False)
+        views.append((f"station{n}", fetch_iot))
+    if F1_METEO_COLLECTION:
+        meteo = meteostationGraphs()
+        views.append(("meteo", lambda: meteo.fetch_data("1W")))
+    if BUOY_01_COLLECTION:
+        buoy = BuoyGraphs()
+        views.append(("buoy time series", lambda: buoy.fetch_time_series("1D", buoy.scalar_params, agg="None")))
+        views.append(("buoy profiles", lambda: buoy.fetch_profiles("1D")))
+    if FIDAS_COLLECTION:
+        fidas = FidasGraphs()
+        views.append(("fidas", lambda: fidas.fetch_time_series("1D", ["PM2.5", "PMtot"], "None")))
+    return views
+
+
+def _refresh(label, fetch):
+    _refreshing.active = True
+    try:
+        fetch()
+    except Exception as e:
+        print(f"Error warming {label}: {e}")
+    finally:
+        _refreshing.active = False
+
+
+def warm_all(concurrency=CONCURRENCY):
+    """Recompute every default view, at most `concurrency` at a time. Returns the number of views."""
+    views = default_views()
+    with ThreadPoolExecutor(max(concurrency, 1), thread_name_prefix="warmer") as pool:
+        list(pool.map(lambda view: _refresh(*view), views))
+    # drop results nobody refreshed any more (e.g. the default parameters changed)
+    _entries().expire()
+    return len(views)
+
+
+_warmer = {"pid": None}
+
+
+def start_warmer(interval=INTERVAL):
+    """
+    Warm now and every `interval` seconds on a daemon thread (once per
+    process). Only the leader process (leader.py) warms; the others stand by.
+    """
+    if not ENABLED or interval <= 0 or _warmer["pid"] == os.getpid():
+        return
+    _warmer["pid"] = os.getpid()
+
+    def _loop():
+        while True:
+            try:
+                if is_leader("warmer"):
+                    warm_all()
+            except Exception as e:
+                print(f"Error warming default views: {e}")
+            time.sleep(interval - time.time() % interval)
+
+    threading.Thread(target=_loop, name="view-warmer", daemon=True).start()
@@ -0,0 +1,14 @@
+# wsgi.py
+"""
+WSGI entrypoint for production: exposes the Flask server behind the Dash app.
+
+    gunicorn -c gunicorn.conf.py wsgi:server
+
+Worker/thread counts, timeouts and preloading come from the [server] section
+of config/config.ini (see gunicorn.conf.py).
+"""
+
+from app import app
+
+server = app.server
+application = server